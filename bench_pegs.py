@@ -0,0 +1,54 @@
+"""
+Time the boolean engine on a logic board: a plate with a grid of peg holes
+cut out of it in a single difference, and the same plate with a row of
+rounded tabs added to it along every edge in a single union.
+
+    python bench_pegs.py [number of holes]
+"""
+
+import sys
+import time
+
+from noodle import Shape, rectangle, circle
+
+
+def peg_grid(count, pitch=0.25, radius=0.0625):
+    columns = int(count ** .5) or 1
+    rows = (count + columns - 1) // columns
+    segments = []
+    for n in range(count):
+        i, j = n % columns, n // columns
+        x, y = (i - 0.5 * (columns - 1)) * pitch, (j - 0.5 * (rows - 1)) * pitch
+        segments.extend(circle(x, y, radius).segments)
+    return Shape.from_segments(segments), columns * pitch, rows * pitch
+
+
+def edge_tabs(width, height, pitch=0.25, radius=0.1):
+    segments, x = [], -width
+    while x <= width:
+        segments.extend(circle(x, height, radius).segments)
+        segments.extend(circle(x, -height, radius).segments)
+        x += pitch
+    return Shape.from_segments(segments)
+
+
+def timed(f, *args):
+    t0 = time.time()
+    result = f(*args)
+    return result, time.time() - t0
+
+
+def main(count=500):
+    holes, width, height = peg_grid(count)
+    plate = rectangle(0, 0, 0.5 * width + 0.5, 0.5 * height + 0.5)
+    board, t = timed(plate.__sub__, holes)
+    print('difference: {0} holes, {1} segments out, {2:.3f} s'.format(
+        count, len(board.segments), t))
+    tabs = edge_tabs(0.5 * width + 0.5, 0.5 * height + 0.5)
+    board, t = timed(plate.__add__, tabs)
+    print('union: {0} tabs, {1} segments out, {2:.3f} s'.format(
+        len(tabs.segments) // 2, len(board.segments), t))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,243 @@
+"""
+Time the hot paths of the geometry core on reproducible random inputs.
+
+    python benchmark.py                        # print a table
+    python benchmark.py -o base.json           # and save the results
+    python benchmark.py --compare base.json    # flag anything that got slower
+
+    python benchmark.py -k segment -k startup --backend python -o py.json
+    python benchmark.py -k segment -k startup --backend numpy --compare py.json
+
+Every case builds its inputs from its own random.Random(seed), so two runs
+with the same seed time the same work. Each case runs --repeat times and
+the best time is the one that counts; it is reported per operation, in
+microseconds, so cases of different sizes can sit in one table. With
+--compare, a case more than --threshold slower than the baseline is a
+regression and the exit status is 1.
+
+--backend picks the geomarray backend (see geomarray.py) for the run, and
+for the startup cases, which time a fresh interpreter importing noodle and
+making a rectangle against one that does nothing.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+from noodle import PI, TWO_PI, Arc, LineSegment, Point, PSTransform, Shape, Vector, rectangle
+import geomarray
+import pswriter
+
+
+SIZES = (10, 100, 1000, 10000, 100000)
+
+
+def random_point(rng, size=10.):
+    return Point(rng.uniform(-size, size), rng.uniform(-size, size))
+
+
+def random_line(rng):
+    p = random_point(rng)
+    return LineSegment(p, p + Vector(rng.uniform(-2., 2.), rng.uniform(-2., 2.)))
+
+
+def random_arc(rng):
+    start = rng.uniform(-PI, PI)
+    finish = start + rng.choice((1, -1)) * rng.uniform(0.1, TWO_PI)
+    return Arc(random_point(rng), rng.uniform(0.5, 3.), start, finish)
+
+
+def polygon(rng, n, arcs=False):
+    # a star-shaped polygon with n corners, so it never crosses itself
+    angles = sorted(rng.uniform(0, TWO_PI) for _ in range(n))
+    points = [Point(r * math.cos(a), r * math.sin(a))
+              for a, r in zip(angles, [rng.uniform(5., 10.) for _ in range(n)])]
+    if not arcs:
+        return points, None
+    radii = []
+    for i in range(n):
+        chord = abs(points[(i + 1) % n] - points[i])
+        radii.append(rng.choice((1, -1)) * rng.uniform(0.51, 2.) * chord)
+    return points, radii
+
+
+def line_line(rng, n):
+    pairs = [(random_line(rng), random_line(rng)) for _ in range(n)]
+    return lambda: [a.intersect(b) for a, b in pairs]
+
+
+def arc_arc(rng, n):
+    pairs = [(random_arc(rng), random_arc(rng)) for _ in range(n)]
+    return lambda: [a.intersect(b) for a, b in pairs]
+
+
+def arc_line(rng, n):
+    pairs = [(random_arc(rng), random_line(rng)) for _ in range(n)]
+    return lambda: [a.intersect(b) for a, b in pairs]
+
+
+def angle_ranges(rng, n):
+    pairs = [(random_arc(rng).angle_range, random_arc(rng).angle_range) for _ in range(n)]
+    return lambda: [a.intersection(b) for a, b in pairs]
+
+
+def rectangles(rng, n):
+    boxes = [(rng.uniform(-10, 10), rng.uniform(-10, 10), rng.uniform(.1, 2), rng.uniform(.1, 2))
+             for _ in range(n)]
+    return lambda: [rectangle(*box) for box in boxes]
+
+
+def arc_shapes(rng, n):
+    points, radii = polygon(rng, n, arcs=True)
+    return lambda: Shape(points, radii)
+
+
+def postscript(rng, n):
+    shape = Shape(*polygon(rng, n))
+    tfm = PSTransform()
+    return lambda: shape.postscript(tfm)
+
+
+def pswriter_stream(rng, n):
+    shape = Shape(*polygon(rng, n))
+    return lambda: pswriter.write_postscript([shape], pswriter._Collector())
+
+
+def grid_polygon(rng, n):
+    # the same, shrunk to fit the sheet, with its corners on the 1/64 inch
+    # grid of PSTransform.grid_text()
+    points, radii = polygon(rng, n)
+    shape = Shape([Point(round(25 * p.x) / 64., round(25 * p.y) / 64.) for p in points])
+    return lambda: pswriter.write_postscript([shape], pswriter._Collector())
+
+
+def segment_arrays(rng, n):
+    # moving and mapping a sheet's worth of segments, as pswriter does
+    records = geomarray.SegmentArray.from_segments(
+        random_arc(rng) if rng.random() < 0.3 else random_line(rng) for _ in range(n))
+    matrix, tfm = (0.6, -0.8, 0.8, 0.6, 1., 2.), PSTransform()
+    return lambda: records.transform(matrix).map(tfm)
+
+
+def _interpreter(code):
+    env = dict(os.environ, NOODLE_BACKEND=geomarray.BACKEND)
+    return lambda: subprocess.check_call([sys.executable, '-c', code], env=env)
+
+
+def startup_bare(rng, n):
+    return _interpreter('pass')
+
+
+def startup_noodle(rng, n):
+    return _interpreter('from noodle import rectangle; rectangle(0, 0, 1, 1)')
+
+
+# name: (setup, sizes); setup(rng, n) builds the inputs and returns the
+# thing to time, which does n operations
+CASES = [
+    ('line_intersect', line_line, (10000,)),
+    ('arc_arc_intersect', arc_arc, (10000,)),
+    ('arc_line_intersect', arc_line, (10000,)),
+    ('angle_range_intersection', angle_ranges, (10000,)),
+    ('shape_rectangle', rectangles, (10000,)),
+    ('shape_arcs', arc_shapes, (1000,)),
+    ('postscript', postscript, SIZES),
+    ('pswriter', pswriter_stream, SIZES),
+    ('pswriter_grid', grid_polygon, SIZES),
+    ('segment_arrays', segment_arrays, SIZES),
+    ('startup_bare', startup_bare, (1,)),
+    ('startup_noodle', startup_noodle, (1,)),
+]
+
+
+def run(seed=0, repeat=5, max_size=None, only=None):
+    results = {}
+    for name, setup, sizes in CASES:
+        if only and not any(word in name for word in only):
+            continue
+        for n in sizes:
+            if max_size and n > max_size:
+                continue
+            f = setup(random.Random(seed), n)
+            times = []
+            for _ in range(repeat):
+                t0 = time.time()
+                f()
+                times.append(time.time() - t0)
+            times.sort()
+            results['{0}/{1}'.format(name, n)] = {
+                'n': n, 'best': times[0], 'median': times[len(times) // 2],
+                'us_per_op': 1e6 * times[0] / n}
+    return {'python': platform.python_version(), 'backend': geomarray.backend(),
+            'seed': seed, 'repeat': repeat, 'cases': results}
+
+
+def compare(results, baseline, threshold):
+    """
+    Ratios of per-operation time against the baseline, for the cases both
+    have, and the names of those that got slower by more than threshold.
+    >>> old = {'cases': {'a/1': {'us_per_op': 2.0}, 'b/1': {'us_per_op': 1.0}}}
+    >>> new = {'cases': {'a/1': {'us_per_op': 1.0}, 'b/1': {'us_per_op': 1.5}, 'c/1': {'us_per_op': 1.0}}}
+    >>> ratios, slower = compare(new, old, 0.1)
+    >>> sorted(ratios.items()), slower
+    ([('a/1', 0.5), ('b/1', 1.5)], ['b/1'])
+    """
+    ratios, slower = {}, []
+    for name, case in sorted(results['cases'].items()):
+        old = baseline['cases'].get(name)
+        if old is None:
+            continue
+        ratios[name] = case['us_per_op'] / old['us_per_op']
+        if ratios[name] > 1 + threshold:
+            slower.append(name)
+    return ratios, slower
+
+
+def report(results, ratios=None):
+    lines = ['{0:<32} {1:>12} {2:>12}{3}'.format('case', 'us/op', 'best s', '  vs base' if ratios else '')]
+    for name, case in sorted(results['cases'].items(), key=lambda item: (item[0].split('/')[0], item[1]['n'])):
+        ratio = ''
+        if ratios is not None:
+            ratio = '  {0:7.2f}x'.format(ratios[name]) if name in ratios else '        -'
+        lines.append('{0:<32} {1:>12.3f} {2:>12.4f}{3}'.format(name, case['us_per_op'], case['best'], ratio))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the geometry core.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max-size', type=int, help='skip cases bigger than this')
+    parser.add_argument('-k', dest='only', action='append', help='only cases whose name contains this')
+    parser.add_argument('-o', '--output', help='save the results as JSON')
+    parser.add_argument('--compare', help='a saved JSON baseline to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='how much slower than the baseline counts as a regression')
+    parser.add_argument('--backend', choices=geomarray.BACKENDS, default=geomarray.BACKEND,
+                        help='the geomarray backend to time')
+    args = parser.parse_args(argv)
+    geomarray.set_backend(args.backend)
+    if geomarray.backend() != args.backend:
+        parser.error('the {0} backend is not available'.format(args.backend))
+    results = run(args.seed, args.repeat, args.max_size, args.only)
+    ratios, slower = None, []
+    if args.compare:
+        with open(args.compare) as f:
+            ratios, slower = compare(results, json.load(f), args.threshold)
+    print(report(results, ratios))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if slower:
+        print('slower than the baseline: ' + ', '.join(slower))
+    return 1 if slower else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
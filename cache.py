@@ -0,0 +1,161 @@
+"""
+Remember rendered PostScript and boolean results by the geometry they came
+from, so a part that hasn't changed since the last run costs nothing.
+
+Keys are built from Shape.geometry_hash(), so two shapes made separately but
+with the same segments share an entry. Entries live in an LRU of at most
+maxsize items in memory and, if a directory is given, as pickle files under
+it, trimmed oldest first to max_disk_bytes.
+
+    cache = RenderCache('.noodle-cache')
+    board = cache.difference(plate, holes)
+    text = cache.postscript(board, tfm)
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+
+from noodle import PSTransform
+from geomarray import SegmentArray
+import shapeops
+
+
+class RenderCache(object):
+    """
+    >>> from noodle import rectangle
+    >>> cache = RenderCache(maxsize=2)
+    >>> a = cache.union(rectangle(0, 0, 2, 1), rectangle(2, 0, 1, 2))
+    >>> b = cache.union(rectangle(0, 0, 2, 1), rectangle(2, 0, 1, 2))
+    >>> a.area() == b.area() == 14.0, cache.hits, cache.misses
+    (True, 1, 1)
+    >>> directory = tempfile.mkdtemp()
+    >>> text = RenderCache(directory).postscript(rectangle(0, 0, 1, 1))
+    >>> again = RenderCache(directory)
+    >>> again.postscript(rectangle(0, 0, 1, 1)) == text, again.disk_hits, again.misses
+    (True, 1, 0)
+    >>> import shutil
+    >>> shutil.rmtree(directory)
+    """
+    def __init__(self, directory=None, maxsize=256, max_disk_bytes=64 << 20):
+        self.directory, self.maxsize, self.max_disk_bytes = directory, maxsize, max_disk_bytes
+        self.memory = OrderedDict()
+        self.hits = self.disk_hits = self.misses = 0
+        self.disk_bytes = None
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def __repr__(self):
+        return '<RenderCache {0} in memory, {1} hits, {2} from disk, {3} misses>'.format(
+            len(self.memory), self.hits, self.disk_hits, self.misses)
+
+    def _path(self, key):
+        name = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, name[:2], name[2:] + '.pickle')
+
+    def get(self, key, default=None):
+        if key in self.memory:
+            value = self.memory.pop(key)
+            self.memory[key] = value
+            self.hits += 1
+            return value
+        if self.directory:
+            path = self._path(key)
+            try:
+                with open(path, 'rb') as f:
+                    value = pickle.load(f)
+            except (IOError, OSError, EOFError, pickle.UnpicklingError):
+                pass
+            else:
+                os.utime(path, None)
+                self.disk_hits += 1
+                self._remember(key, value)
+                return value
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.directory:
+            path = self._path(key)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            # write then rename, so a reader never sees half a file
+            fd, temp = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+            os.rename(temp, path)
+            if self.disk_bytes is None:
+                self.disk_bytes = sum(size for _, size, _ in self._files())
+            else:
+                self.disk_bytes += os.path.getsize(path)
+            if self.disk_bytes > self.max_disk_bytes:
+                self._trim()
+
+    def _remember(self, key, value):
+        self.memory.pop(key, None)
+        self.memory[key] = value
+        while len(self.memory) > self.maxsize:
+            self.memory.popitem(last=False)
+
+    def _files(self):
+        for parent, dirs, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(parent, name)
+                info = os.stat(path)
+                yield info.st_mtime, info.st_size, path
+
+    def _trim(self):
+        # least recently used first, down to three quarters of the limit
+        files = sorted(self._files())
+        self.disk_bytes = sum(size for _, size, _ in files)
+        for mtime, size, path in files:
+            if self.disk_bytes <= 0.75 * self.max_disk_bytes:
+                break
+            os.remove(path)
+            self.disk_bytes -= size
+
+    def clear(self):
+        self.memory.clear()
+        if self.directory:
+            for _, _, path in list(self._files()):
+                os.remove(path)
+            self.disk_bytes = 0
+
+    def postscript(self, shape, tfm=None):
+        """
+        shape.postscript(tfm), from the cache if the same geometry has been
+        rendered with the same transform before.
+        """
+        tfm = tfm or PSTransform()
+        key = 'ps {0} {1!r} {2!r} {3!r}'.format(shape.geometry_hash(), tfm.SCALEFACTOR,
+                                                tfm.OFFSET.x, tfm.OFFSET.y)
+        text = self.get(key)
+        if text is None:
+            text = shape.postscript(tfm)
+            self.put(key, text)
+        return text
+
+    def combine(self, a, b, op):
+        key = '{0} {1} {2}'.format(op, a.geometry_hash(), b.geometry_hash())
+        records = self.get(key)
+        if records is None:
+            records = SegmentArray.from_shape(shapeops.combine(a, b, op))
+            self.put(key, records)
+        return records.to_shape()
+
+    def union(self, a, b):
+        return self.combine(a, b, shapeops.UNION)
+
+    def intersection(self, a, b):
+        return self.combine(a, b, shapeops.INTERSECTION)
+
+    def difference(self, a, b):
+        return self.combine(a, b, shapeops.DIFFERENCE)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,256 @@
+"""
+Boolean trees of shapes that remember their results, so changing one leaf
+only redoes the work that leaf touches.
+
+    plate = Leaf(rectangle(0, 0, 4, 3))
+    holes = [Leaf(circle(x, 0, 0.1)) for x in ...]
+    board = Union(Difference(plate, *holes), *tabs)
+    board.shape()               # everything is worked out once
+    holes[3].set(circle(...))   # move one hole
+    board.shape()               # only that hole's part is redone
+
+Every node has a stamp, taken from one clock, that changes whenever its
+result does. An operation compares its children's stamps with the ones it
+saw last time, and does nothing if none have changed.
+
+The operands of a Union or of the subtracted side of a Difference are
+grouped into clusters whose bounding boxes overlap one another. Clusters
+don't touch, so their union is just all their segments together, and each
+cluster's own result is kept until one of its members changes. A cluster
+lying wholly inside the shape it is subtracted from is a hole; holes are
+added to the result as they are, reversed, and only clusters crossing the
+outline are put through a real difference. Moving a hole in a plate is
+then a matter of swapping its segments.
+"""
+
+import itertools
+
+from noodle import INSIDE, Shape
+import shapeops
+import spatial
+
+
+_clock = itertools.count(1)
+
+
+class Node(object):
+    def __init__(self):
+        self.stamp = 0
+        self._shape = None
+        self._bbox = (None, None)
+
+    def refresh(self):
+        """
+        Bring the result up to date with the leaves.
+        """
+
+    def shape(self):
+        self.refresh()
+        return self._shape
+
+    def bbox(self):
+        # cached for the current stamp; None for an empty shape
+        self.refresh()
+        stamp, box = self._bbox
+        if stamp != self.stamp:
+            segments = self._shape.segments
+            box = spatial.union(s.bbox() for s in segments) if segments else None
+            self._bbox = (self.stamp, box)
+        return box
+
+    def __add__(self, other):
+        return Union(self, other)
+
+    def __sub__(self, other):
+        return Difference(self, other)
+
+    def __and__(self, other):
+        return Intersection(self, other)
+
+
+class Leaf(Node):
+    """
+    >>> from noodle import rectangle
+    >>> leaf = Leaf(rectangle(0, 0, 1, 1))
+    >>> before = leaf.stamp
+    >>> leaf.set(rectangle(1, 0, 1, 1))
+    >>> leaf.stamp > before
+    True
+    """
+    def __init__(self, shape):
+        Node.__init__(self)
+        self.set(shape)
+
+    def set(self, shape):
+        self._shape, self.stamp = shape, next(_clock)
+
+
+class _Operation(Node):
+    def __init__(self, *children):
+        Node.__init__(self)
+        self.children = list(children)
+        self.seen = None
+        self.computed = 0   # how many boolean operations this node has done
+
+    def refresh(self):
+        for child in self.children:
+            child.refresh()
+        stamps = [child.stamp for child in self.children]
+        if stamps != self.seen:
+            self._shape = self.evaluate()
+            self.seen, self.stamp = stamps, next(_clock)
+
+    def _combine(self, shapes, op):
+        result = shapes[0]
+        for shape in shapes[1:]:
+            result = shapeops.combine(result, shape, op)
+            self.computed += 1
+        return result
+
+
+def _clusters(nodes):
+    # the nodes in groups whose boxes overlap, keyed by their stamps
+    boxes = [node.bbox() for node in nodes]
+    live = [n for n, box in enumerate(boxes) if box is not None]
+    parent = dict((n, n) for n in live)
+
+    def find(n):
+        while parent[n] != n:
+            parent[n] = parent[parent[n]]
+            n = parent[n]
+        return n
+    for i, j in spatial.candidate_pairs([boxes[n] for n in live]):
+        parent[find(live[i])] = find(live[j])
+    groups = {}
+    for n in live:
+        groups.setdefault(find(n), []).append(n)
+    result = []
+    for group in sorted(groups.values()):
+        members = [nodes[n] for n in group]
+        result.append((tuple((id(node), node.stamp) for node in members), members))
+    return result
+
+
+class Union(_Operation):
+    """
+    >>> from noodle import rectangle
+    >>> a, b, c = Leaf(rectangle(0, 0, 2, 1)), Leaf(rectangle(2, 0, 1, 2)), Leaf(rectangle(9, 0, 1, 1))
+    >>> u = Union(a, b, c)
+    >>> u.shape().area(), u.computed
+    (18.0, 1)
+    >>> c.set(rectangle(9, 0, 2, 2))
+    >>> u.shape().area(), u.computed
+    (30.0, 1)
+    """
+    def __init__(self, *children):
+        _Operation.__init__(self, *children)
+        self.parts = {}
+
+    def evaluate(self):
+        parts, segments = {}, []
+        for key, group in _clusters(self.children):
+            if key not in self.parts:
+                self.parts[key] = self._cluster(group)
+            parts[key] = self.parts[key]
+            segments.extend(shapeops.counterclockwise(parts[key]))
+        self.parts = parts
+        return Shape.from_segments(segments)
+
+    def _cluster(self, group):
+        # The biggest member (a plate, say) is put together with the rest in
+        # one operation, after the rest have been joined up among themselves
+        # into clusters that don't touch each other, so its segments are
+        # only gone through once.
+        if len(group) < 3:
+            return self._combine([node.shape() for node in group], shapeops.UNION)
+        area = lambda box: (box[2] - box[0]) * (box[3] - box[1])
+        biggest = max(group, key=lambda node: area(node.bbox()))
+        rest = []
+        for key, others in _clusters([node for node in group if node is not biggest]):
+            rest.extend(shapeops.counterclockwise(self._combine([node.shape() for node in others], shapeops.UNION)))
+        return self._combine([biggest.shape(), Shape.from_segments(rest)], shapeops.UNION)
+
+
+class Intersection(_Operation):
+    """
+    >>> from noodle import rectangle
+    >>> Intersection(Leaf(rectangle(0, 0, 2, 1)), Leaf(rectangle(2, 0, 1, 2))).shape().area()
+    2.0
+    """
+    def evaluate(self):
+        return self._combine([child.shape() for child in self.children], shapeops.INTERSECTION)
+
+
+class Difference(_Operation):
+    """
+    The first child minus all the others.
+    >>> from noodle import rectangle, circle
+    >>> holes = [Leaf(circle(x, 0, 0.25)) for x in range(-2, 3)]
+    >>> edge = Leaf(rectangle(3, 0, 0.5, 0.5))
+    >>> board = Difference(Leaf(rectangle(0, 0, 3, 1)), edge, *holes)
+    >>> round(board.shape().area(), 6), board.computed
+    (10.518252, 1)
+    >>> holes[0].set(circle(-2, 0.5, 0.25))
+    >>> round(board.shape().area(), 6), board.computed
+    (10.518252, 1)
+    >>> edge.set(rectangle(3, 0, 0.5, 0.25))
+    >>> round(board.shape().area(), 6), board.computed
+    (10.768252, 2)
+
+    A cluster around a hole or an island of the base is not a hole in it.
+    >>> holed = rectangle(0, 0, 4, 3) - rectangle(0, 0, 2, 2)
+    >>> Difference(Leaf(holed), Leaf(rectangle(0, 0, 3, 2.5))).shape().area(), (holed - rectangle(0, 0, 3, 2.5)).area()
+    (18.0, 18.0)
+    >>> islands = rectangle(0, 0, 1, 1) + rectangle(5, 0, 1, 1)
+    >>> Difference(Leaf(islands), Leaf(rectangle(5, 0, 2, 2))).shape().area()
+    4.0
+    """
+    def __init__(self, base, *subtrahends):
+        _Operation.__init__(self, base, *subtrahends)
+        self.parts, self.trimmed = {}, (None, None)
+
+    def _part(self, key, group, base):
+        # the union of a cluster, and whether it is a hole in the base
+        if key in self.parts and self.parts[key][0] == base.stamp:
+            return self.parts[key]
+        shape = self._combine([node.shape() for node in group], shapeops.UNION)
+        box, base_box = spatial.union(shape.bboxes()), base.bbox()
+        if base_box is None or not spatial.overlaps(box, base_box):
+            kind = 'outside'
+        elif base.shape().find_intersections(shape):
+            kind = 'crossing'
+        elif any(shape.classify(contour[0].start_point()) == INSIDE for contour in base.shape().contours()):
+            # it swallows a hole or an island of the base
+            kind = 'crossing'
+        else:
+            inside = [base.shape().classify(contour[0].start_point()) == INSIDE for contour in shape.contours()]
+            kind = 'hole' if all(inside) else 'crossing' if any(inside) else 'outside'
+        return base.stamp, kind, shape
+
+    def evaluate(self):
+        base = self.children[0]
+        parts, holes, crossing = {}, [], []
+        for key, group in _clusters(self.children[1:]):
+            parts[key] = self._part(key, group, base)
+            stamp, kind, shape = parts[key]
+            if kind == 'hole':
+                holes.append(shape)
+            elif kind == 'crossing':
+                crossing.append((key, shape))
+        self.parts = parts
+        cut_key = (base.stamp, tuple(key for key, shape in crossing))
+        if self.trimmed[0] != cut_key:
+            trimmed = base.shape()
+            if crossing:
+                cutter = Shape.from_segments(s for key, shape in crossing for s in shapeops.counterclockwise(shape))
+                trimmed = self._combine([trimmed, cutter], shapeops.DIFFERENCE)
+            self.trimmed = (cut_key, trimmed)
+        segments = shapeops.counterclockwise(self.trimmed[1])
+        for hole in holes:
+            segments.extend(s.reversed() for s in reversed(shapeops.counterclockwise(hole)))
+        return Shape.from_segments(segments)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,412 @@
+"""
+Write shapes out in formats other than PostScript.
+
+Anything with move_to, line_to, arc_to, close_path and end_shape methods
+can be handed to Shape.emit(), which calls them a contour at a time, and
+LineSegment.emit() and Arc.emit() each add themselves to the current path.
+Coordinates are the shapes' own, in inches with the origin in the middle of
+the sheet; each writer turns them into whatever its format wants.
+
+    with open('board.svg', 'w') as f:
+        with SVGWriter(f, 24, 12) as svg:
+            for shape in shapes:
+                svg.write_shape(shape)
+
+SVGWriter writes one <path> per shape, DXFWriter writes LINE and ARC
+entities in the R12 subset that every cutter reads, and BinaryWriter
+writes packed float64 records that load_binary() maps back in, decoding
+each shape only when it's used. pswriter.PostScriptWriter takes the same
+calls. write_file() picks a writer from the file name.
+"""
+
+import math
+import mmap
+import os
+import struct
+from abc import ABCMeta, abstractmethod
+
+from noodle import EPSILON, PI, TWO_PI, Point, Shape
+from geomarray import RECORD, SegmentArray, StoredShape, LINE, ARC, read_records
+from pswriter import number
+
+
+DEGREES = 180. / math.pi
+
+
+class Emitter(ABCMeta('EmitterBase', (object,), {})):
+    """
+    The calls Shape.emit() makes, and the begin / write_shape / close life
+    cycle shared by the writers. A writer that leaves one of the calls out
+    can't be made at all, rather than failing halfway through a file.
+    >>> class Half(Emitter):
+    ...     def move_to(self, pt):
+    ...         pass
+    >>> Half(_Collector())    # doctest: +ELLIPSIS
+    Traceback (most recent call last):
+        ...
+    TypeError: Can't instantiate abstract class Half...
+    """
+    def __init__(self, stream):
+        self.stream = stream
+        self.started = self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def header(self):
+        return ''
+
+    def trailer(self):
+        return ''
+
+    def begin(self):
+        if not self.started:
+            self.started = True
+            self.stream.write(self.header())
+
+    def write_shape(self, shape):
+        self.begin()
+        shape.emit(self)
+
+    def close(self):
+        if not self.closed:
+            self.begin()
+            self.stream.write(self.trailer())
+            self.closed = True
+
+    @abstractmethod
+    def move_to(self, pt):
+        pass
+
+    @abstractmethod
+    def line_to(self, pt):
+        pass
+
+    @abstractmethod
+    def arc_to(self, center, radius, start, finish):
+        pass
+
+    @abstractmethod
+    def close_path(self):
+        pass
+
+    @abstractmethod
+    def end_shape(self):
+        pass
+
+
+def _arc_end(center, radius, angle):
+    return Point(center.x + radius * math.cos(angle), center.y + radius * math.sin(angle))
+
+
+class SVGWriter(Emitter):
+    """
+    One <path> per shape, on a sheet width by height inches. SVG's y axis
+    points down, so y is negated on the way out.
+    >>> from noodle import rectangle, circle
+    >>> out = _Collector()
+    >>> with SVGWriter(out, 4, 4) as svg:
+    ...     svg.write_shape(rectangle(0, 0, 1, 0.5))
+    ...     svg.write_shape(circle(0, 0, 1))
+    >>> print(''.join(out.chunks))
+    <?xml version="1.0" encoding="UTF-8"?>
+    <svg xmlns="http://www.w3.org/2000/svg" width="4in" height="4in" viewBox="-2 -2 4 4">
+    <path fill="none" stroke="black" stroke-width="0.01" d="M-1 0.5 L-1 -0.5 L1 -0.5 L1 0.5 Z"/>
+    <path fill="none" stroke="black" stroke-width="0.01" d="M-1 0 A1 1 0 0 1 1 0 A1 1 0 0 1 -1 0 Z"/>
+    </svg>
+    <BLANKLINE>
+    """
+    def __init__(self, stream, width=8.5, height=11, stroke=0.01, places=4):
+        Emitter.__init__(self, stream)
+        self.width, self.height, self.stroke, self.places = width, height, stroke, places
+        self.words = []
+
+    def _xy(self, pt):
+        return '{0} {1}'.format(number(pt.x, self.places), number(-pt.y, self.places))
+
+    def header(self):
+        w, h = number(self.width, self.places), number(self.height, self.places)
+        return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<svg xmlns="http://www.w3.org/2000/svg" width="{0}in" height="{1}in" '
+                'viewBox="{2} {3} {0} {1}">\n'.format(w, h, number(-0.5 * self.width, self.places),
+                                                      number(-0.5 * self.height, self.places)))
+
+    def trailer(self):
+        return '</svg>\n'
+
+    def move_to(self, pt):
+        self.words.append('M' + self._xy(pt))
+
+    def line_to(self, pt):
+        self.words.append('L' + self._xy(pt))
+
+    def arc_to(self, center, radius, start, finish):
+        # an SVG arc can't go all the way round, so go at most half way at
+        # a time; counter-clockwise on the page is sweep flag 0 once y is
+        # turned over
+        r = number(radius, self.places)
+        sweep = finish - start
+        n = max(1, int(math.ceil(abs(sweep) / PI - EPSILON)))
+        flag = '0' if sweep > 0 else '1'
+        for k in range(1, n + 1):
+            angle = finish if k == n else start + sweep * k / n
+            self.words.append('A{0} {0} 0 0 {1} {2}'.format(r, flag, self._xy(_arc_end(center, radius, angle))))
+
+    def close_path(self):
+        self.words.append('Z')
+
+    def end_shape(self):
+        self.stream.write('<path fill="none" stroke="black" stroke-width="{0}" d="{1}"/>\n'.format(
+            number(self.stroke, self.places), ' '.join(self.words)))
+        self.words = []
+
+
+class DXFWriter(Emitter):
+    """
+    LINE and ARC entities in an R12 ENTITIES section. DXF arcs always run
+    counter-clockwise, so a clockwise arc goes out with its ends swapped.
+    An arc that goes all the way round would start and end at the same
+    angle, which is an empty ARC, so it goes out as a CIRCLE.
+    >>> from noodle import Arc
+    >>> out = _Collector()
+    >>> with DXFWriter(out) as dxf:
+    ...     dxf.write_shape(Shape.from_segments([Arc(Point(0, 0), 1, PI, 0)]))
+    >>> print(' '.join(''.join(out.chunks).split()))
+    0 SECTION 2 ENTITIES 0 ARC 8 0 10 0 20 0 30 0 40 1 50 0 51 180 0 ENDSEC 0 EOF
+    >>> out = _Collector()
+    >>> with DXFWriter(out) as dxf:
+    ...     dxf.write_shape(Shape.from_segments([Arc(Point(1, 2), 0.5, 0, TWO_PI)]))
+    >>> print(' '.join(''.join(out.chunks).split()))
+    0 SECTION 2 ENTITIES 0 CIRCLE 8 0 10 1 20 2 30 0 40 0.5 0 ENDSEC 0 EOF
+    """
+    def __init__(self, stream, layer='0', places=6):
+        Emitter.__init__(self, stream)
+        self.layer, self.places = layer, places
+        self.first = self.current = None
+
+    def _group(self, *pairs):
+        return ''.join('{0}\n{1}\n'.format(code, value if isinstance(value, str) else number(value, self.places))
+                       for code, value in pairs)
+
+    def header(self):
+        return self._group((0, 'SECTION'), (2, 'ENTITIES'))
+
+    def trailer(self):
+        return self._group((0, 'ENDSEC'), (0, 'EOF'))
+
+    def move_to(self, pt):
+        self.first = self.current = pt
+
+    def line_to(self, pt):
+        p = self.current
+        self.stream.write(self._group((0, 'LINE'), (8, self.layer), (10, p.x), (20, p.y), (30, 0.),
+                                      (11, pt.x), (21, pt.y), (31, 0.)))
+        self.current = pt
+
+    def arc_to(self, center, radius, start, finish):
+        lo, hi = min(start, finish), max(start, finish)
+        if hi - lo >= TWO_PI - EPSILON:
+            self.stream.write(self._group((0, 'CIRCLE'), (8, self.layer), (10, center.x), (20, center.y),
+                                          (30, 0.), (40, radius)))
+        else:
+            a, b = (DEGREES * lo) % 360, (DEGREES * hi) % 360
+            self.stream.write(self._group((0, 'ARC'), (8, self.layer), (10, center.x), (20, center.y), (30, 0.),
+                                          (40, radius), (50, a), (51, b)))
+        self.current = _arc_end(center, radius, finish)
+
+    def close_path(self):
+        if self.current is not None and not self.current == self.first:
+            self.line_to(self.first)
+
+    def end_shape(self):
+        self.first = self.current = None
+
+
+# the binary format: a header, then one RECORD per segment, each shape led
+# by a SHAPE record holding its bounding box and how many segments follow
+MAGIC, VERSION = b'NDLG', 1
+HEADER = struct.Struct('<4sI')
+SHAPE = 2
+
+
+class BinaryWriter(Emitter):
+    """
+    Shapes as packed little-endian records, a byte for the kind and five
+    float64s, the same records a SegmentArray holds. The stream must be
+    opened in binary mode.
+    >>> import io
+    >>> from noodle import rectangle, circle
+    >>> out = io.BytesIO()
+    >>> with BinaryWriter(out) as writer:
+    ...     writer.write_shape(rectangle(0, 0, 1, 0.5))
+    ...     writer.write_shape(circle(2, 0, 1))
+    >>> len(out.getvalue()) == HEADER.size + 8 * RECORD.size
+    True
+    >>> [s.segments for s in read_binary(out.getvalue())][1]
+    [Arc((2.0,0.0),1.0,180.0,0.0), Arc((2.0,0.0),1.0,360.0,180.0)]
+    """
+    def __init__(self, stream):
+        Emitter.__init__(self, stream)
+        self.records = SegmentArray()
+        self.first = self.current = None
+
+    def header(self):
+        return HEADER.pack(MAGIC, VERSION)
+
+    def trailer(self):
+        return b''
+
+    def write_shape(self, shape):
+        # straight from the records, so the segments come back exactly, and
+        # a moved shape's segments are never made
+        self.begin()
+        self._write(SegmentArray.from_shape(shape))
+
+    def _write(self, records):
+        n, data = records.STRIDE, records.data
+        box = records.bbox()
+        chunks = [RECORD.pack(SHAPE, box[0], box[1], box[2], box[3], len(records))]
+        for i, kind in enumerate(records.kinds):
+            chunks.append(RECORD.pack(kind, *data[n * i:n * (i + 1)]))
+        self.stream.write(b''.join(chunks))
+
+    def move_to(self, pt):
+        self.first = self.current = pt
+
+    def line_to(self, pt):
+        self.records.kinds.append(LINE)
+        self.records.data.extend((self.current.x, self.current.y, pt.x, pt.y, 0.))
+        self.current = pt
+
+    def arc_to(self, center, radius, start, finish):
+        self.records.kinds.append(ARC)
+        self.records.data.extend((center.x, center.y, radius, start, finish))
+        self.current = _arc_end(center, radius, finish)
+
+    def close_path(self):
+        if self.current is not None and not self.current == self.first:
+            self.line_to(self.first)
+
+    def end_shape(self):
+        self._write(self.records)
+        self.records = SegmentArray()
+        self.first = self.current = None
+
+
+def _shape_records(buf):
+    # (offset of the first segment record, count, bounding box) per shape
+    magic, version = HEADER.unpack_from(buf, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('not a geometry file')
+    offset, end = HEADER.size, len(buf)
+    while offset < end:
+        kind, xmin, ymin, xmax, ymax, count = RECORD.unpack_from(buf, offset)
+        if kind != SHAPE:
+            raise ValueError('expected a shape record at {0}'.format(offset))
+        count = int(count)
+        yield offset + RECORD.size, count, (xmin, ymin, xmax, ymax)
+        offset += RECORD.size * (count + 1)
+
+
+def read_binary(buf):
+    """
+    Generate the shapes in a buffer written by BinaryWriter.
+    """
+    for offset, count, box in _shape_records(buf):
+        yield read_records(buf, offset, count).to_shape()
+
+
+class BinaryFile(object):
+    """
+    The shapes in a file written by BinaryWriter, left in the mapped file.
+    Opening it walks the shape records and nothing else; each shape is a
+    geomarray.StoredShape whose segments are decoded the first time they
+    are used. After close(), shapes already used keep their segments and
+    the rest can't be read.
+    >>> import os, tempfile
+    >>> from noodle import rectangle, circle
+    >>> fd, filename = tempfile.mkstemp(suffix='.bin')
+    >>> os.close(fd)
+    >>> write_file([rectangle(0, 0, 1, 0.5), circle(2, 0, 1)], filename)
+    >>> with load_binary(filename) as shapes:
+    ...     disc = shapes[1]
+    ...     len(shapes), disc.box, disc._segments is None
+    ...     disc.segments
+    (2, (1.0, -1.0, 3.0, 1.0), True)
+    [Arc((2.0,0.0),1.0,180.0,0.0), Arc((2.0,0.0),1.0,360.0,180.0)]
+    >>> os.remove(filename)
+    """
+    def __init__(self, filename):
+        self.file = open(filename, 'rb')
+        if os.fstat(self.file.fileno()).st_size == 0:
+            self.file.close()
+            raise ValueError('not a geometry file')
+        self.buf = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.shapes = [StoredShape(self.buf, offset, count, box)
+                       for offset, count, box in _shape_records(self.buf)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        for shape in self.shapes:
+            shape.detach()
+        self.buf.close()
+        self.file.close()
+
+    def __len__(self):
+        return len(self.shapes)
+
+    def __getitem__(self, i):
+        return self.shapes[i]
+
+    def __iter__(self):
+        return iter(self.shapes)
+
+
+def load_binary(filename):
+    """
+    A BinaryFile of the shapes in a file written by BinaryWriter.
+    """
+    return BinaryFile(filename)
+
+
+class _Collector(object):
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, text):
+        self.chunks.append(text)
+
+
+def write_file(shapes, filename, width=8.5, height=11):
+    """
+    Write the shapes to filename in the format its extension names: .ps,
+    .svg, .dxf or .bin.
+    """
+    import pswriter
+    from noodle import PSTransform
+    extension = os.path.splitext(filename)[1].lower()
+    makers = {
+        '.ps': lambda f: pswriter.PostScriptWriter(f, PSTransform(width, height)),
+        '.svg': lambda f: SVGWriter(f, width, height),
+        '.dxf': DXFWriter,
+        '.bin': BinaryWriter,
+    }
+    if extension not in makers:
+        raise ValueError('no writer for ' + filename)
+    with open(filename, 'wb' if extension == '.bin' else 'w') as f:
+        with makers[extension](f) as writer:
+            for shape in shapes:
+                writer.write_shape(shape)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,513 @@
+"""
+Compact storage for large numbers of points and segments.
+
+A PointArray keeps its coordinates in two array('d') buffers, and a
+SegmentArray keeps one fixed-size record per LineSegment or Arc. Batched
+operations run over the buffers directly instead of building a Vector for
+every intermediate result, and elements come back out as ordinary Point,
+LineSegment and Arc objects when they are indexed.
+
+With NOODLE_BACKEND=numpy in the environment (or after
+set_backend('numpy')), and NumPy installed, the batched moves and mappings
+of long arrays run in NumPy instead, and so does the mapping of long
+contours to the page in Shape.postscript(). They do the same floating
+point operations in the same order, so the results are the same to the
+last bit, and NumPy isn't imported until an array is long enough to need
+it.
+"""
+
+import math
+import os
+import struct
+from array import array
+
+from noodle import Point, LineSegment, Arc, Shape, _arc_offsets
+import spatial
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+BACKENDS = ('python', 'numpy')
+
+# anything but a known backend in the environment is taken as 'python'
+BACKEND = os.environ.get('NOODLE_BACKEND', 'python')
+if BACKEND not in BACKENDS:
+    BACKEND = 'python'
+
+# arrays shorter than this aren't worth handing to NumPy
+VECTOR_MIN = 64
+
+_vector = []    # NumPy, or None for plain Python, once it has been looked for
+
+
+def set_backend(name):
+    global BACKEND
+    if name not in BACKENDS:
+        raise ValueError('unknown backend {0!r}, not one of {1}'.format(name, BACKENDS))
+    BACKEND = name
+    del _vector[:]
+
+
+def backend():
+    """
+    The backend in use, which is 'python' if NumPy was asked for but isn't
+    installed.
+    >>> saved = BACKEND
+    >>> set_backend('python')
+    >>> backend()
+    'python'
+    >>> set_backend(saved)
+    """
+    return 'python' if _vectorized() is None else 'numpy'
+
+
+def _vectorized(count=VECTOR_MIN):
+    # NumPy if it's the backend and count items are enough to need it;
+    # shorter arrays never get as far as importing it
+    if count < VECTOR_MIN:
+        return None
+    if not _vector:
+        _vector.append(_numpy() if BACKEND == 'numpy' else None)
+    return _vector[0]
+
+
+def _same(x):
+    return x
+
+
+def _tobytes(a):
+    return a.tobytes() if hasattr(a, 'tobytes') else a.tostring()
+
+
+def _frombytes(a, b):
+    if hasattr(a, 'frombytes'):
+        a.frombytes(b)
+    else:
+        a.fromstring(b)
+
+
+class PointArray(object):
+    """
+    >>> pa = PointArray.from_points([Point(0, 0), Point(1, 2)])
+    >>> pa
+    PointArray([(0.0,0.0), (1.0,2.0)])
+    >>> len(pa), pa[1]
+    (2, (1.0,2.0))
+    """
+    __slots__ = ('xs', 'ys')
+
+    def __init__(self, xs=(), ys=()):
+        self.xs, self.ys = array('d', xs), array('d', ys)
+        if len(self.xs) != len(self.ys):
+            raise ValueError('xs and ys differ in length')
+
+    @classmethod
+    def from_points(cls, points):
+        points = list(points)
+        return cls([p.x for p in points], [p.y for p in points])
+
+    def __len__(self):
+        return len(self.xs)
+
+    def __getitem__(self, i):
+        return Point(self.xs[i], self.ys[i])
+
+    def __iter__(self):
+        for x, y in zip(self.xs, self.ys):
+            yield Point(x, y)
+
+    def __repr__(self):
+        return 'PointArray([{0}])'.format(', '.join(repr(p) for p in self))
+
+    def append(self, pt):
+        self.xs.append(pt.x)
+        self.ys.append(pt.y)
+
+    def translate(self, v):
+        """
+        >>> PointArray([0, 1], [0, 2]).translate(Point(3, 4))
+        PointArray([(3.0,4.0), (4.0,6.0)])
+        """
+        dx, dy = v.x, v.y
+        return PointArray([x + dx for x in self.xs], [y + dy for y in self.ys])
+
+    def scale(self, k):
+        """
+        >>> PointArray([0, 1], [0, 2]).scale(2)
+        PointArray([(0.0,0.0), (2.0,4.0)])
+        """
+        return PointArray([k * x for x in self.xs], [k * y for y in self.ys])
+
+    def rotate(self, theta, about=None):
+        """
+        Rotate counter-clockwise by theta radians around a point, by default
+        the origin.
+        >>> PointArray([1], [0]).rotate(math.pi / 2, Point(1, 1))
+        PointArray([(2.0,1.0)])
+        """
+        c, s = math.cos(theta), math.sin(theta)
+        ox, oy = (0., 0.) if about is None else (about.x, about.y)
+        xs, ys = array('d'), array('d')
+        for x, y in zip(self.xs, self.ys):
+            x, y = x - ox, y - oy
+            xs.append(ox + c * x - s * y)
+            ys.append(oy + s * x + c * y)
+        return PointArray(xs, ys)
+
+    def dot(self, v):
+        """
+        >>> PointArray([2, 1], [3, 0]).dot(Point(5, 7))
+        array('d', [31.0, 5.0])
+        """
+        vx, vy = v.x, v.y
+        return array('d', [x * vx + y * vy for x, y in zip(self.xs, self.ys)])
+
+    def cross(self, v):
+        """
+        >>> PointArray([2, 1], [3, 0]).cross(Point(5, 7))
+        array('d', [-1.0, 7.0])
+        """
+        vx, vy = v.x, v.y
+        return array('d', [x * vy - y * vx for x, y in zip(self.xs, self.ys)])
+
+    def map(self, tfm):
+        """
+        Apply a PSTransform to every point at once.
+        >>> from noodle import PSTransform
+        >>> PointArray([0, 1], [0, -1]).map(PSTransform())
+        PointArray([(306.0,396.0), (378.0,324.0)])
+        """
+        k = tfm.SCALEFACTOR
+        ox, oy = tfm.ORIGIN.x - k * tfm.ZERO.x, tfm.ORIGIN.y - k * tfm.ZERO.y
+        numpy = _vectorized(len(self.xs))
+        if numpy is not None:
+            xs, ys = self.as_numpy()
+            result = PointArray()
+            _frombytes(result.xs, _tobytes(ox + k * xs))
+            _frombytes(result.ys, _tobytes(oy + k * ys))
+            return result
+        return PointArray([ox + k * x for x in self.xs], [oy + k * y for y in self.ys])
+
+    def as_numpy(self):
+        """
+        Return NumPy views sharing memory with the coordinate buffers.
+        Raises ImportError if NumPy is not installed.
+        """
+        numpy = _numpy()
+        if numpy is None:
+            raise ImportError('numpy is not available')
+        return (numpy.frombuffer(self.xs, dtype=numpy.float64),
+                numpy.frombuffer(self.ys, dtype=numpy.float64))
+
+
+LINE, ARC = 0, 1
+
+
+class SegmentArray(object):
+    """
+    One record of STRIDE doubles per segment, with the kind of each segment
+    kept in a parallel byte array. A LineSegment record is (x1, y1, x2, y2, 0)
+    and an Arc record is (cx, cy, radius, start, finish).
+    >>> sa = SegmentArray.from_shape(Shape([Point(0, 0), Point(2, 0)], [1, None]))
+    >>> len(sa)
+    2
+    >>> list(sa)
+    [Arc((1.0,0.0),1.0,180.0,0.0), LineSegment((2.0,0.0), (0.0,0.0))]
+    """
+    __slots__ = ('kinds', 'data')
+    STRIDE = 5
+
+    def __init__(self, kinds=(), data=()):
+        self.kinds, self.data = array('B', kinds), array('d', data)
+        if len(self.data) != self.STRIDE * len(self.kinds):
+            raise ValueError('data does not match kinds')
+
+    @classmethod
+    def from_segments(cls, segments):
+        sa = cls()
+        for segment in segments:
+            sa.append(segment)
+        return sa
+
+    @classmethod
+    def from_shape(cls, shape):
+        """
+        A moved shape is read from its base segments and moved here, in one
+        pass over the buffer, without making the moved segments.
+        """
+        if shape.matrix is None:
+            return cls.from_segments(shape.segments)
+        return cls.from_segments(shape.base).transform(shape.matrix)
+
+    def to_shape(self):
+        return Shape.from_segments(self)
+
+    def append(self, segment):
+        if isinstance(segment, LineSegment):
+            self.kinds.append(LINE)
+            self.data.extend((segment.p1.x, segment.p1.y, segment.p2.x, segment.p2.y, 0.))
+        elif isinstance(segment, Arc):
+            r = segment.angle_range
+            self.kinds.append(ARC)
+            self.data.extend((segment.center.x, segment.center.y, segment.radius, r.start, r.finish))
+        else:
+            raise TypeError(segment)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getstate__(self):
+        """
+        Pickled as two byte strings, rather than the list of floats an array
+        turns into under Python 2, so it is cheap to send to another process.
+        >>> import pickle
+        >>> sa = SegmentArray.from_segments([LineSegment(Point(0, 0), Point(1, 0))])
+        >>> list(pickle.loads(pickle.dumps(sa)))
+        [LineSegment((0.0,0.0), (1.0,0.0))]
+        """
+        return _tobytes(self.kinds), _tobytes(self.data)
+
+    def __setstate__(self, state):
+        self.kinds, self.data = array('B'), array('d')
+        _frombytes(self.kinds, state[0])
+        _frombytes(self.data, state[1])
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self.kinds)
+        a, b, c, d, e = self.data[self.STRIDE * i:self.STRIDE * (i + 1)]
+        if self.kinds[i] == LINE:
+            return LineSegment(Point(a, b), Point(c, d))
+        return Arc(Point(a, b), c, d, e)
+
+    def __iter__(self):
+        for i in range(len(self.kinds)):
+            yield self[i]
+
+    def _apply(self, point_fn, radius_fn=_same, angle_fn=_same):
+        numpy = _vectorized(len(self.kinds))
+        if numpy is not None:
+            return self._apply_vectorized(numpy, point_fn, radius_fn, angle_fn)
+        data, n = array('d', self.data), self.STRIDE
+        for i, kind in enumerate(self.kinds):
+            j = n * i
+            data[j], data[j + 1] = point_fn(data[j], data[j + 1])
+            if kind == LINE:
+                data[j + 2], data[j + 3] = point_fn(data[j + 2], data[j + 3])
+            else:
+                data[j + 2] = radius_fn(data[j + 2])
+                data[j + 3], data[j + 4] = angle_fn(data[j + 3]), angle_fn(data[j + 4])
+        return SegmentArray(self.kinds, data)
+
+    def _apply_vectorized(self, numpy, point_fn, radius_fn, angle_fn):
+        # the same functions, given columns of records instead of numbers
+        records = numpy.frombuffer(self.data, dtype=numpy.float64).reshape(-1, self.STRIDE).copy()
+        arcs = numpy.frombuffer(self.kinds, dtype=numpy.uint8) == ARC
+        lines = ~arcs
+        records[:, 0], records[:, 1] = point_fn(records[:, 0], records[:, 1])
+        records[lines, 2], records[lines, 3] = point_fn(records[lines, 2], records[lines, 3])
+        records[arcs, 2] = radius_fn(records[arcs, 2])
+        records[arcs, 3], records[arcs, 4] = angle_fn(records[arcs, 3]), angle_fn(records[arcs, 4])
+        data = array('d')
+        _frombytes(data, _tobytes(records))
+        return SegmentArray(self.kinds, data)
+
+    def translate(self, v):
+        """
+        >>> SegmentArray.from_segments([LineSegment(Point(0, 0), Point(1, 0))]).translate(Point(0, 1))[0]
+        LineSegment((0.0,1.0), (1.0,1.0))
+        """
+        dx, dy = v.x, v.y
+        return self._apply(lambda x, y: (x + dx, y + dy))
+
+    def scale(self, k):
+        """
+        Uniform scaling around the origin, k must be positive.
+        >>> SegmentArray.from_segments([Arc(Point(1, 0), 1, 0, math.pi)]).scale(2)[0]
+        Arc((2.0,0.0),2.0,0.0,180.0)
+        """
+        if k <= 0:
+            raise ValueError(k)
+        return self._apply(lambda x, y: (k * x, k * y), lambda r: k * r)
+
+    def rotate(self, theta, about=None):
+        """
+        >>> sa = SegmentArray.from_segments([Arc(Point(1, 0), 1, 0, math.pi)])
+        >>> sa.rotate(math.pi / 2)[0]
+        Arc((6.12323399574e-17,1.0),1.0,90.0,270.0)
+        """
+        c, s = math.cos(theta), math.sin(theta)
+        ox, oy = (0., 0.) if about is None else (about.x, about.y)
+
+        def point_fn(x, y):
+            x, y = x - ox, y - oy
+            return ox + c * x - s * y, oy + s * x + c * y
+        return self._apply(point_fn, angle_fn=lambda a: a + theta)
+
+    def transform(self, matrix):
+        """
+        The same 2x3 matrices as Shape.transform().
+        >>> sa = SegmentArray.from_segments([Arc(Point(1, 0), 1, 0, math.pi)])
+        >>> sa.transform((-1, 0, 0, 1, 0, 0))[0]
+        Arc((-1.0,0.0),1.0,180.0,0.0)
+        """
+        a, b, c, d, e, f = matrix
+        k, phi = math.hypot(a, c), math.atan2(c, a)
+        angle_fn = (lambda t: phi - t) if a * d - b * c < 0 else (lambda t: t + phi)
+        return self._apply(lambda x, y: (a * x + b * y + e, c * x + d * y + f), lambda r: k * r, angle_fn)
+
+    def flatten(self, tolerance):
+        """
+        Every arc record replaced by line records, as Arc.flatten() would
+        make them. This is a plain loop over the records, with no NumPy
+        path; it saves making a Point, LineSegment or Arc for each one.
+        >>> sa = SegmentArray.from_shape(Shape([Point(0, 0), Point(2, 0)], [1, None]))
+        >>> flat = sa.flatten(0.1)
+        >>> len(flat), sorted(set(flat.kinds))
+        (5, [0])
+        """
+        kinds, data, n = array('B'), array('d'), self.STRIDE
+        tolerance = float(tolerance)
+        for i, kind in enumerate(self.kinds):
+            record = self.data[n * i:n * (i + 1)]
+            if kind == LINE:
+                kinds.append(LINE)
+                data.extend(record)
+                continue
+            cx, cy, r, start, finish = record
+            offsets = _arc_offsets(r, start, finish, tolerance)
+            x, y = cx + offsets[0][0], cy + offsets[0][1]
+            for dx, dy in offsets[1:]:
+                kinds.append(LINE)
+                data.extend((x, y, cx + dx, cy + dy, 0.))
+                x, y = cx + dx, cy + dy
+        return SegmentArray(kinds, data)
+
+    def map(self, tfm):
+        """
+        Move every record into PostScript coordinates with one pass.
+        >>> from noodle import PSTransform
+        >>> SegmentArray.from_shape(Shape([Point(0, 0), Point(2, 0)], [1, None])).map(PSTransform()).data
+        array('d', [378.0, 396.0, 72.0, 3.141592653589793, 0.0, 450.0, 396.0, 306.0, 396.0, 0.0])
+        """
+        k = tfm.SCALEFACTOR
+        ox, oy = tfm.ORIGIN.x - k * tfm.ZERO.x, tfm.ORIGIN.y - k * tfm.ZERO.y
+        return self._apply(lambda x, y: (ox + k * x, oy + k * y), lambda r: k * r)
+
+    def start_points(self):
+        """
+        >>> SegmentArray.from_shape(Shape([Point(0, 0), Point(2, 0)], [1, None])).start_points()
+        PointArray([(0.0,1.22464679915e-16), (2.0,0.0)])
+        """
+        pa, n = PointArray(), self.STRIDE
+        for i, kind in enumerate(self.kinds):
+            a, b, c, d = self.data[n * i:n * i + 4]
+            if kind == LINE:
+                pa.xs.append(a)
+                pa.ys.append(b)
+            else:
+                pa.xs.append(a + c * math.cos(d))
+                pa.ys.append(b + c * math.sin(d))
+        return pa
+
+    def bbox(self):
+        """
+        The box around all the segments, from the records; only the arcs
+        are made into Arcs along the way.
+        >>> from noodle import rectangle, circle
+        >>> SegmentArray.from_shape(rectangle(0, 0, 1, 2).translate(Point(3, 0))).bbox()
+        (2.0, -2.0, 4.0, 2.0)
+        >>> SegmentArray.from_shape(circle(1, 0, 1)).bbox()
+        (0.0, -1.0, 2.0, 1.0)
+        """
+        n, data, boxes = self.STRIDE, self.data, []
+        for i, kind in enumerate(self.kinds):
+            a, b, c, d, e = data[n * i:n * (i + 1)]
+            if kind == LINE:
+                boxes.append((min(a, c), min(b, d), max(a, c), max(b, d)))
+            else:
+                boxes.append(Arc(Point(a, b), c, d, e).bbox())
+        return spatial.union(boxes) if boxes else (0., 0., 0., 0.)
+
+
+# a SegmentArray record on disk, as emitters.BinaryWriter and partstore
+# write them: a byte for the kind and the five doubles, little-endian
+RECORD = struct.Struct('<B5d')
+
+
+def read_records(buf, offset, count):
+    """
+    The count records starting at offset in buf, as a SegmentArray.
+    """
+    sa = SegmentArray()
+    for k in range(count):
+        record = RECORD.unpack_from(buf, offset + k * RECORD.size)
+        sa.kinds.append(record[0])
+        sa.data.extend(record[1:])
+    return sa
+
+
+class StoredShape(Shape):
+    """
+    A shape whose segments stay in a mapped file of records until
+    something reads them. Its bounding box is known without reading them.
+    Setting its segments cuts it loose from the file, and so does the file
+    being closed, after which a shape that was never read can't be.
+    >>> from noodle import rectangle
+    >>> view = StoredShape(None, 0, 0, (0., 0., 0., 0.))
+    >>> view.segments = rectangle(0, 0, 1, 1).segments
+    >>> view.segments[0], len(view.records()), view.box
+    (LineSegment((-1,-1), (-1,1)), 4, (-1, -1, 1, 1))
+    """
+    def __init__(self, buf, offset, count, box):
+        self.buf, self.offset, self.count, self.box = buf, offset, count, box
+        self.matrix, self._base, self._segments = None, None, None
+
+    @property
+    def base(self):
+        if self._base is None:
+            if self.buf is None:
+                raise ValueError('the file this shape was stored in is closed')
+            self._base = list(read_records(self.buf, self.offset, self.count))
+        return self._base
+
+    @base.setter
+    def base(self, segments):
+        self._base, self.buf = segments, None
+        self.box = spatial.union(s.bbox() for s in segments) if segments else (0., 0., 0., 0.)
+
+    @property
+    def segments(self):
+        if self._segments is None:
+            self._segments = self.base
+        return self._segments
+
+    @segments.setter
+    def segments(self, segments):
+        Shape.segments.fset(self, segments)
+
+    def records(self):
+        """
+        The segments as a SegmentArray, read straight from the file if they
+        haven't been read yet.
+        """
+        if self._base is None and self.buf is not None:
+            return read_records(self.buf, self.offset, self.count)
+        return SegmentArray.from_segments(self.base)
+
+    def detach(self):
+        """
+        Let go of the file, which is about to be closed.
+        """
+        self.buf = None
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,300 @@
+"""
+Lay out many copies of many shapes on as few sheets as possible.
+
+Every part is drawn onto a grid of cells of side resolution, either as its
+bounding box or as its true outline, grown by the spacing to be left
+between parts. A sheet keeps the same kind of grid, with one Python int per
+row used as a bit set, so checking whether a part fits somewhere is a few
+shifts and ands per row and doesn't depend on how many parts are already
+placed. Parts go in largest first, each at the lowest and then leftmost
+spot where it fits in any of its allowed rotations, on the first sheet that
+has room.
+
+    layout = nest([(peg, 40), (slide, 6)], 24, 12)
+    for sheet in layout.sheet_shapes():
+        ...
+
+Sheet coordinates have the origin in the middle of the sheet, the same as
+PSTransform(width, height).
+"""
+
+import math
+import random
+
+from noodle import EPSILON, Point
+from geomarray import SegmentArray
+import spatial
+
+
+class Mask(object):
+    """
+    A shape drawn on a grid: rows[i] has bit j set if cell (i, j) is used.
+    Row 0 is at the bottom and bit 0 at the left.
+    """
+    def __init__(self, rows, width, origin):
+        self.rows, self.width, self.origin = rows, width, origin
+        self.height = len(rows)
+        # each row as (lo, hi) runs of set bits
+        self.runs = [_runs(row) for row in rows]
+
+    def area(self):
+        return sum(bin(row).count('1') for row in self.rows)
+
+
+def _runs(row):
+    runs, j = [], 0
+    while row >> j:
+        if (row >> j) & 1:
+            k = j
+            while (row >> k) & 1:
+                k += 1
+            runs.append((j, k - 1))
+            j = k
+        else:
+            j += 1
+    return runs
+
+
+def _smear(x, width):
+    # x | x >> 1 | ... | x >> (width - 1), by doubling
+    done = 1
+    while done < width:
+        step = min(done, width - done)
+        x |= x >> step
+        done += step
+    return x
+
+
+def _dilate(rows, cells):
+    if cells <= 0:
+        return rows
+    wide = [_smear(row << cells, 2 * cells + 1) for row in rows]
+    out = []
+    for i in range(len(wide)):
+        row = 0
+        for k in range(max(0, i - cells), min(len(wide), i + cells + 1)):
+            row |= wide[k]
+        out.append(row)
+    return out
+
+
+def rasterize(shape, resolution, spacing=0., outline=True):
+    """
+    Draw the shape on a grid, grown by half the spacing on every side so
+    that two masks that don't overlap leave at least the spacing between
+    their parts.
+    >>> from noodle import rectangle
+    >>> mask = rasterize(rectangle(0, 0, 1, 0.5), 0.5)
+    >>> mask.width, mask.height, mask.area()
+    (4, 2, 8)
+    """
+    xmin, ymin, xmax, ymax = spatial.union(shape.bboxes())
+    pad = int(math.ceil(0.5 * spacing / resolution))
+    ox, oy = xmin - pad * resolution, ymin - pad * resolution
+    cols = max(int(math.ceil((xmax - xmin) / resolution - EPSILON)), 1)
+    nrows = max(int(math.ceil((ymax - ymin) / resolution - EPSILON)), 1)
+    if not outline:
+        rows = [(1 << cols) - 1] * nrows
+    else:
+        rows = [0] * nrows
+        # cells whose centers are inside
+        centers = [Point(xmin + (j + .5) * resolution, ymin + (i + .5) * resolution)
+                   for i in range(nrows) for j in range(cols)]
+        for n, inside in enumerate(shape.contains_many(centers)):
+            if inside:
+                rows[n // cols] |= 1 << (n % cols)
+        # and cells the outline passes through
+        for segment in shape.segments:
+            for pt in _samples(segment, 0.5 * resolution):
+                i = min(max(int((pt.y - ymin) / resolution), 0), nrows - 1)
+                j = min(max(int((pt.x - xmin) / resolution), 0), cols - 1)
+                rows[i] |= 1 << j
+    rows = [0] * pad + rows + [0] * pad
+    rows = _dilate(rows, pad)
+    return Mask(rows, cols + 2 * pad, Point(ox, oy))
+
+
+def _samples(segment, step):
+    p1, p2 = segment.start_point(), segment.end_point()
+    if hasattr(segment, 'angle_range'):
+        a, b = segment.angle_range.start, segment.angle_range.finish
+        n = int(math.ceil(segment.radius * abs(b - a) / step)) + 1
+        return [segment.angle_to_point(a + (b - a) * k / float(n)) for k in range(n + 1)]
+    n = int(math.ceil(abs(p2 - p1) / step)) + 1
+    return [Point(p1.x + (p2.x - p1.x) * k / float(n), p1.y + (p2.y - p1.y) * k / float(n))
+            for k in range(n + 1)]
+
+
+class Sheet(object):
+    """
+    The occupancy grid of one sheet.
+    >>> sheet = Sheet(4, 3)
+    >>> m = Mask([3, 3], 2, None)
+    >>> sheet.find(m), sheet.place(m, 0, 0), sheet.find(m)
+    ((0, 0), None, (0, 2))
+    """
+    def __init__(self, cols, nrows):
+        self.cols, self.nrows = cols, nrows
+        self.rows = [0] * nrows
+
+    def find(self, mask):
+        """
+        The lowest, then leftmost, (row, column) where the mask fits, or None.
+        """
+        if mask.width > self.cols or mask.height > self.nrows:
+            return None
+        allowed = (1 << (self.cols - mask.width + 1)) - 1
+        for r in range(self.nrows - mask.height + 1):
+            blocked = 0
+            for k, runs in enumerate(mask.runs):
+                occupied = self.rows[r + k]
+                if occupied:
+                    for lo, hi in runs:
+                        blocked |= _smear(occupied, hi - lo + 1) >> lo
+                if blocked & allowed == allowed:
+                    break
+            free = allowed & ~blocked
+            if free:
+                return r, (free & -free).bit_length() - 1
+        return None
+
+    def place(self, mask, r, c):
+        for k, row in enumerate(mask.rows):
+            self.rows[r + k] |= row << c
+
+    def top(self):
+        used = [i for i, row in enumerate(self.rows) if row]
+        return used[-1] + 1 if used else 0
+
+
+class Placement(object):
+    def __init__(self, part, copy, rotation, offset):
+        self.part, self.copy, self.rotation, self.offset = part, copy, rotation, offset
+
+    def __repr__(self):
+        return 'Placement({0}, {1}, {2}, {3})'.format(self.part, self.copy, self.rotation, self.offset)
+
+
+def _pack(job):
+    # runs in a worker process as well, so it only sees ints and tuples
+    order, data, cols, nrows = job
+    masks = [[Mask(rows, width, None) for rows, width in part] for part in data]
+    sheets, layout = [], []
+    for item in order:
+        part = item[0]
+        spot = None
+        for s, sheet in enumerate(sheets):
+            spot = _best(sheet, masks[part])
+            if spot is not None:
+                break
+        if spot is None:
+            sheets.append(Sheet(cols, nrows))
+            layout.append([])
+            s, spot = len(sheets) - 1, _best(sheets[-1], masks[part])
+            if spot is None:
+                raise ValueError('part {0} does not fit on the sheet'.format(part))
+        rotation, r, c = spot
+        sheets[s].place(masks[part][rotation], r, c)
+        layout[s].append(item + (rotation, r, c))
+    return layout, [sheet.top() for sheet in sheets]
+
+
+def _best(sheet, rotations):
+    best = None
+    for n, mask in enumerate(rotations):
+        spot = sheet.find(mask)
+        if spot is not None and (best is None or spot < best[1:]):
+            best = (n,) + spot
+    return best
+
+
+class Layout(object):
+    def __init__(self, shapes, rotations, masks, placements, width, height, resolution):
+        self.shapes, self.rotations = shapes, rotations
+        self.width, self.height, self.resolution = width, height, resolution
+        self.sheets = []
+        for sheet in placements:
+            self.sheets.append([])
+            for part, copy, rotation, r, c in sheet:
+                mask = masks[part][rotation]
+                x = -0.5 * width + c * resolution - mask.origin.x
+                y = -0.5 * height + r * resolution - mask.origin.y
+                self.sheets[-1].append(Placement(part, copy, rotations[rotation], Point(x, y)))
+
+    def sheet_shapes(self):
+        """
+        For each sheet, the placed shapes moved into sheet coordinates.
+        """
+        for sheet in self.sheets:
+            yield [self.place(p) for p in sheet]
+
+    def place(self, placement):
+        records = SegmentArray.from_shape(self.shapes[placement.part])
+        if placement.rotation:
+            records = records.rotate(math.radians(placement.rotation))
+        return records.translate(placement.offset).to_shape()
+
+
+def _orderings(parts, masks, count, seed):
+    items = [(part, copy) for part, quantity in enumerate(parts) for copy in range(quantity)]
+    area = [masks[p][0].area() for p in range(len(parts))]
+    height = [masks[p][0].height for p in range(len(parts))]
+    width = [masks[p][0].width for p in range(len(parts))]
+    orders = [sorted(items, key=lambda item: -area[item[0]]),
+              sorted(items, key=lambda item: (-height[item[0]], -width[item[0]])),
+              sorted(items, key=lambda item: (-width[item[0]], -height[item[0]]))]
+    rng = random.Random(seed)
+    while len(orders) < count:
+        order = list(orders[0])
+        # nudge the area ordering about a little
+        for n in range(len(order) - 1):
+            if rng.random() < 0.3:
+                order[n], order[n + 1] = order[n + 1], order[n]
+        orders.append(order)
+    return orders[:count]
+
+
+def nest(parts, width, height, resolution=0.0625, spacing=0.125, rotations=(0, 90, 180, 270),
+         outline=True, orderings=1, processes=None, seed=0):
+    """
+    Place each (shape, quantity) in parts on sheets of the given size. With
+    orderings > 1, several part orders are tried and the one needing the
+    fewest sheets wins; processes > 1 tries them in a process pool.
+    >>> from noodle import rectangle, circle
+    >>> layout = nest([(rectangle(0, 0, 2, 1), 3), (circle(0, 0, 0.5), 4)], 8.5, 4, spacing=0)
+    >>> [len(sheet) for sheet in layout.sheets]
+    [7]
+    >>> sorted(set(p.rotation for p in layout.sheets[0] if p.part == 0))
+    [0]
+    >>> layout = nest([(rectangle(0, 0, 2, 1), 4)], 4.5, 4.5, orderings=3)
+    >>> [len(sheet) for sheet in layout.sheets]
+    [2, 2]
+    """
+    shapes = [shape for shape, quantity in parts]
+    quantities = [quantity for shape, quantity in parts]
+    masks = []
+    for shape in shapes:
+        records = SegmentArray.from_shape(shape)
+        masks.append([rasterize(records.rotate(math.radians(a)).to_shape() if a else shape,
+                                resolution, spacing, outline) for a in rotations])
+    cols, nrows = int(width / resolution), int(height / resolution)
+    data = [[(m.rows, m.width) for m in part] for part in masks]
+    jobs = [(order, data, cols, nrows) for order in _orderings(quantities, masks, orderings, seed)]
+    if processes and processes > 1 and len(jobs) > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(_pack, jobs)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [_pack(job) for job in jobs]
+    # fewest sheets, then the least used of the last sheet
+    placements, tops = min(results, key=lambda result: (len(result[1]), result[1][-1:]))
+    return Layout(shapes, rotations, masks, placements, width, height, resolution)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -1,20 +1,70 @@
 import math
+from collections import namedtuple, OrderedDict
+
+from predicates import side
 
 
 EPSILON = 1.e-8    # a teeny number, because floating point is inexact
 PI = math.pi
 TWO_PI = 2 * math.pi
 
+# where a point lies relative to a shape
+INSIDE, OUTSIDE, ON_BOUNDARY = 'inside', 'outside', 'on boundary'
+
 
 def nearly_zero(x):
     return abs(x) < EPSILON
 
 
-class Vector:
+CacheInfo = namedtuple('CacheInfo', 'hits misses maxsize currsize')
+
+
+def lru_cache(maxsize=128):
+    """
+    Remember the results of the last maxsize distinct calls, like
+    functools.lru_cache, which Python 2 doesn't have.
+    >>> @lru_cache(maxsize=2)
+    ... def square(x):
+    ...     return x * x
+    >>> square(2), square(3), square(2), square(4), square(3)
+    (4, 9, 4, 16, 9)
+    >>> square.cache_info()
+    CacheInfo(hits=1, misses=4, maxsize=2, currsize=2)
+    """
+    def decorate(f):
+        cache, counts = OrderedDict(), [0, 0]
+
+        def wrapper(*args):
+            try:
+                result = cache.pop(args)
+                counts[0] += 1
+            except KeyError:
+                result = f(*args)
+                counts[1] += 1
+                if len(cache) >= maxsize:
+                    cache.popitem(last=False)
+            cache[args] = result
+            return result
+
+        def cache_clear():
+            cache.clear()
+            counts[:] = [0, 0]
+        wrapper.cache_info = lambda: CacheInfo(counts[0], counts[1], maxsize, len(cache))
+        wrapper.cache_clear = cache_clear
+        wrapper.__doc__, wrapper.__name__ = f.__doc__, f.__name__
+        return wrapper
+    return decorate
+
+
+class Vector(object):
     """
     >>> isinstance(Vector, object)
     True
+    >>> hasattr(Vector(1, 2), '__dict__')
+    False
     """
+    __slots__ = ('x', 'y')
+
     def __init__(self, x, y):
         """
         >>> v = Vector(1, 2)
@@ -63,7 +113,7 @@ class Vector:
         >>> Vector(2, 3) - Vector(5, 7)
         (-3,-4)
         """
-        return self + other.__neg__()
+        return Vector(self.x - other.x, self.y - other.y)
 
     def __eq__(self, other):
         """
@@ -79,7 +129,8 @@ class Vector:
         TypeError: 3.14159265359
         """
         if isinstance(other, Vector):
-            return abs(self - other) < EPSILON
+            dx, dy = self.x - other.x, self.y - other.y
+            return dx * dx + dy * dy < EPSILON * EPSILON
         else:
             raise TypeError(other)
 
@@ -141,30 +192,97 @@ class Vector:
 
 
 class Point(Vector):
+    __slots__ = ()
+
     def __add__(self, other):
         assert isinstance(other, Vector) and not isinstance(other, Point)
         return Point(self.x + other.x, self.y + other.y)
 
     def __sub__(self, other):
+        """
+        >>> Point(2, 3) - Point(5, 7)
+        (-3,-4)
+        """
         assert isinstance(other, Point)
-        return Vector.__sub__(self, other)
+        return Vector(self.x - other.x, self.y - other.y)
+
+
+_float_text = '{0}'.format
+_grid_texts = {}
 
 
 class PSTransform:
     SCALEFACTOR = 72
+    WIDTH, HEIGHT = 8.5, 11     # sheet size in inches
     ZERO = Point(0, 0)
     ORIGIN = Point(SCALEFACTOR * 4.25, SCALEFACTOR * 5.5)  # center of 8.5x11 sheet of paper
     OFFSET = ORIGIN - ZERO
+    GRID = 64   # grid_text() covers points this many to the inch
+    _text = None
+
+    def __init__(self, width=None, height=None):
+        """
+        Other sheet sizes keep the origin in the middle of the sheet.
+        >>> tfm = PSTransform(24, 12)
+        >>> tfm.ORIGIN, tfm.bounding_box()
+        ((864.0,432.0), (0, 0, 1728, 864))
+        """
+        if width is not None or height is not None:
+            self.WIDTH = self.WIDTH if width is None else width
+            self.HEIGHT = self.HEIGHT if height is None else height
+            self.ORIGIN = Point(0.5 * self.SCALEFACTOR * self.WIDTH, 0.5 * self.SCALEFACTOR * self.HEIGHT)
+            self.OFFSET = self.ORIGIN - self.ZERO
+
+    def bounding_box(self):
+        """
+        The whole sheet in PostScript points, for the %%BoundingBox comment.
+        >>> PSTransform().bounding_box()
+        (0, 0, 612, 792)
+        """
+        return (0, 0, int(math.ceil(self.SCALEFACTOR * self.WIDTH)),
+                int(math.ceil(self.SCALEFACTOR * self.HEIGHT)))
 
     def scale(self, distance):
         return self.SCALEFACTOR * distance
 
     def map(self, xy):
-        return self.ORIGIN + self.SCALEFACTOR * (xy - self.ZERO)
+        """
+        >>> PSTransform().map(Point(1, -1))
+        (378.0,324.0)
+        """
+        k = self.SCALEFACTOR
+        return Point(self.ORIGIN.x + k * (xy.x - self.ZERO.x),
+                     self.ORIGIN.y + k * (xy.y - self.ZERO.y))
+
+    def grid_text(self, text=None):
+        """
+        A dict from page coordinate to text(coordinate) for every point of
+        the sheet on a 1/GRID inch grid, which is where most coordinates in
+        a kit fall, so they can be looked up rather than formatted. Tables
+        are built the first time they are asked for and shared by every
+        sheet of the same size; text is '{0}'.format by default.
+        >>> table = PSTransform().grid_text()
+        >>> len(table), table[306.0], table[PSTransform().map(Point(1. / 64, 0)).x]
+        (704, '306.0', '307.125')
+        """
+        text = text or _float_text
+        key = (self.SCALEFACTOR, self.GRID, self.WIDTH, self.HEIGHT, text)
+        table = _grid_texts.get(key)
+        if table is None:
+            step = float(self.SCALEFACTOR) / self.GRID
+            # zero is left out, as -0.0 would find it and format differently
+            table = _grid_texts[key] = dict(
+                (j * step, text(j * step)) for j in range(1, int(self.GRID * max(self.WIDTH, self.HEIGHT)) + 1))
+        return table
 
     def format(self, str, pt):
         pt = self.map(pt)
-        return str.format(pt.x, pt.y)
+        text = self._text or self._grid()
+        return str.format(text.get(pt.x, pt.x), text.get(pt.y, pt.y))
+
+    def _grid(self):
+        self._text = self.grid_text()
+        return self._text
 
 
 class LineSegment:
@@ -175,10 +293,16 @@ class LineSegment:
         """
         >>> tfm = PSTransform()
         >>> LineSegment(Point(0, 0), Point(1, 0)).postscript(tfm)
-        '306.0 396.0 lineto 378.0 396.0 moveto'
+        '306.0 396.0 moveto 378.0 396.0 lineto'
+        """
+        return (tfm.format('{0} {1} moveto ', self.p1) +
+                tfm.format('{0} {1} lineto', self.p2))
+
+    def emit(self, emitter):
         """
-        return (tfm.format('{0} {1} lineto ', self.p1) +
-                tfm.format('{0} {1} moveto', self.p2))
+        Carry the current path on to the end of the segment; see emitters.py.
+        """
+        emitter.line_to(self.p2)
 
     def __repr__(self):
         """
@@ -187,6 +311,78 @@ class LineSegment:
         """
         return 'LineSegment({0}, {1})'.format(self.p1, self.p2)
 
+    def start_point(self):
+        return self.p1
+
+    def end_point(self):
+        return self.p2
+
+    def passes_through(self, pt):
+        """
+        >>> seg = LineSegment(Point(0, 0), Point(2, 2))
+        >>> seg.passes_through(Point(1, 1)), seg.passes_through(Point(3, 3))
+        (True, False)
+        >>> dot = LineSegment(Point(1, 1), Point(1, 1))
+        >>> dot.passes_through(Point(1, 1)), dot.passes_through(Point(0, 0))
+        (True, False)
+        """
+        if self.degenerate():
+            return self.p1 == pt
+        r = self.p2 - self.p1
+        t = min(1., max(0., (pt - self.p1).dot(r) / float(r.square())))
+        return self.param_to_point(t) == pt
+
+    def degenerate(self):
+        """
+        True if the ends are too close together for the segment to have a
+        direction, so it is only a point.
+        """
+        r = self.p2 - self.p1
+        return r.square() < EPSILON * EPSILON
+
+    def reversed(self):
+        return LineSegment(self.p2, self.p1)
+
+    def midpoint(self):
+        return Point(0.5 * (self.p1.x + self.p2.x), 0.5 * (self.p1.y + self.p2.y))
+
+    def tangent(self, pt):
+        return self.p2 - self.p1
+
+    def area_term(self):
+        """
+        This segment's share of the integral of (x dy - y dx) / 2 around a
+        contour, which adds up to the contour's signed area.
+        """
+        return 0.5 * (self.p1.x * self.p2.y - self.p2.x * self.p1.y)
+
+    def split(self, points):
+        """
+        Cut the segment at the given points, which are assumed to lie on it.
+        Points at either end, or repeated, make no extra pieces.
+        >>> LineSegment(Point(0, 0), Point(4, 0)).split([Point(3, 0), Point(1, 0), Point(4, 0)])
+        [LineSegment((0,0), (1,0)), LineSegment((1,0), (3,0)), LineSegment((3,0), (4,0))]
+        """
+        r = self.p2 - self.p1
+        k = 1. / r.square()
+        cuts = sorted(((pt - self.p1).dot(r) * k, pt) for pt in points
+                      if not (pt == self.p1 or pt == self.p2))
+        pieces, last = [], self.p1
+        for t, pt in cuts:
+            if 0 < t < 1 and not pt == last:
+                pieces.append(LineSegment(last, pt))
+                last = pt
+        pieces.append(LineSegment(last, self.p2))
+        return pieces
+
+    def bbox(self):
+        """
+        >>> LineSegment(Point(1, 5), Point(3, -2)).bbox()
+        (1, -2, 3, 5)
+        """
+        p1, p2 = self.p1, self.p2
+        return (min(p1.x, p2.x), min(p1.y, p2.y), max(p1.x, p2.x), max(p1.y, p2.y))
+
     def param_to_point(self, param):
         """
         >>> p1, p2 = Point(0, 0), Point(1, 0)
@@ -232,8 +428,11 @@ class LineSegment:
         >>> seg.colinear(LineSegment(Point(0, 1), Point(1, 2)))
         False
         """
-        p = other.p1
-        return self.parallel(other) and p == self.param_to_point(self.point_to_param(p))
+        return (side(self.p1, self.p2, other.p1, EPSILON) == 0 and
+                side(self.p1, self.p2, other.p2, EPSILON) == 0)
+
+    def flatten(self, tolerance):
+        return [self]
 
     def intersect(self, other):
         """
@@ -255,36 +454,68 @@ class LineSegment:
         Traceback (most recent call last):
             ...
         TypeError: foo
+
+        A segment with both ends in one place is a point, and meets the
+        other segment if it lies on it, whichever one is asked.
+        >>> dot, seg = LineSegment(Point(1,0), Point(1,0)), LineSegment(Point(0,0), Point(2,0))
+        >>> dot.intersect(seg), seg.intersect(dot)
+        ((1,0), (1,0))
+        >>> far = LineSegment(Point(0,0), Point(0,2))
+        >>> dot.intersect(far), far.intersect(dot)
+        (None, None)
+        >>> dot.intersect(LineSegment(Point(1,0), Point(1,0))), dot.intersect(LineSegment(Point(3,0), Point(3,0)))
+        ((1,0), None)
         """
         if isinstance(other, Arc):
             return other.intersect(self)
         elif not isinstance(other, LineSegment):
             raise TypeError(other)
-        S = (self.p2 - self.p1).scale(1.)
-        T = (other.p2 - other.p1).scale(1.)
-        denom = S.y * T.x - S.x * T.y
-        if nearly_zero(denom):
-            if nearly_zero(S.cross(other.p1 - self.p1)):
-                q1 = (other.p1 - self.p1) * S / (S * S)
-                q2 = (other.p2 - self.p1) * S / (S * S)
-                if q2 < q1:
-                    q1, q2 = q2, q1
-                left, right = max(0, q1), min(1, q2)
-                if left < right:
-                    return LineSegment(self.p1 + left * S, self.p1 + right * S)
+        if self.degenerate():
+            return self.p1 if other.passes_through(self.p1) else None
+        if other.degenerate():
+            return other.p1 if self.passes_through(other.p1) else None
+        # Which side of each line the other's ends are on decides whether
+        # they meet, so an end touching the other segment always counts,
+        # and the answer is the same whichever segment is asked.
+        p1, p2, q1, q2 = self.p1, self.p2, other.p1, other.p2
+        o1, o2 = side(p1, p2, q1, EPSILON), side(p1, p2, q2, EPSILON)
+        if o1 * o2 > 0:
+            return None
+        S = (p2 - p1).scale(1.)
+        if o1 == o2 == 0:
+            q1 = (q1 - p1) * S / (S * S)
+            q2 = (q2 - p1) * S / (S * S)
+            if q2 < q1:
+                q1, q2 = q2, q1
+            left, right = max(0, q1), min(1, q2)
+            if left < right:
+                return LineSegment(p1 + left * S, p1 + right * S)
+            return None
+        o3, o4 = side(q1, q2, p1, EPSILON), side(q1, q2, p2, EPSILON)
+        if o3 * o4 > 0:
             return None
-        a = (T.x * (other.p1.y - self.p1.y) - T.y * (other.p1.x - self.p1.x)) / denom
-        b = (S.x * (other.p1.y - self.p1.y) - S.y * (other.p1.x - self.p1.x)) / denom
-        if 0 <= a <= 1 and 0 <= b <= 1:
-            return self.p1 + a * S
-        # else return None because we don't intersect
+        # a vertex lying on the other segment is the crossing itself
+        for o, pt in ((o1, q1), (o2, q2), (o3, p1), (o4, p2)):
+            if o == 0:
+                return pt
+        T = (q2 - q1).scale(1.)
+        a = (T.x * (q1.y - p1.y) - T.y * (q1.x - p1.x)) / (S.y * T.x - S.x * T.y)
+        return p1 + min(1., max(0., a)) * S
 
 
 def normalize(angle, a, b):
-    while angle < a:
-        angle += TWO_PI
-    while angle > b:
-        angle -= TWO_PI
+    """
+    Add whole turns until the angle is no less than a, then take them away
+    until it is no more than b, without looping.
+    >>> normalize(7 * TWO_PI + 1, 0, TWO_PI) == normalize(1, 0, TWO_PI)
+    True
+    >>> normalize(-1, 0, TWO_PI) == TWO_PI - 1
+    True
+    """
+    if angle < a:
+        angle += TWO_PI * math.ceil((a - angle) / TWO_PI)
+    if angle > b:
+        angle -= TWO_PI * math.ceil((angle - b) / TWO_PI)
     return angle
 
 
@@ -340,7 +571,11 @@ class AngleRange:
 
     def intersection(self, other):
         """
+        Ranges that only touch at an end don't overlap.
         >>> AngleRange(0, 1).intersection(AngleRange(2, 3))
+        >>> AngleRange(-PI / 2, -PI).intersection(AngleRange(PI, PI / 2))
+        >>> AngleRange(-PI / 2, PI / 2).intersection(AngleRange(PI, 2.5 * PI))
+        <AngleRange 270.0 450.0>
         """
         a, b = min(self.start, self.finish), max(self.start, self.finish)
         c, d = min(other.start, other.finish), max(other.start, other.finish)
@@ -348,11 +583,12 @@ class AngleRange:
         a, b = a1, b + a1 - a
         c1 = normalize(c, 0, TWO_PI)
         c, d = c1, d + c1 - c
-        e, f = max(a, c), min(b, d)
-        if f >= e:
-            return AngleRange(e, f)
-        else:
-            return None  # no overlap
+        # either range may wrap past TWO_PI
+        for shift in (0, -TWO_PI, TWO_PI):
+            e, f = max(a, c + shift), min(b, d + shift)
+            if f - e > EPSILON:
+                return AngleRange(e, f)
+        return None  # no overlap
 
 
 class Arc:
@@ -360,14 +596,34 @@ class Arc:
         # angles are in radians, we convert to degrees for Postscript
         assert radius >= 0
         self.center, self.radius, self.angle_range = center, radius, AngleRange(start_angle, end_angle)
+        self._geometry = None
+
+    def geometry(self):
+        """
+        The endpoints, bounding box, direction (+1 counter-clockwise, -1
+        clockwise) and the cosine and sine of both ends of the angle range.
+        They are worked out the first time they're needed and kept, since an
+        arc doesn't change once it's made.
+        """
+        if self._geometry is None:
+            start, finish = self.angle_range.start, self.angle_range.finish
+            cx, cy, r = self.center.x, self.center.y, self.radius
+            cs, ss, cf, sf = math.cos(start), math.sin(start), math.cos(finish), math.sin(finish)
+            p1, p2 = Point(cx + r * cs, cy + r * ss), Point(cx + r * cf, cy + r * sf)
+            self._geometry = (p1, p2, self._bbox(p1, p2), 1 if finish > start else -1, (cs, ss, cf, sf))
+        return self._geometry
 
     def postscript(self, tfm):
         """
         >>> tfm, center = PSTransform(), Point(1, 0)
 
+        The arc is drawn in the direction it runs, with arc when the angle
+        increases (counter-clockwise) and arcn when it decreases, so it
+        carries on from the current point when it is part of a path.
+
         upper half circle
         >>> Arc(center, 1, PI, 0).postscript(tfm)
-        '378.0 396.0 72 0.0 180.0 arc'
+        '378.0 396.0 72 180.0 0.0 arcn'
         >>> Arc(center, 1, 0, PI).postscript(tfm)
         '378.0 396.0 72 0.0 180.0 arc'
 
@@ -375,20 +631,17 @@ class Arc:
         >>> Arc(center, 1, PI, TWO_PI).postscript(tfm)
         '378.0 396.0 72 180.0 360.0 arc'
         >>> Arc(center, 1, TWO_PI, PI).postscript(tfm)
-        '378.0 396.0 72 180.0 360.0 arc'
-
-        %!PS-Adobe-2.0
-        378.0 396.0 72 180.0 0.0 arcn
-        stroke showpage
+        '378.0 396.0 72 360.0 180.0 arcn'
         """
         k = 180. / PI
-        if self.angle_range.clockwise():
-            a, b = self.angle_range.start, self.angle_range.finish
-        else:
-            a, b = self.angle_range.finish, self.angle_range.start
+        a, b = self.angle_range.start, self.angle_range.finish
         return (tfm.format('{0} {1} ', self.center) +
                 '{0} '.format(tfm.scale(abs(self.radius))) +
-                '{0} {1} '.format(k * a, k * b) + 'arc')
+                '{0} {1} '.format(k * a, k * b) + ('arc' if a < b else 'arcn'))
+
+    def emit(self, emitter):
+        r = self.angle_range
+        emitter.arc_to(self.center, self.radius, r.start, r.finish)
 
     @classmethod
     def from_endpoints(cls, p1, p2, radius):
@@ -431,31 +684,134 @@ class Arc:
         Exception: radius is too small for this arc, make it bigger
         """
         # radius > 0 means we go clockwise from p1 to p2, radius < 0 means we go counter-clockwise
-        x = p2 - p1
-        if radius**2 < 0.25 * x.dot(x):
-            raise Exception("radius is too small for this arc, make it bigger")
-        w = (radius**2 - 0.25 * x.dot(x)) ** .5
-        wn = Vector(x.y, -x.x).normalize()
-        if radius * wn.cross(x) < 0:
-            wn = -wn
-        center = p1 + 0.5 * x + w * wn
-
-        def get_angle(p):
-            return math.atan2(p.y, p.x)
-        a, b = get_angle(p1-center), get_angle(p2-center)
-        if radius < 0:
-            while b < a:
-                b += TWO_PI
-        else:
-            while a < b:
-                a += TWO_PI
-        return cls(center, abs(radius), a, b)
+        (dx, dy), a, b = _arc_from_chord(p2.x - p1.x, p2.y - p1.y, radius)
+        return cls(Point(p1.x + dx, p1.y + dy), abs(radius), a, b)
 
     def __repr__(self):
         k = 180. / PI
         start, finish = k * self.angle_range.start, k * self.angle_range.finish
         return 'Arc({0},{1},{2},{3})'.format(self.center, self.radius, start, finish)
 
+    def angle_to_point(self, angle):
+        return Point(self.center.x + self.radius * math.cos(angle),
+                     self.center.y + self.radius * math.sin(angle))
+
+    def start_point(self):
+        """
+        >>> Arc.from_endpoints(Point(0, 0), Point(2, 0), 1).start_point() == Point(0, 0)
+        True
+        """
+        return self.geometry()[0]
+
+    def end_point(self):
+        """
+        >>> Arc.from_endpoints(Point(0, 0), Point(2, 0), 1).end_point() == Point(2, 0)
+        True
+        """
+        return self.geometry()[1]
+
+    def reversed(self):
+        return Arc(self.center, self.radius, self.angle_range.finish, self.angle_range.start)
+
+    def midpoint(self):
+        return self.angle_to_point(0.5 * (self.angle_range.start + self.angle_range.finish))
+
+    def tangent(self, pt):
+        r, direction = pt - self.center, self.geometry()[3]
+        return Vector(-direction * r.y, direction * r.x)
+
+    def area_term(self):
+        """
+        >>> round(Arc(Point(0, 0), 1, 0, TWO_PI).area_term(), 6)
+        3.141593
+        """
+        cx, cy, r = self.center.x, self.center.y, self.radius
+        cs, ss, cf, sf = self.geometry()[4]
+        a, b = self.angle_range.start, self.angle_range.finish
+        return 0.5 * (cx * r * (sf - ss) - cy * r * (cf - cs) + r * r * (b - a))
+
+    def split(self, points):
+        """
+        Cut the arc at the given points, which are assumed to lie on it.
+        >>> Arc(Point(0, 0), 1, 0, PI).split([Point(0, 1)])
+        [Arc((0,0),1,0.0,90.0), Arc((0,0),1,90.0,180.0)]
+        """
+        start, finish = self.angle_range.start, self.angle_range.finish
+        span, direction = abs(finish - start), (1 if finish > start else -1)
+        p1, p2 = self.start_point(), self.end_point()
+        cuts = []
+        for pt in points:
+            if pt == p1 or pt == p2:
+                continue
+            u = (direction * (math.atan2(pt.y - self.center.y, pt.x - self.center.x) - start)) % TWO_PI
+            if 0 < u < span and not nearly_zero(self.radius * (span - u)):
+                cuts.append(u)
+        pieces, last = [], 0.
+        for u in sorted(cuts):
+            if not nearly_zero(self.radius * (u - last)):
+                pieces.append(Arc(self.center, self.radius, start + direction * last, start + direction * u))
+                last = u
+        pieces.append(Arc(self.center, self.radius, start + direction * last, finish))
+        return pieces
+
+    def passes_through(self, pt):
+        """
+        >>> arc = Arc.from_endpoints(Point(0, 0), Point(2, 0), 1)
+        >>> arc.passes_through(Point(1, 1)), arc.passes_through(Point(1, -1))
+        (True, False)
+        >>> arc.passes_through(Point(2, 0))
+        True
+        """
+        if not nearly_zero(abs(pt - self.center) - self.radius):
+            return False
+        return self.included_angle(pt) or pt == self.start_point() or pt == self.end_point()
+
+    def bbox(self):
+        """
+        The box around the endpoints, widened to take in each of the four
+        extreme points of the circle that falls inside the angle range.
+        >>> Arc.from_endpoints(Point(0, 0), Point(2, 0), 1).bbox()
+        (0.0, 0.0, 2.0, 1.0)
+        >>> Arc(Point(0., 0.), 1., 0, TWO_PI).bbox()
+        (-1.0, -1.0, 1.0, 1.0)
+        """
+        return self.geometry()[2]
+
+    def _bbox(self, p1, p2):
+        xmin, xmax = min(p1.x, p2.x), max(p1.x, p2.x)
+        ymin, ymax = min(p1.y, p2.y), max(p1.y, p2.y)
+        a = min(self.angle_range.start, self.angle_range.finish)
+        b = max(self.angle_range.start, self.angle_range.finish)
+        cx, cy, r = self.center.x, self.center.y, self.radius
+        quarter = PI / 2
+        k = int(math.ceil(a / quarter))
+        while k * quarter <= b:
+            xmin, ymin, xmax, ymax = [
+                (xmin, ymin, cx + r, ymax),
+                (xmin, ymin, xmax, cy + r),
+                (cx - r, ymin, xmax, ymax),
+                (xmin, cy - r, xmax, ymax)][k % 4]
+            k += 1
+        return (xmin, ymin, xmax, ymax)
+
+    def flatten(self, tolerance):
+        """
+        Line segments whose ends lie on the arc and which never stray more
+        than tolerance from it. The chord across an angle t sits
+        r * (1 - cos(t / 2)) from the arc (the sagitta), which gives the
+        largest step; no step is more than a quarter turn.
+        >>> [len(Arc(Point(0, 0), 1, 0, PI).flatten(t)) for t in (0.1, 0.01, 0.001)]
+        [4, 12, 36]
+        >>> lines = Arc(Point(0, 0), 1, PI, 0).flatten(0.01)
+        >>> lines[0].p1 == Point(-1, 0), lines[-1].p2 == Point(1, 0), lines[0].p2.y > 0
+        (True, True, True)
+        """
+        r = self.angle_range
+        cx, cy = self.center.x, self.center.y
+        points = [Point(cx + dx, cy + dy)
+                  for dx, dy in _arc_offsets(self.radius, r.start, r.finish, float(tolerance))]
+        return [LineSegment(p, q) for p, q in zip(points, points[1:])]
+
     def intersect(self, other):
         """
         >>> me = Arc.from_endpoints(Point(0,0), Point(2,0), 1)
@@ -466,7 +822,7 @@ class Arc:
         >>> me.intersect(LineSegment(Point(1,0), Point(1,2)))
         (1.0,1.0)
         >>> me.intersect(Arc.from_endpoints(Point(1,0), Point(2,0), 1))
-        [(2.0,1.11022302463e-16)]
+        [(2.0,0.0)]
         >>> me.intersect(Arc.from_endpoints(Point(1,0), Point(3,1), 1.5))
         [(1.56951603584,0.821980221736)]
 
@@ -474,6 +830,7 @@ class Arc:
         >>> Arc(p0, 1, 0, TWO_PI).intersect(Arc(p0, 2, 0, TWO_PI))
         >>> Arc(p0, 1, 0, PI).intersect(Arc(p0, 1, PI/2, 3*PI/2))
         Arc((0,0),1,90.0,180.0)
+        >>> Arc(p0, 1, 0, PI/2).intersect(Arc(p0, 1, PI, 3*PI/2))
         >>> Arc(p0, 1, 0, TWO_PI).intersect(Arc(Point(1, 0), 1, 0, TWO_PI))
         [(0.5,0.866025403784), (0.5,-0.866025403784)]
 
@@ -482,21 +839,32 @@ class Arc:
         (1.0,0.0)
         >>> Arc(p0, 1, 0, TWO_PI).intersect(LineSegment(Point(0.5, 1), Point(0.5, -1)))
         [(0.5,-0.866025403784), (0.5,0.866025403784)]
+
+        A line with both ends in one place meets the arc if the point is on
+        it, whichever of the two is asked.
+        >>> dot = LineSegment(Point(0, 1), Point(0, 1))
+        >>> Arc(p0, 1, 0, PI).intersect(dot), dot.intersect(Arc(p0, 1, 0, PI)), Arc(p0, 1, PI, TWO_PI).intersect(dot)
+        ((0,1), (0,1), None)
         """
+        if isinstance(other, (Arc, LineSegment)) and not _boxes_touch(self.bbox(), other.bbox()):
+            return None
         if isinstance(other, Arc):
             if self.center == other.center:
                 if nearly_zero(self.radius - other.radius):
-                    v = Arc(self.center, self.radius, 0, 0)
-                    v.angle_range = self.angle_range.intersection(other.angle_range)
-                    return v
+                    r = self.angle_range.intersection(other.angle_range)
+                    return None if r is None else Arc(self.center, self.radius, r.start, r.finish)
                 else:
                     return None
             else:
                 # find the two points where the circles intersect
                 # filter them by the angle ranges of both arcs, must be in both to survive
                 # return list of surviving points, or None
-                k = 1. / abs(self.center - other.center)
-                theta = math.atan2(other.center.y - self.center.y, other.center.x - self.center.x)
+                d = abs(other.center - self.center)
+                if d > self.radius + other.radius + EPSILON or d < abs(self.radius - other.radius) - EPSILON:
+                    return None
+                k = 1. / d
+                cos_theta = k * (other.center.x - self.center.x)
+                sin_theta = k * (other.center.y - self.center.y)
                 r1 = k * self.radius
                 r2 = k * other.radius
                 intersections = []
@@ -506,22 +874,25 @@ class Arc:
                 if abs(r1) >= abs(u):
                     v = (r1**2 - u**2) ** .5
                     # Transform u and v back into the original coordinate system.
-                    x1 = self.center.x + (u * math.cos(theta) - v * math.sin(theta)) / k
-                    y1 = self.center.y + (v * math.cos(theta) + u * math.sin(theta)) / k
+                    x1 = self.center.x + (u * cos_theta - v * sin_theta) / k
+                    y1 = self.center.y + (v * cos_theta + u * sin_theta) / k
                     p = Point(x1, y1)
                     if self.included_angle(p) and other.included_angle(p):
-                        intersections.append(Point(x1, y1))
+                        intersections.append(p)
                     if not nearly_zero(r1 - u):
-                        x2 = self.center.x +  (u * math.cos(theta) + v * math.sin(theta)) / k
-                        y2 = self.center.y + (-v * math.cos(theta) + u * math.sin(theta)) / k
+                        x2 = self.center.x + (u * cos_theta + v * sin_theta) / k
+                        y2 = self.center.y + (-v * cos_theta + u * sin_theta) / k
                         p2 = Point(x2, y2)
                         if self.included_angle(p2) and other.included_angle(p2):
                             intersections.append(p2)
                 return intersections or None
         elif isinstance(other, LineSegment):
-            c = (self.center - other.p2).square() - self.radius**2
-            b = 2 * (other.p1 - other.p2).dot(other.p2 - self.center)
-            a = (other.p1 - other.p2).square()
+            if other.degenerate():
+                return other.p1 if self.passes_through(other.p1) else None
+            # roots are parameters along the segment, measured from p1
+            c = (self.center - other.p1).square() - self.radius**2
+            b = 2 * (other.p2 - other.p1).dot(other.p1 - self.center)
+            a = (other.p2 - other.p1).square()
             det = b**2 - 4 * a * c
             if det < 0:
                 return None
@@ -529,9 +900,8 @@ class Arc:
                 pts = [-b / (2. * a)]
             else:
                 pts = [(-b + det**0.5) / (2 * a), (-b - det**0.5) / (2 * a)]
-            pts = map(other.param_to_point,
-                      filter(lambda root: 0 <= root <= 1, pts))
-            pts = filter(self.included_angle, pts)
+            pts = [other.param_to_point(root) for root in pts if 0 <= root <= 1]
+            pts = [pt for pt in pts if self.included_angle(pt)]
             if len(pts) == 0:
                 return None
             elif len(pts) == 1:
@@ -565,22 +935,479 @@ class Arc:
         return math.atan2(r.y, r.x) in self.angle_range
 
 
-class Shape:
+def _boxes_touch(a, b):
+    return (a[0] <= b[2] + EPSILON and b[0] <= a[2] + EPSILON and
+            a[1] <= b[3] + EPSILON and b[1] <= a[3] + EPSILON)
+
+
+@lru_cache(maxsize=1024)
+def _arc_from_chord(dx, dy, radius):
+    # The center (relative to the first endpoint) and the two angles of an
+    # arc depend only on the chord and the radius, so translated copies of
+    # the same arc, like a row of peg holes, share one computation.
+    x = Vector(dx, dy)
+    if radius**2 < 0.25 * x.dot(x):
+        raise Exception("radius is too small for this arc, make it bigger")
+    w = (radius**2 - 0.25 * x.dot(x)) ** .5
+    wn = Vector(x.y, -x.x).normalize()
+    if radius * wn.cross(x) < 0:
+        wn = -wn
+    offset = 0.5 * x + w * wn
+    a, b = math.atan2(0. - offset.y, 0. - offset.x), math.atan2(dy - offset.y, dx - offset.x)
+    if radius < 0:
+        if b < a:
+            b += TWO_PI * math.ceil((a - b) / TWO_PI)
+    else:
+        if a < b:
+            a += TWO_PI * math.ceil((b - a) / TWO_PI)
+    return (offset.x, offset.y), a, b
+
+
+def compose(m, n):
+    """
+    The 2x3 matrix (a, b, c, d, e, f) that does n and then m, where a matrix
+    takes (x, y) to (a * x + b * y + e, c * x + d * y + f).
+    >>> compose((0, -1, 1, 0, 0, 0), (1, 0, 0, 1, 2, 0))
+    (0, -1, 1, 0, 0, 2)
+    """
+    a, b, c, d, e, f = m
+    return (a * n[0] + b * n[2], a * n[1] + b * n[3], c * n[0] + d * n[2], c * n[1] + d * n[3],
+            a * n[4] + b * n[5] + e, c * n[4] + d * n[5] + f)
+
+
+def _about(m, pt):
+    # m done around pt instead of around the origin
+    if pt is None:
+        return m
+    return compose((1, 0, 0, 1, pt.x, pt.y), compose(m, (1, 0, 0, 1, -pt.x, -pt.y)))
+
+
+def _transformed(segments, m):
+    # only rotations, reflections, uniform scaling and translations are
+    # allowed, so circles stay circles
+    a, b, c, d, e, f = m
+    k, phi = math.hypot(a, c), math.atan2(c, a)
+    flip = a * d - b * c < 0
+    result = []
+    for segment in segments:
+        if isinstance(segment, LineSegment):
+            p1, p2 = segment.p1, segment.p2
+            result.append(LineSegment(Point(a * p1.x + b * p1.y + e, c * p1.x + d * p1.y + f),
+                                      Point(a * p2.x + b * p2.y + e, c * p2.x + d * p2.y + f)))
+        else:
+            p, r = segment.center, segment.angle_range
+            start, finish = (phi - r.start, phi - r.finish) if flip else (r.start + phi, r.finish + phi)
+            result.append(Arc(Point(a * p.x + b * p.y + e, c * p.x + d * p.y + f),
+                              k * segment.radius, start, finish))
+    return result
+
+
+@lru_cache(maxsize=1024)
+def _arc_offsets(radius, start, finish, tolerance):
+    # the corners of a flattened arc, relative to its center; every copy of
+    # the same arc, wherever it is, shares them
+    if tolerance <= 0:
+        raise ValueError(tolerance)
+    step = PI / 2
+    if tolerance < radius:
+        step = min(step, 2 * math.acos(1 - tolerance / radius))
+    sweep = finish - start
+    n = max(1, int(math.ceil(abs(sweep) / step - EPSILON)))
+    angles = [start + sweep * k / n for k in range(n)] + [finish]
+    return tuple((radius * math.cos(a), radius * math.sin(a)) for a in angles)
+
+
+class Shape(object):
+    """
+    Transforming a shape doesn't copy its segments. The new shape shares
+    the base segments of the old one and keeps a single matrix for the
+    whole chain of moves, and the moved segments are only made when
+    something asks for them. A thousand pegs placed from one peg share one
+    segment list.
+    >>> peg = circle(0, 0, 0.125)
+    >>> pegs = [peg.translate(Vector(0.5 * n, 0)).rotate(PI / 2) for n in range(1000)]
+    >>> pegs[999].base is peg.base, len(pegs[999].matrix)
+    (True, 6)
+    >>> [round(x, 6) for x in pegs[2].segments[0].bbox()]
+    [-0.125, 0.875, 0.0, 1.125]
+    """
     def __init__(self, points, radii=None):
-        self.segments = []
+        segments = []
         n = len(points)
         if radii is None:
             radii = n * [None]
         for i in range(n):
             p1, p2 = points[i], points[(i+1) % n]
             if radii[i] is None:
-                self.segments.append(LineSegment(p1, p2))
+                segments.append(LineSegment(p1, p2))
+            else:
+                segments.append(Arc.from_endpoints(p1, p2, radii[i]))
+        self.segments = segments
+
+    @property
+    def segments(self):
+        if self._segments is None:
+            self._segments = _transformed(self.base, self.matrix)
+        return self._segments
+
+    @segments.setter
+    def segments(self, segments):
+        self.base, self.matrix, self._segments = segments, None, segments
+
+    def transform(self, matrix):
+        """
+        The shape moved by a 2x3 matrix, see compose(). The matrix has to be
+        a rotation, reflection, uniform scaling or translation, or some
+        mixture of them.
+        """
+        shape = Shape([])
+        shape.base, shape._segments = self.base, None
+        shape.matrix = matrix if self.matrix is None else compose(matrix, self.matrix)
+        return shape
+
+    def translate(self, v):
+        """
+        >>> rectangle(0, 0, 1, 1).translate(Vector(2, 0)).segments[0]
+        LineSegment((1,-1), (1,1))
+        """
+        return self.transform((1, 0, 0, 1, v.x, v.y))
+
+    def rotate(self, theta, about=None):
+        """
+        Counter-clockwise by theta radians, around about or the origin.
+        >>> circle(1, 0, 1).rotate(PI, Point(1, 1)).segments[0]
+        Arc((1.0,2.0),1.0,360.0,180.0)
+        """
+        c, s = math.cos(theta), math.sin(theta)
+        return self.transform(_about((c, -s, s, c, 0, 0), about))
+
+    def scale(self, k, about=None):
+        """
+        Uniform scaling around about or the origin, k must be positive.
+        >>> circle(1, 0, 1).scale(2).segments[0]
+        Arc((2.0,0.0),2.0,180.0,0.0)
+        """
+        if k <= 0:
+            raise ValueError(k)
+        return self.transform(_about((k, 0, 0, k, 0, 0), about))
+
+    def mirror(self, angle=PI / 2, about=None):
+        """
+        Reflected in the line at angle through about or the origin; by
+        default the vertical line, swapping left and right. The mirror
+        image runs the other way round.
+        >>> r = rectangle(1, 0, 1, 2).mirror()
+        >>> [tuple(round(x, 6) + 0. for x in box) for box in r.bboxes()[:2]]
+        [(0.0, -2.0, 0.0, 2.0), (-2.0, 2.0, 0.0, 2.0)]
+        >>> r.area()
+        8.0
+        """
+        c, s = math.cos(2 * angle), math.sin(2 * angle)
+        return self.transform(_about((c, s, s, -c, 0, 0), about))
+
+    @classmethod
+    def from_segments(cls, segments):
+        """
+        >>> Shape.from_segments(rectangle(0, 0, 1, 1).segments[:2]).segments
+        [LineSegment((-1,-1), (-1,1)), LineSegment((-1,1), (1,1))]
+        """
+        shape = cls([])
+        shape.segments = list(segments)
+        return shape
+
+    def bboxes(self):
+        return [segment.bbox() for segment in self.segments]
+
+    def geometry_hash(self):
+        """
+        A digest of the segments with every number rounded to a multiple of
+        EPSILON, so copies of a part that differ only by float noise hash
+        the same.
+        >>> rectangle(0, 0, 1, 1).geometry_hash() == rectangle(1.e-10, 0, 1, 1).geometry_hash()
+        True
+        >>> rectangle(0, 0, 1, 1).geometry_hash() == rectangle(0, 0, 1, 2).geometry_hash()
+        False
+        """
+        import hashlib
+        digest = hashlib.sha1()
+        for segment in self.segments:
+            if isinstance(segment, LineSegment):
+                values = ('L', segment.p1.x, segment.p1.y, segment.p2.x, segment.p2.y)
             else:
-                self.segments.append(Arc.from_endpoints(p1, p2, radii[i]))
+                r = segment.angle_range
+                values = ('A', segment.center.x, segment.center.y, segment.radius, r.start, r.finish)
+            words = [values[0]] + [str(int(round(v / EPSILON))) for v in values[1:]]
+            digest.update((' '.join(words) + ';').encode('ascii'))
+        return digest.hexdigest()
+
+    def flatten(self, tolerance):
+        """
+        The same shape with every arc turned into line segments no more
+        than tolerance away from it; see Arc.flatten().
+        >>> len(circle(0, 0, 1).flatten(0.01).segments)
+        24
+        """
+        import geomarray
+        return geomarray.SegmentArray.from_shape(self).flatten(tolerance).to_shape()
+
+    def offset(self, distance):
+        """
+        The shape grown by distance all round, or shrunk if it is negative,
+        with arcs kept as arcs and outside corners rounded; see offset.py.
+        Offsetting by half the kerf makes up for what the laser burns away.
+        >>> rectangle(0, 0, 1, 1).offset(-0.25).area()
+        2.25
+        """
+        import offset
+        return offset.offset_shape(self, distance)
+
+    def area(self):
+        """
+        Signed area, positive when the shape runs counter-clockwise.
+        >>> rectangle(0, 0, 2, 1).area()
+        -8.0
+        >>> round(circle(0, 0, 1).reversed().area(), 6)
+        3.141593
+        """
+        return sum(segment.area_term() for segment in self.segments)
+
+    def reversed(self):
+        return Shape.from_segments([segment.reversed() for segment in reversed(self.segments)])
+
+    def __add__(self, other):
+        """
+        Union.
+        >>> (rectangle(0, 0, 2, 1) + rectangle(2, 0, 1, 2)).area()
+        14.0
+        """
+        import shapeops
+        return shapeops.union(self, other)
+
+    def __and__(self, other):
+        """
+        Intersection.
+        >>> (rectangle(0, 0, 2, 1) & rectangle(2, 0, 1, 2)).area()
+        2.0
+        """
+        import shapeops
+        return shapeops.intersection(self, other)
+
+    def __sub__(self, other):
+        """
+        Difference.
+        >>> (rectangle(0, 0, 2, 1) - rectangle(2, 0, 1, 2)).area()
+        6.0
+        """
+        import shapeops
+        return shapeops.difference(self, other)
+
+    def find_intersections(self, other=None, method='sweep'):
+        """
+        Return (i, j, intersection) for every segment i of this shape that
+        meets segment j of the other shape. Boxes are compared first, using
+        either a sweep line or a uniform grid, and intersect() only runs on
+        the pairs whose boxes overlap. With no other shape, look for places
+        where this shape crosses itself, ignoring the vertex shared by each
+        pair of consecutive segments.
+        >>> a, b = rectangle(0, 0, 2, 1), rectangle(2, 0, 1, 2)
+        >>> [i for i, j, pt in a.find_intersections(b)]
+        [1, 3]
+        >>> [pt for i, j, pt in a.find_intersections(b, method='grid')]
+        [(1.0,1.0), (1.0,-1.0)]
+        """
+        import spatial
+        if other is None:
+            return self._self_intersections(method)
+        found = []
+        for i, j in spatial.candidate_pairs(self.bboxes(), other.bboxes(), method):
+            result = self.segments[i].intersect(other.segments[j])
+            if result is not None:
+                found.append((i, j, result))
+        found.sort(key=lambda f: f[:2])
+        return found
+
+    def _self_intersections(self, method):
+        import spatial
+        segments, found = self.segments, []
+        for i, j in spatial.candidate_pairs(self.bboxes(), None, method):
+            result = segments[i].intersect(segments[j])
+            if result is None:
+                continue
+            shared = [p for p, q in ((segments[i].end_point(), segments[j].start_point()),
+                                     (segments[j].end_point(), segments[i].start_point()))
+                      if p == q]
+            if isinstance(result, list):
+                result = [p for p in result if not any(p == q for q in shared)] or None
+            elif isinstance(result, Point) and any(result == q for q in shared):
+                result = None
+            if result is not None:
+                found.append((i, j, result))
+        found.sort(key=lambda f: f[:2])
+        return found
+
+    def is_simple(self, method='sweep'):
+        """
+        >>> rectangle(0, 0, 2, 1).is_simple()
+        True
+        >>> bowtie = Shape([Point(0, 0), Point(1, 1), Point(1, 0), Point(0, 1)])
+        >>> bowtie.is_simple()
+        False
+        >>> bowtie.find_intersections()
+        [(0, 2, (0.5,0.5))]
+        """
+        return not self.find_intersections(method=method)
+
+    def classify(self, pt):
+        """
+        Say whether a point is INSIDE, OUTSIDE or ON_BOUNDARY of the shape.
+        >>> disc = Shape([Point(-1, 0), Point(1, 0)], [1, 1])
+        >>> [disc.classify(Point(x, 0)) for x in (0, 1, 2)]
+        ['inside', 'on boundary', 'outside']
+        """
+        import spatial
+        return spatial.classify_point(self.segments, pt)
+
+    def contains(self, pt):
+        """
+        True if the point is strictly inside the shape.
+        >>> square = rectangle(0, 0, 1, 1)
+        >>> square.contains(Point(0, 0)), square.contains(Point(1, 0)), square.contains(Point(0, 1.5))
+        (True, False, False)
+        """
+        return self.classify(pt) == INSIDE
+
+    def locator(self):
+        import spatial
+        return spatial.PointLocator(self.segments)
+
+    def contains_many(self, points):
+        """
+        Like contains(), but for many points at once. The crossing data is
+        built once and each query is a binary search into it.
+        >>> disc = Shape([Point(-1, 0), Point(1, 0)], [1, 1])
+        >>> disc.contains_many([Point(0, 0), Point(0.5, 0.5), Point(0.8, 0.8), Point(0, -1)])
+        [True, True, False, False]
+        """
+        locator = self.locator()
+        return [locator.classify(pt) == INSIDE for pt in points]
+
+    def contours(self):
+        """
+        Split the segments into runs that each carry on from where the last
+        one ended.
+        >>> shape = Shape.from_segments(rectangle(0, 0, 1, 1).segments + circle(5, 0, 1).segments)
+        >>> [len(c) for c in shape.contours()]
+        [4, 2]
+        """
+        contours = []
+        for segment in self.segments:
+            if contours and contours[-1][-1].end_point() == segment.start_point():
+                contours[-1].append(segment)
+            else:
+                contours.append([segment])
+        return contours
+
+    def path(self):
+        """
+        The contours as they should be drawn: a list of (segments, closed)
+        pairs, with runs of colinear LineSegments merged into one.
+        >>> square = Shape([Point(1, 0), Point(2, 0), Point(2, 2), Point(0, 2), Point(0, 1), Point(0, 0)])
+        >>> square.path()
+        [([LineSegment((0,0), (2,0)), LineSegment((2,0), (2,2)), LineSegment((2,2), (0,2)), LineSegment((0,2), (0,0))], True)]
+        """
+        path = []
+        for contour in self.contours():
+            merged = [contour[0]]
+            for segment in contour[1:]:
+                if _continues_line(merged[-1], segment):
+                    merged[-1] = LineSegment(merged[-1].p1, segment.p2)
+                else:
+                    merged.append(segment)
+            closed = merged[-1].end_point() == merged[0].start_point()
+            if closed and len(merged) > 1 and _continues_line(merged[-1], merged[0]):
+                merged[0] = LineSegment(merged.pop().p1, merged[0].p2)
+            path.append((merged, closed))
+        return path
+
+    def emit(self, emitter):
+        """
+        Send the shape to an emitter a contour at a time, as move_to, then
+        line_to and arc_to for each segment, then close_path if the contour
+        is closed, and end_shape once at the end. The line back to the start
+        of a closed contour is left to close_path.
+        """
+        for segments, closed in self.path():
+            emitter.move_to(segments[0].start_point())
+            if closed and len(segments) > 1 and isinstance(segments[-1], LineSegment):
+                segments = segments[:-1]
+            for segment in segments:
+                segment.emit(emitter)
+            if closed:
+                emitter.close_path()
+        emitter.end_shape()
 
     def postscript(self, tfm):
-        middle = ' '.join([segment.postscript(tfm) for segment in self.segments])
-        return '{0} stroke'.format(middle)
+        """
+        One moveto per contour, and a closepath in place of the last line
+        back to the start.
+        >>> tfm = PSTransform()
+        >>> rectangle(0, 0, 1, 0.5).postscript(tfm)
+        '234.0 360.0 moveto 234.0 432.0 lineto 378.0 432.0 lineto 378.0 360.0 lineto closepath stroke'
+        >>> circle(0, 0, 1).postscript(tfm)
+        '234.0 396.0 moveto 306.0 396.0 72 180.0 0.0 arcn 306.0 396.0 72 360.0 180.0 arcn closepath stroke'
+
+        With the NumPy backend (see geomarray.py), long contours have their
+        line ends mapped to the page all at once, to the same text.
+        """
+        import geomarray
+        # ints could come out as ints, and print without the .0
+        vector = isinstance(tfm.ORIGIN.x, float) and isinstance(tfm.ORIGIN.y, float)
+        words = []
+        for segments, closed in self.path():
+            start = segments[0].start_point()
+            if closed and len(segments) > 1 and isinstance(segments[-1], LineSegment):
+                segments = segments[:-1]
+            numpy = geomarray._vectorized(len(segments)) if vector else None
+            if numpy is not None:
+                words.extend(_vector_postscript(tfm, start, segments, numpy))
+            else:
+                words.append(tfm.format('{0} {1} moveto', start))
+                for segment in segments:
+                    if isinstance(segment, LineSegment):
+                        words.append(tfm.format('{0} {1} lineto', segment.p2))
+                    else:
+                        words.append(segment.postscript(tfm))
+            if closed:
+                words.append('closepath')
+        words.append('stroke')
+        return ' '.join(words)
+
+
+def _vector_postscript(tfm, start, segments, numpy):
+    # the moveto and the rest of Shape.postscript's words for one contour,
+    # with the points worked out as PSTransform.map does, but in arrays
+    ends = [start] + [s.p2 for s in segments if isinstance(s, LineSegment)]
+    k, text = tfm.SCALEFACTOR, tfm._text or tfm._grid()
+    xs = (tfm.ORIGIN.x + k * (numpy.array([p.x for p in ends], dtype=float) - tfm.ZERO.x)).tolist()
+    ys = (tfm.ORIGIN.y + k * (numpy.array([p.y for p in ends], dtype=float) - tfm.ZERO.y)).tolist()
+    words = ['{0} {1} moveto'.format(text.get(xs[0], xs[0]), text.get(ys[0], ys[0]))]
+    i = 0
+    for segment in segments:
+        if isinstance(segment, LineSegment):
+            i += 1
+            words.append('{0} {1} lineto'.format(text.get(xs[i], xs[i]), text.get(ys[i], ys[i])))
+        else:
+            words.append(segment.postscript(tfm))
+    return words
+
+
+def _continues_line(first, second):
+    # does second carry straight on in the same direction as first?
+    if not (isinstance(first, LineSegment) and isinstance(second, LineSegment)):
+        return False
+    s, t = first.p2 - first.p1, second.p2 - second.p1
+    return (first.p2 == second.p1 and s.dot(t) > 0 and
+            nearly_zero(s.cross(t) / (abs(s) * abs(t))))
 
 
 ############
@@ -595,6 +1422,15 @@ def rectangle(xcenter, ycenter, width, height):
     return Shape([Point(x1, y1), Point(x1, y2), Point(x2, y2), Point(x2, y1)])
 
 
+def circle(xcenter, ycenter, radius):
+    """
+    >>> circle(0, 0, 1).segments
+    [Arc((0.0,0.0),1,180.0,0.0), Arc((0.0,0.0),1,360.0,180.0)]
+    """
+    center = Point(float(xcenter), float(ycenter))
+    return Shape.from_segments([Arc(center, radius, PI, 0), Arc(center, radius, TWO_PI, PI)])
+
+
 if __name__ == "__main__":
     import doctest
     doctest.testmod()
@@ -0,0 +1,151 @@
+"""
+Grow or shrink shapes by a fixed distance all round, to make up for the
+material the laser burns away.
+
+Every segment is moved sideways by the distance: a line stays a line, an
+arc stays an arc about the same center with its radius changed, and an arc
+moved past its center comes out on the far side of it. Where moved
+segments no longer meet, an outside corner gets an arc about the old
+vertex, and an inside corner gets two lines through it. That curve can
+cross itself, so it is cut wherever it does, with the crossings found by
+the same bounding-box sweep as the booleans use, and a piece survives only
+if it stays at least the distance away from the original shape. Whatever
+survives is linked back up into contours.
+
+Outlines and holes are handled alike. A positive distance adds material,
+so outlines get bigger and holes get smaller; to cut a part to size with a
+kerf k, offset it by k / 2.
+"""
+
+import math
+
+from noodle import EPSILON, PI, Arc, LineSegment, Shape, Vector
+import shapeops
+import spatial
+
+
+def offset_shape(shape, distance, method='sweep'):
+    """
+    >>> from noodle import rectangle, circle
+    >>> round(offset_shape(rectangle(0, 0, 1, 1), 0.5).area(), 6)
+    8.785398
+    >>> [s.__class__.__name__ for s in offset_shape(rectangle(0, 0, 1, 1), 0.5).segments][:2]
+    ['LineSegment', 'Arc']
+    >>> offset_shape(rectangle(0, 0, 1, 1), -0.5).area()
+    1.0
+    >>> offset_shape(circle(0, 0, 1), 0.5).segments
+    [Arc((0.0,0.0),1.5,180.0,360.0), Arc((0.0,0.0),1.5,0.0,180.0)]
+    >>> offset_shape(circle(0, 0, 1), -1).segments
+    []
+    """
+    return offset_shapes([shape], distance, method)[0]
+
+
+def offset_shapes(shapes, distance, method='sweep'):
+    """
+    Offset a whole sheet of shapes at once. The moved segments of all of
+    them go through one sweep for crossings, and only crossings between
+    segments of the same shape count, so neighbouring parts stay apart.
+    >>> from noodle import Point, rectangle
+    >>> ell = Shape([Point(0, 0), Point(2, 0), Point(2, 1), Point(1, 1), Point(1, 2), Point(0, 2)])
+    >>> grown, shrunk = offset_shapes([ell, rectangle(5, 0, 1, 1)], 0.1)
+    >>> round(grown.area(), 6), len(grown.segments), round(shrunk.area(), 6)
+    (3.82927, 11, 4.831416)
+    >>> round(offset_shapes([ell], -0.1)[0].area(), 6), len(offset_shapes([ell], -0.1)[0].segments)
+    (2.242146, 7)
+    """
+    if abs(distance) < EPSILON:
+        return [Shape.from_segments(shape.segments) for shape in shapes]
+    originals, raw, owners = [], [], []
+    for n, shape in enumerate(shapes):
+        segments = shapeops.counterclockwise(shape)
+        originals.append(segments)
+        for contour in Shape.from_segments(segments).contours():
+            moved = _moved_contour(contour, distance)
+            raw.extend(moved)
+            owners.extend([n] * len(moved))
+    cuts = [[] for _ in raw]
+    boxes = [segment.bbox() for segment in raw]
+    for i, j in spatial.candidate_pairs(boxes, method=method):
+        if owners[i] != owners[j]:
+            continue
+        result = raw[i].intersect(raw[j])
+        if result is not None:
+            points = shapeops._crossing_points(raw[i], raw[j], result)
+            cuts[i].extend(points)
+            cuts[j].extend(points)
+    pieces = [[] for _ in shapes]
+    for i, segment in enumerate(raw):
+        pieces[owners[i]].extend(segment.split(cuts[i]))
+    return [Shape.from_segments(shapeops.link(_far_enough(kept, segments, abs(distance))))
+            for kept, segments in zip(pieces, originals)]
+
+
+def _moved(segment, distance):
+    # the segment moved distance to its right, or None if it shrinks to a
+    # point, and where it starts and ends
+    if isinstance(segment, Arc):
+        r = segment.angle_range
+        radius = segment.radius + (distance if r.finish > r.start else -distance)
+        if abs(radius) < EPSILON:
+            return None, segment.center, segment.center
+        if radius < 0:
+            # moved past its center, so it comes out on the other side
+            arc = Arc(segment.center, -radius, r.start + PI, r.finish + PI)
+        else:
+            arc = Arc(segment.center, radius, r.start, r.finish)
+        return arc, arc.start_point(), arc.end_point()
+    p1, p2 = segment.p1, segment.p2
+    u = p2 - p1
+    normal = (distance / abs(u)) * Vector(u.y, -u.x)
+    return LineSegment(p1 + normal, p2 + normal), p1 + normal, p2 + normal
+
+
+def _moved_contour(contour, distance):
+    moved = [_moved(segment, distance) for segment in contour]
+    result = []
+    for i, segment in enumerate(contour):
+        piece, start, end = moved[i]
+        following, next_start = contour[(i + 1) % len(contour)], moved[(i + 1) % len(contour)][1]
+        if piece is not None:
+            result.append(piece)
+        if end == next_start:
+            continue
+        v = segment.end_point()
+        a, b = segment.tangent(v), following.tangent(v)
+        turn = math.atan2(a.cross(b), a.dot(b))
+        if turn * distance > 0:
+            angle = math.atan2(end.y - v.y, end.x - v.x)
+            result.append(Arc(v, abs(distance), angle, angle + turn))
+        else:
+            # the far side of an inside corner, which the trimming removes
+            result.extend(LineSegment(p, q) for p, q in ((end, v), (v, next_start)) if not p == q)
+    return result
+
+
+def _distance(segment, pt):
+    if isinstance(segment, Arc):
+        if segment.included_angle(pt):
+            return abs(abs(pt - segment.center) - segment.radius)
+        return min(abs(pt - segment.start_point()), abs(pt - segment.end_point()))
+    r = segment.p2 - segment.p1
+    t = min(1., max(0., (pt - segment.p1).dot(r) / r.square()))
+    return abs(pt - segment.param_to_point(t))
+
+
+def _far_enough(pieces, segments, distance):
+    # the pieces whose midpoints are no closer than distance to the segments
+    index = spatial.GridIndex.for_boxes(s.bbox() for s in segments)
+    reach = distance - shapeops.LINK_TOLERANCE
+    kept = []
+    for piece in pieces:
+        mid = piece.midpoint()
+        near = index.query((mid.x - reach, mid.y - reach, mid.x + reach, mid.y + reach))
+        if all(_distance(segments[k], mid) >= reach for k in near):
+            kept.append(piece)
+    return kept
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
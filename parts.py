@@ -0,0 +1,177 @@
+"""
+Parametric parts for the logic board, and a batch writer for sweeping
+their parameters.
+
+Every part takes its nominal dimensions in inches and the kerf, the width
+of the cut the laser makes. The kerf is allowed for by offsetting the
+finished part (see offset.py) by half of it: outlines grow and holes
+shrink, so both come out at their nominal size once the laser has burned
+away its half of the cut on each side. peg_hole() and slot() on their own
+are holes to cut in something else, so they shrink by half the kerf.
+
+    board = plate - peg_hole(0.125, kerf=0.008).translate(Vector(1, 0))
+    write_variants(slot, {'length': [0.5, 0.75], 'width': [0.125, 0.25]},
+                   'slot-{length}-{width}.svg', kerf=0.008)
+
+Parts are centered on the origin, ready for translate() and rotate().
+"""
+
+import itertools
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from noodle import Point, Shape, LineSegment, circle
+import csg
+import emitters
+import pegs
+
+
+def _kerf(shape, kerf, hole=False):
+    if not kerf:
+        return shape
+    return shape.offset(-0.5 * kerf if hole else 0.5 * kerf)
+
+
+def _minus(outline, holes):
+    # the holes are all inside the outline, which csg knows how to do cheaply
+    return csg.Difference(csg.Leaf(outline), *[csg.Leaf(hole) for hole in holes]).shape()
+
+
+def rounded_rectangle(width, height, radius, kerf=0., center=Point(0, 0)):
+    """
+    A rectangle with its corners rounded to radius, running counter-
+    clockwise. A radius of half the height makes a stadium.
+    >>> r = rounded_rectangle(2, 1, 0.25)
+    >>> [s.__class__.__name__ for s in r.segments][:2], round(r.area(), 6)
+    (['LineSegment', 'Arc'], 1.94635)
+    >>> len(rounded_rectangle(2, 1, 0.5).segments)
+    6
+    """
+    if not 0 <= radius <= 0.5 * min(width, height):
+        raise ValueError('the corner radius must be between 0 and half the smaller side')
+    x0, y0, x1, y1 = center.x - 0.5 * width, center.y - 0.5 * height, center.x + 0.5 * width, center.y + 0.5 * height
+    if radius == 0:
+        return _kerf(Shape([Point(x0, y0), Point(x1, y0), Point(x1, y1), Point(x0, y1)]), kerf)
+    r = radius
+    points = [Point(x0 + r, y0), Point(x1 - r, y0), Point(x1, y0 + r), Point(x1, y1 - r),
+              Point(x1 - r, y1), Point(x0 + r, y1), Point(x0, y1 - r), Point(x0, y0 + r)]
+    # counter-clockwise corners, made by Arc.from_endpoints with a negative radius
+    shape = Shape(points, [None, -r, None, -r, None, -r, None, -r])
+    segments = [s for s in shape.segments
+                if not (isinstance(s, LineSegment) and s.p1 == s.p2)]
+    return _kerf(Shape.from_segments(segments), kerf)
+
+
+def peg_hole(diameter, kerf=0., center=Point(0, 0)):
+    """
+    >>> peg_hole(0.25, kerf=0.01).segments[0].radius
+    0.12
+    """
+    return _kerf(circle(center.x, center.y, 0.5 * diameter).reversed(), kerf, hole=True)
+
+
+def slot(length, width, kerf=0., center=Point(0, 0)):
+    """
+    A hole with round ends, length long overall, for a pin of diameter
+    width to slide in.
+    >>> round(slot(1, 0.25).area(), 6), round(slot(1, 0.25, kerf=0.01).area(), 6)
+    (0.236587, 0.225239)
+    """
+    return _kerf(rounded_rectangle(length, width, 0.5 * width, center=center), kerf, hole=True)
+
+
+def gate_toggle(length=3., width=0.5, pivot=0.125, peg=0.125, kerf=0.):
+    """
+    The rocking bar of a gate: a pivot hole in the middle and a peg hole
+    near each end.
+    >>> toggle = gate_toggle()
+    >>> len(toggle.contours()), round(toggle.area(), 6)
+    (4, 1.449772)
+    """
+    ends = 0.5 * length - 0.5 * width
+    holes = [peg_hole(pivot)] + [peg_hole(peg, center=Point(x, 0)) for x in (-ends, ends)]
+    return _kerf(_minus(rounded_rectangle(length, width, 0.25 * width), holes), kerf)
+
+
+def flip_flop(positions=8, width=0.75, travel=pegs.ROW_PITCH, pin=0.125, peg=0.125, kerf=0.):
+    """
+    A flip-flop slide: a bar with a peg hole for each rod position, at the
+    rod pitch of pegs.board(), and a slot at each end for the guide pins,
+    long enough for the slide to move by travel between 0 and 1.
+    >>> slide = flip_flop(positions=4)
+    >>> len(slide.contours()), round(slide.area(), 4)
+    (7, 2.8024)
+    """
+    inner = pegs.ROD_PITCH * (positions - 1)
+    length = inner + 2 * (travel + pin + width)
+    guides = 0.5 * length - 0.5 * width - 0.5 * (travel + pin)
+    holes = [peg_hole(peg, center=Point(pegs.ROD_PITCH * (i - 0.5 * (positions - 1)), 0))
+             for i in range(positions)]
+    holes += [slot(travel + pin, pin, center=Point(x, 0)) for x in (-guides, guides)]
+    return _kerf(_minus(rounded_rectangle(length, width, 0.25 * width), holes), kerf)
+
+
+def variants(grid):
+    """
+    Every combination of the values in a dict of parameter: list of values.
+    >>> variants({'a': [1, 2], 'b': [3]})
+    [{'a': 1, 'b': 3}, {'a': 2, 'b': 3}]
+    """
+    names = sorted(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*[grid[name] for name in names])]
+
+
+def write_variants(factory, grid, pattern, kerf=0., width=8.5, height=11, backlog=16):
+    """
+    Build factory(kerf=kerf, **params) for every params in variants(grid)
+    and write each to pattern.format(**params), in whatever format the
+    extension names (see emitters.write_file). The files are written by a
+    thread of their own while the next parts are being built, at most
+    backlog parts behind. Returns the file names.
+    >>> import os, tempfile, shutil
+    >>> directory = tempfile.mkdtemp()
+    >>> names = write_variants(peg_hole, {'diameter': [0.125, 0.25]},
+    ...                        os.path.join(directory, 'peg-{diameter}.svg'), kerf=0.01)
+    >>> [os.path.basename(name) for name in names], all(os.path.getsize(name) for name in names)
+    (['peg-0.125.svg', 'peg-0.25.svg'], True)
+    >>> shutil.rmtree(directory)
+    """
+    jobs, errors = queue.Queue(backlog), []
+
+    def writer():
+        while True:
+            job = jobs.get()
+            if job is None:
+                return
+            if not errors:
+                try:
+                    emitters.write_file([job[1]], job[0], width, height)
+                except Exception as e:
+                    errors.append(e)
+
+    thread = threading.Thread(target=writer)
+    thread.daemon = True
+    thread.start()
+    names = []
+    try:
+        for params in variants(grid):
+            shape = factory(kerf=kerf, **params)
+            names.append(pattern.format(**params))
+            jobs.put((names[-1], shape))
+            if errors:
+                break
+    finally:
+        jobs.put(None)
+        thread.join()
+    if errors:
+        raise errors[0]
+    return names
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
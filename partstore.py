@@ -0,0 +1,165 @@
+"""
+A read-only file of named part outlines, opened with mmap so a library of
+thousands of parts costs nothing until a part is asked for.
+
+    write_store('parts.ndlp', {'peg': peg, 'slide': slide, ...})
+    with PartStore('parts.ndlp') as parts:
+        board = plate - parts['peg']
+
+The file is a header, the segment records of every part one after another
+(geomarray.RECORDs, as emitters.BinaryWriter writes, a kind byte for line
+or arc and five float64s), the part names, and an index with one
+fixed-size entry per part sorted by name. Opening the store reads only the header;
+looking a part up is a binary search of the index in the mapped file; and
+a part's segments are only read when its shape, a geomarray.StoredShape,
+is first used.
+"""
+
+import mmap
+import os
+import struct
+
+from geomarray import RECORD, StoredShape
+import spatial
+
+
+MAGIC, VERSION = b'NDLP', 1
+HEADER = struct.Struct('<4sIIQQ')    # magic, version, parts, names offset, index offset
+ENTRY = struct.Struct('<QIQI4d')     # name offset and length, records offset and count, bbox
+
+
+def write_store(filename, parts):
+    """
+    Write (name, shape) pairs, or a dict of them, to filename.
+    """
+    items = sorted(parts.items() if hasattr(parts, 'items') else parts,
+                   key=lambda item: item[0].encode('utf-8'))
+    names = [name.encode('utf-8') for name, shape in items]
+    if len(set(names)) != len(names):
+        raise ValueError('part names must be different')
+    with open(filename, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, 0, 0))
+        places = []
+        for name, shape in items:
+            offset, segments = f.tell(), shape.segments
+            f.write(b''.join(_record(segment) for segment in segments))
+            box = spatial.union(shape.bboxes()) if segments else (0., 0., 0., 0.)
+            places.append((offset, len(segments), box))
+        names_offset = f.tell()
+        name_offsets = []
+        for name in names:
+            name_offsets.append(f.tell())
+            f.write(name)
+        index_offset = f.tell()
+        for name, at, (offset, count, box) in zip(names, name_offsets, places):
+            f.write(ENTRY.pack(at, len(name), offset, count, *box))
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, len(items), names_offset, index_offset))
+
+
+def _record(segment):
+    if hasattr(segment, 'angle_range'):
+        r = segment.angle_range
+        return RECORD.pack(1, segment.center.x, segment.center.y, segment.radius, r.start, r.finish)
+    return RECORD.pack(0, segment.p1.x, segment.p1.y, segment.p2.x, segment.p2.y, 0.)
+
+
+class PartStore(object):
+    """
+    >>> import os, tempfile
+    >>> from noodle import rectangle, circle
+    >>> fd, filename = tempfile.mkstemp()
+    >>> os.close(fd)
+    >>> write_store(filename, {'plate': rectangle(0, 0, 2, 1), 'peg': circle(0, 0, 0.125)})
+    >>> parts = PartStore(filename)
+    >>> len(parts), 'peg' in parts, 'gate' in parts, list(parts.names()) == ['peg', 'plate']
+    (2, True, False, True)
+    >>> peg = parts['peg']
+    >>> peg.box, peg._segments is None
+    ((-0.125, -0.125, 0.125, 0.125), True)
+    >>> peg.segments
+    [Arc((0.0,0.0),0.125,180.0,0.0), Arc((0.0,0.0),0.125,360.0,180.0)]
+    >>> round((parts['plate'] - peg).area(), 6)
+    7.950913
+    >>> parts.close()
+    >>> len(parts['plate'].segments), len(peg.segments)
+    (4, 2)
+    >>> with PartStore(filename) as again:
+    ...     unread = again['plate']
+    >>> unread.segments
+    Traceback (most recent call last):
+        ...
+    ValueError: the file this shape was stored in is closed
+    >>> os.remove(filename)
+    """
+    def __init__(self, filename):
+        self.file = open(filename, 'rb')
+        if os.fstat(self.file.fileno()).st_size < HEADER.size:
+            raise ValueError('not a part store')
+        self.buf = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count, self.names_offset, self.index_offset = HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('not a part store')
+        self.views = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        # shapes already read keep their segments; the rest can't be read
+        for view in self.views.values():
+            view.detach()
+        self.buf.close()
+        self.file.close()
+
+    def __len__(self):
+        return self.count
+
+    def _entry(self, i):
+        return ENTRY.unpack_from(self.buf, self.index_offset + i * ENTRY.size)
+
+    def _name(self, entry):
+        return self.buf[entry[0]:entry[0] + entry[1]]
+
+    def names(self):
+        for i in range(self.count):
+            yield self._name(self._entry(i)).decode('utf-8')
+
+    def _find(self, name):
+        key, lo, hi = name.encode('utf-8'), 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._name(self._entry(mid)) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count:
+            entry = self._entry(lo)
+            if self._name(entry) == key:
+                return entry
+        return None
+
+    def __contains__(self, name):
+        return name in self.views or self._find(name) is not None
+
+    def __getitem__(self, name):
+        if name not in self.views:
+            entry = self._find(name)
+            if entry is None:
+                raise KeyError(name)
+            self.views[name] = StoredShape(self.buf, entry[2], entry[3], entry[4:])
+        return self.views[name]
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,341 @@
+"""
+Work out where the pegs go, the "little compiler" the README asks for.
+
+The board is programmed the way the Digi-Comp I was. Each flip-flop slide
+has two rows of peg positions, one read when it is 0 and one when it is 1,
+and a row each for setting and resetting it. A logic rod runs across all
+of them. A peg in a read row stops the rod from dropping unless the slide
+is in that position, so the rod drops only when every pegged condition
+holds, and then the peg in its action row sets or resets its flip-flop on
+the clock. A rod is a product term, and a flip-flop is set by the OR of
+its set rods.
+
+A truth table over n inputs is a Python int of 2 ** n bits, bit i being
+the output for inputs i, so a whole table is worked out in a few integer
+operations rather than one combination at a time:
+
+    >>> a, b, c = variables(3)
+    >>> bin(table(lambda a, b, c: (a & b) | ~c, 3))
+    '0b10001111'
+
+Tables are reduced to as few rods as possible with Quine-McCluskey, whose
+results are remembered, and a state machine's state codes can be searched
+for the assignment that needs the fewest rods and pegs, in a process pool.
+
+    machine = StateMachine({0: 1, 1: 2, 2: 3, 3: 0})
+    encoding, rods = search(machine, processes=4)
+    plate = board(rods, machine.bits)
+"""
+
+import itertools
+from collections import namedtuple
+
+from noodle import Point, lru_cache, rectangle, circle
+import csg
+
+
+# a logic rod: it drops for states s with s & care == value, and then sets
+# (or resets) flip-flop bit
+Rod = namedtuple('Rod', 'care value bit set')
+
+
+@lru_cache(maxsize=64)
+def _variable(k, n):
+    return sum(1 << i for i in range(1 << n) if i >> k & 1)
+
+
+class Bits(object):
+    """
+    A truth table over n inputs, with &, |, ^ and ~ working on every
+    combination of inputs at once.
+    """
+    __slots__ = ('mask', 'n')
+
+    def __init__(self, mask, n):
+        self.mask, self.n = mask & ((1 << (1 << n)) - 1), n
+
+    def __and__(self, other):
+        return Bits(self.mask & other.mask, self.n)
+
+    def __or__(self, other):
+        return Bits(self.mask | other.mask, self.n)
+
+    def __xor__(self, other):
+        return Bits(self.mask ^ other.mask, self.n)
+
+    def __invert__(self):
+        return Bits(~self.mask, self.n)
+
+    def __int__(self):
+        return self.mask
+
+    def __repr__(self):
+        return 'Bits({0}, {1})'.format(bin(self.mask), self.n)
+
+
+def variables(n):
+    return [Bits(_variable(k, n), n) for k in range(n)]
+
+
+def table(f, n):
+    """
+    The truth table of f, a function of n Bits (or an int table already).
+    """
+    if callable(f):
+        return int(f(*variables(n)))
+    return f & ((1 << (1 << n)) - 1)
+
+
+def term_table(care, value, n):
+    """
+    >>> bin(term_table(0b011, 0b001, 3))
+    '0b100010'
+    """
+    result = (1 << (1 << n)) - 1
+    for k in range(n):
+        if care >> k & 1:
+            v = _variable(k, n)
+            result &= v if value >> k & 1 else ~v
+    return result
+
+
+def _bits_set(mask):
+    return [i for i in range(mask.bit_length()) if mask >> i & 1]
+
+
+@lru_cache(maxsize=4096)
+def minimize(ones, n, dont_cares=0):
+    """
+    A short list of (care, value) terms whose OR is 1 on every input in
+    ones, 0 on everything in neither ones nor dont_cares, and either on the
+    dont_cares; by Quine-McCluskey, taking essential prime implicants first
+    and then whichever prime covers most of what is left.
+    >>> minimize(0b11110000, 3)
+    ((4, 4),)
+    >>> minimize(table(lambda a, b, c: (a & b) | ~c, 3), 3)
+    ((3, 3), (4, 0))
+    """
+    full = (1 << n) - 1
+    terms = set((full, m) for m in _bits_set(ones | dont_cares))
+    primes = set()
+    while terms:
+        merged, used = set(), set()
+        by_care = {}
+        for care, value in terms:
+            by_care.setdefault(care, []).append(value)
+        for care, values in by_care.items():
+            present = set(values)
+            for value in values:
+                for k in range(n):
+                    bit = 1 << k
+                    if care & bit and not value & bit and value | bit in present:
+                        merged.add((care & ~bit, value))
+                        used.add((care, value))
+                        used.add((care, value | bit))
+        primes |= terms - used
+        terms = merged
+    uncovered = set(_bits_set(ones))
+    covers = dict((p, set(m for m in uncovered if m & p[0] == p[1])) for p in primes)
+    chosen = []
+    for m in sorted(uncovered):
+        owners = [p for p in primes if m in covers[p]]
+        if len(owners) == 1 and owners[0] not in chosen:
+            chosen.append(owners[0])
+    for p in chosen:
+        uncovered -= covers[p]
+    while uncovered:
+        best = max(sorted(primes), key=lambda p: (len(covers[p] & uncovered), -bin(p[0]).count('1')))
+        chosen.append(best)
+        uncovered -= covers[best]
+    return tuple(sorted(chosen))
+
+
+class StateMachine(object):
+    """
+    A machine that steps from state to state on each clock, given as a
+    dict of state: next state. States can be any sortable values; they are
+    given codes of bits bits each, by default as few as will do.
+    >>> m = StateMachine({'a': 'b', 'b': 'c', 'c': 'a'})
+    >>> m.states, m.bits
+    (['a', 'b', 'c'], 2)
+    """
+    def __init__(self, transitions, bits=None):
+        self.transitions = dict(transitions)
+        self.states = sorted(set(self.transitions) | set(self.transitions.values()))
+        missing = [s for s in self.states if s not in self.transitions]
+        if missing:
+            raise ValueError('no next state for {0!r}'.format(missing))
+        self.bits = bits or max(1, (len(self.states) - 1).bit_length())
+        if len(self.states) > 1 << self.bits:
+            raise ValueError('{0} states need more than {1} bits'.format(len(self.states), self.bits))
+
+    def encodings(self):
+        """
+        Every way of giving the states distinct codes, with the first state
+        always 0. Flipping a bit in every code swaps that flip-flop's set
+        and reset rods and its read rows, which changes nothing that
+        matters, so the others needn't be tried.
+        """
+        codes = range(1, 1 << self.bits)
+        for rest in itertools.permutations(codes, len(self.states) - 1):
+            yield (0,) + rest
+
+    def rods(self, encoding):
+        """
+        The rods that make the machine step through the states with the
+        given codes (in the order of self.states).
+        """
+        n = self.bits
+        code = dict(zip(self.states, encoding))
+        used = sum(1 << c for c in encoding)
+        unused = ((1 << (1 << n)) - 1) & ~used
+        rods = []
+        for k in range(n):
+            now, after = 0, 0
+            for state in self.states:
+                c = code[state]
+                now |= (c >> k & 1) << c
+                after |= (code[self.transitions[state]] >> k & 1) << c
+            stay_one, stay_zero = now & after, used & ~now & ~after
+            sets = minimize(after & ~now, n, unused | stay_one)
+            resets = minimize(now & ~after & used, n, unused | stay_zero)
+            rods.extend(Rod(care, value, k, True) for care, value in sets)
+            rods.extend(Rod(care, value, k, False) for care, value in resets)
+        return rods
+
+
+def step(rods, state):
+    """
+    The state after one clock, which is what the machine does with these
+    rods in it.
+    >>> m = StateMachine(dict((i, (i + 1) % 8) for i in range(8)))
+    >>> rods = m.rods(tuple(range(8)))
+    >>> s, seen = 0, []
+    >>> for _ in range(9):
+    ...     seen.append(s)
+    ...     s = step(rods, s)
+    >>> seen, cost(rods)
+    ([0, 1, 2, 3, 4, 5, 6, 7, 0], (6, 18))
+    """
+    result = state
+    for rod in rods:
+        if state & rod.care == rod.value:
+            result = result | (1 << rod.bit) if rod.set else result & ~(1 << rod.bit)
+    return result
+
+
+def check(rods, machine, encoding):
+    """
+    True if the rods take every state to the right next one, tested on
+    all the states at once with truth tables.
+    """
+    n = machine.bits
+    code = dict(zip(machine.states, encoding))
+    drops = [term_table(rod.care, rod.value, n) for rod in rods]
+    for k, state in itertools.product(range(n), machine.states):
+        c, want = code[state], code[machine.transitions[state]] >> k & 1
+        sets = any(d >> c & 1 for d, rod in zip(drops, rods) if rod.bit == k and rod.set)
+        resets = any(d >> c & 1 for d, rod in zip(drops, rods) if rod.bit == k and not rod.set)
+        if sets and resets or (1 if sets else 0 if resets else c >> k & 1) != want:
+            return False
+    return True
+
+
+def compile_table(f, n):
+    """
+    Rods that copy a function of flip-flops 0 to n - 1 into flip-flop n.
+    >>> rods = compile_table(lambda a, b: a ^ b, 2)
+    >>> [step(rods, s) >> 2 for s in range(4)], cost(rods)
+    ([0, 1, 1, 0], (4, 12))
+    """
+    ones = table(f, n)
+    zeros = ~ones & ((1 << (1 << n)) - 1)
+    return ([Rod(care, value, n, True) for care, value in minimize(ones, n)] +
+            [Rod(care, value, n, False) for care, value in minimize(zeros, n)])
+
+
+def cost(rods):
+    # rods first, since the board only has so many, then pegs
+    return len(rods), sum(bin(rod.care).count('1') + 1 for rod in rods)
+
+
+_machine = None
+
+
+def _init(machine):
+    global _machine
+    _machine = machine
+
+
+def _score(encoding):
+    return cost(_machine.rods(encoding)), encoding
+
+
+def search(machine, processes=None, chunksize=256):
+    """
+    The state codes needing the fewest rods, then pegs, and their rods.
+    With processes > 1 the encodings are tried in a process pool; each
+    worker keeps its own memory of minimized tables, and most tables turn
+    up again and again.
+    >>> m = StateMachine(dict((i, (i + 1) % 6) for i in range(6)))
+    >>> encoding, rods = search(m)
+    >>> cost(m.rods((0, 1, 2, 3, 4, 5))), cost(rods), check(rods, m, encoding)
+    ((6, 17), (6, 12), True)
+    """
+    encodings = machine.encodings()
+    if processes and processes > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(processes, _init, (machine,))
+        try:
+            best = min(pool.imap_unordered(_score, encodings, chunksize))
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        _init(machine)
+        best = min(_score(encoding) for encoding in encodings)
+    return best[1], machine.rods(best[1])
+
+
+# board layout, in inches
+ROD_PITCH, ROW_PITCH, PEG_RADIUS, MARGIN = 0.5, 0.375, 0.0625, 0.5
+
+
+def peg_positions(rods, bits):
+    """
+    (rod, row, point) for every peg. Flip-flop k has rows 4k to 4k + 3: read
+    0, read 1, set and reset. Rods run up the board from left to right, and
+    the board is centered on the origin.
+    >>> [(rod, row) for rod, row, pt in peg_positions([Rod(3, 1, 0, True)], 2)]
+    [(0, 1), (0, 2), (0, 4)]
+    """
+    if any(rod.bit >= bits or rod.care >> bits for rod in rods):
+        raise ValueError('a rod uses a flip-flop past the {0} on the board'.format(bits))
+    rows = 4 * bits
+    x0, y0 = -0.5 * ROD_PITCH * (len(rods) - 1), -0.5 * ROW_PITCH * (rows - 1)
+    result = []
+    for i, rod in enumerate(rods):
+        wanted = [4 * k + (rod.value >> k & 1) for k in range(bits) if rod.care >> k & 1]
+        wanted.append(4 * rod.bit + (2 if rod.set else 3))
+        for row in sorted(wanted):
+            result.append((i, row, Point(x0 + ROD_PITCH * i, y0 + ROW_PITCH * row)))
+    return result
+
+
+def board(rods, bits):
+    """
+    The logic board for bits flip-flops, with a hole for every peg.
+    >>> plate = board(compile_table(lambda a, b: a & b, 2), 3)
+    >>> len(plate.contours()), round(plate.area(), 4)
+    (8, 10.1641)
+    """
+    rows = 4 * bits
+    width = ROD_PITCH * (max(len(rods), 1) - 1) + 2 * MARGIN
+    height = ROW_PITCH * (rows - 1) + 2 * MARGIN
+    holes = [csg.Leaf(circle(pt.x, pt.y, PEG_RADIUS)) for rod, row, pt in peg_positions(rods, bits)]
+    return csg.Difference(csg.Leaf(rectangle(0, 0, 0.5 * width, 0.5 * height)), *holes).shape()
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,191 @@
+"""
+Find out where the time goes when a kit is slow to render.
+
+    with Profiler() as prof:
+        for name, part in parts:
+            with prof.part(name):
+                text = part.postscript(tfm)
+    print(prof.table())
+    prof.write_folded('kit.folded')     # flamegraph.pl kit.folded > kit.svg
+
+While a Profiler is active, the hot functions listed in HOT are replaced
+by wrappers that count calls and time them, and the originals are put back
+when it exits. Nothing is wrapped otherwise, so code that doesn't use a
+Profiler runs exactly as before. Times are inclusive in the table; the
+folded stacks give each function its own time, less the wrapped functions
+it called, in microseconds, one line per stack of wrapped calls in the
+form flamegraph.pl and speedscope read.
+
+With allocations=True, and where the tracemalloc module exists (Python
+3.4 on), each call also records how much traced memory it left allocated.
+That slows things down a good deal, so it is off unless asked for.
+"""
+
+import functools
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+# (module, class or None, function) for everything wrapped by default
+HOT = [
+    ('noodle', None, 'normalize'),
+    ('noodle', 'AngleRange', '__contains__'),
+    ('noodle', 'AngleRange', 'intersection'),
+    ('noodle', 'LineSegment', 'intersect'),
+    ('noodle', 'LineSegment', 'split'),
+    ('noodle', 'Arc', 'intersect'),
+    ('noodle', 'Arc', 'split'),
+    ('noodle', 'Arc', 'from_endpoints'),
+    ('noodle', 'PSTransform', 'format'),
+    ('noodle', 'Shape', 'postscript'),
+    ('noodle', 'Shape', 'find_intersections'),
+    ('shapeops', None, 'combine'),
+    ('shapeops', None, 'cut'),
+    ('shapeops', None, 'classify'),
+    ('shapeops', None, 'link'),
+    ('spatial', None, 'classify_point'),
+    ('pswriter', 'PostScriptWriter', 'write_shape'),
+]
+
+
+class Profiler(object):
+    """
+    >>> from noodle import Arc, PSTransform, rectangle, circle
+    >>> original = Arc.__dict__['intersect']
+    >>> with Profiler() as prof:
+    ...     with prof.part('plate'):
+    ...         plate = rectangle(0, 0, 2, 1) - circle(2, 0, 0.5)
+    ...     text = circle(0, 0, 1).postscript(PSTransform())
+    >>> Arc.__dict__['intersect'] is original
+    True
+    >>> prof.calls('shapeops.combine'), prof.calls('Shape.postscript'), prof.calls('PSTransform.format') > 0
+    (1, 1, True)
+    >>> sorted(set(part for part, name in prof.stats))
+    ['', 'plate']
+    >>> prof.table().split('\\n')[0].split()
+    ['part', 'operation', 'calls', 'total', 's', 'per', 'call', 'us', 'allocated', 'KB']
+    >>> [line.split()[0].split(';')[:3] for line in prof.folded_stacks().split('\\n') if 'combine;shapeops.cut' in line][0]
+    ['plate', 'shapeops.combine', 'shapeops.cut']
+    """
+    def __init__(self, targets=HOT, allocations=False):
+        self.targets = targets
+        self.allocations = allocations and tracemalloc is not None
+        self.stats = {}     # (part, name): [calls, seconds, bytes]
+        self.folded = {}    # stack of names joined with ';': microseconds
+        self.stack = []     # [name, seconds spent in wrapped callees] per active call
+        self.parts = ['']
+        self.saved = []
+        self.started_tracing = False
+
+    def __enter__(self):
+        import importlib
+        if self.saved:
+            raise RuntimeError('this Profiler is already active')
+        for module_name, class_name, name in self.targets:
+            module = importlib.import_module(module_name)
+            owner = module if class_name is None else getattr(module, class_name)
+            original = owner.__dict__[name]
+            label = '{0}.{1}'.format(class_name or module_name, name)
+            if isinstance(original, classmethod):
+                wrapped = classmethod(self._wrap(label, original.__func__))
+            else:
+                wrapped = self._wrap(label, original)
+            self.saved.append((owner, name, original))
+            setattr(owner, name, wrapped)
+        if self.allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+        return self
+
+    def __exit__(self, *exc_info):
+        for owner, name, original in reversed(self.saved):
+            setattr(owner, name, original)
+        self.saved = []
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def _wrap(self, label, f):
+        stack, traced = self.stack, self.allocations
+
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            frame = [label, 0.]
+            stack.append(frame)
+            before = tracemalloc.get_traced_memory()[0] if traced else 0
+            t0 = _clock()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                elapsed = _clock() - t0
+                allocated = tracemalloc.get_traced_memory()[0] - before if traced else 0
+                self._record(elapsed, allocated)
+                stack.pop()
+                if stack:
+                    stack[-1][1] += elapsed
+        return wrapper
+
+    def _record(self, elapsed, allocated):
+        part, frame = self.parts[-1], self.stack[-1]
+        entry = self.stats.setdefault((part, frame[0]), [0, 0., 0])
+        entry[0] += 1
+        entry[1] += elapsed
+        entry[2] += allocated
+        key = ';'.join([part or 'all'] + [name for name, _ in self.stack])
+        self.folded[key] = self.folded.get(key, 0.) + 1e6 * max(0., elapsed - frame[1])
+
+    class _Part(object):
+        def __init__(self, profiler, name):
+            self.profiler, self.name = profiler, name
+
+        def __enter__(self):
+            self.profiler.parts.append(self.name)
+
+        def __exit__(self, *exc_info):
+            self.profiler.parts.pop()
+
+    def part(self, name):
+        """
+        Charge everything done inside this with block to the named part.
+        """
+        return self._Part(self, str(name))
+
+    def calls(self, name, part=None):
+        return sum(entry[0] for (p, n), entry in self.stats.items() if n == name and part in (None, p))
+
+    def table(self, by_part=True):
+        """
+        One row per part and operation, slowest first.
+        """
+        rows = {}
+        for (part, name), (calls, seconds, allocated) in self.stats.items():
+            row = rows.setdefault((part if by_part else '', name), [0, 0., 0])
+            row[0] += calls
+            row[1] += seconds
+            row[2] += allocated
+        lines = ['{0:<16} {1:<32} {2:>9} {3:>10} {4:>14} {5:>14}'.format(
+            'part', 'operation', 'calls', 'total s', 'per call us', 'allocated KB')]
+        for (part, name), (calls, seconds, allocated) in sorted(rows.items(), key=lambda item: -item[1][1]):
+            memory = '{0:.1f}'.format(allocated / 1024.) if self.allocations else '-'
+            lines.append('{0:<16} {1:<32} {2:>9} {3:>10.4f} {4:>14.2f} {5:>14}'.format(
+                part or '-', name, calls, seconds, 1e6 * seconds / calls, memory))
+        return '\n'.join(lines)
+
+    def folded_stacks(self):
+        return '\n'.join('{0} {1}'.format(key, int(round(us)))
+                         for key, us in sorted(self.folded.items()) if us >= 0.5)
+
+    def write_folded(self, filename):
+        with open(filename, 'w') as f:
+            f.write(self.folded_stacks() + '\n')
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,290 @@
+"""
+Stream PostScript for many shapes to a file without building it in memory.
+
+    with open('board.ps', 'w') as f:
+        with PostScriptWriter(f) as ps:
+            for shape in shapes:
+                ps.write_shape(shape)
+
+Each shape is mapped into page coordinates with one pass over a
+SegmentArray, and the text goes out in chunks of about bufsize characters.
+Coordinates on the sheet's grid are looked up in a table of their text
+(see PSTransform.grid_text()) rather than formatted one by one.
+postscript_chunks() does the same job as a generator.
+
+A whole kit of sheets can be rendered in a process pool, each sheet sent
+to a worker as SegmentArrays, which pickle as a few byte strings:
+
+    write_pages(layout.sheet_shapes(), open('kit.ps', 'w'), processes=4)
+    write_sheets(layout.sheet_shapes(), 'sheet-{0}.ps', processes=4)
+"""
+
+import math
+
+from noodle import PSTransform, Shape
+from geomarray import SegmentArray, LINE
+
+
+DEGREES = 180. / math.pi
+
+HEADER = '%!PS-Adobe-2.0\n%%BoundingBox: {0} {1} {2} {3}\n'
+TRAILER = 'showpage\n'
+MOVETO, LINETO = '{0} {1} moveto\n', '{0} {1} lineto\n'
+ARC, ARCN = '{0} {1} {2} {3} {4} arc\n', '{0} {1} {2} {3} {4} arcn\n'
+CLOSEPATH, STROKE = 'closepath\n', 'stroke\n'
+PAGES, PAGE = '%%Pages: {0}\n', '%%Page: {0} {0}\n'
+
+
+def number(x, places=3):
+    """
+    Short text for a coordinate, to a thousandth of a point.
+    >>> [number(x) for x in (306.0, 72.5, -0.0001, 1/3.)]
+    ['306', '72.5', '0', '0.333']
+    """
+    text = '%.*f' % (places, x)
+    if '.' in text:
+        text = text.rstrip('0').rstrip('.')
+    return '0' if text == '-0' else text
+
+
+class PostScriptWriter(object):
+    """
+    >>> from noodle import rectangle
+    >>> ps = PostScriptWriter(_Collector())
+    >>> ps.write_shape(rectangle(0, 0, 1, 0.5))
+    >>> ps.close()
+    >>> print(''.join(ps.stream.chunks))
+    %!PS-Adobe-2.0
+    %%BoundingBox: 0 0 612 792
+    234 360 moveto
+    234 432 lineto
+    378 432 lineto
+    378 360 lineto
+    closepath
+    stroke
+    showpage
+    <BLANKLINE>
+    """
+    def __init__(self, stream, tfm=None, bufsize=1 << 16):
+        self.stream = stream
+        self.tfm = tfm or PSTransform()
+        self.bufsize = bufsize
+        self.buffer, self.buffered = [], 0
+        self.numbers = self.tfm.grid_text(number)
+        self.started = self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _emit(self, text):
+        self.buffer.append(text)
+        self.buffered += len(text)
+        if self.buffered >= self.bufsize:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.stream.write(''.join(self.buffer))
+            self.buffer, self.buffered = [], 0
+
+    def begin(self):
+        if not self.started:
+            self.started = True
+            self._emit(HEADER.format(*self.tfm.bounding_box()))
+
+    def write_path(self, records, contours=None):
+        """
+        Write a SegmentArray that is already in page coordinates. contours is
+        a list of (length, closed) pairs saying how the records divide into
+        contours; by default each record stands alone.
+        """
+        self.begin()
+        emit, data, n, numbers = self._emit, records.data, records.STRIDE, self.numbers
+
+        def text(x):
+            return numbers.get(x) or number(x)
+        if contours is None:
+            contours = [(1, False)] * len(records)
+        i = 0
+        for length, closed in contours:
+            for k in range(i, i + length):
+                a, b, c, d, e = data[n * k:n * (k + 1)]
+                if records.kinds[k] == LINE:
+                    if k == i:
+                        emit(MOVETO.format(text(a), text(b)))
+                    if not (closed and k == i + length - 1 and length > 1):
+                        emit(LINETO.format(text(c), text(d)))
+                else:
+                    if k == i:
+                        emit(MOVETO.format(text(a + c * math.cos(d)), text(b + c * math.sin(d))))
+                    emit((ARC if e > d else ARCN).format(
+                        text(a), text(b), text(c), text(DEGREES * d), text(DEGREES * e)))
+            if closed:
+                emit(CLOSEPATH)
+            i += length
+        emit(STROKE)
+
+    def write_shape(self, shape):
+        """
+        Write each contour of the shape as a single path, mapping all of the
+        shape's segments to the page in one pass. A moved shape is written
+        from its base segments, moved along with the mapping.
+        """
+        path = (Shape.from_segments(shape.base) if shape.matrix else shape).path()
+        records = SegmentArray.from_segments(s for segments, closed in path for s in segments)
+        if shape.matrix:
+            records = records.transform(shape.matrix)
+        self.write_path(records.map(self.tfm), [(len(segments), closed) for segments, closed in path])
+
+    def close(self):
+        if not self.closed:
+            self.begin()
+            self._emit(TRAILER)
+            self.flush()
+            self.closed = True
+
+    # the emitter calls (see emitters.py), for Shape.emit() and single segments
+
+    def _point(self, pt):
+        pt = self.tfm.map(pt)
+        return self.numbers.get(pt.x) or number(pt.x), self.numbers.get(pt.y) or number(pt.y)
+
+    def move_to(self, pt):
+        self.begin()
+        self._emit(MOVETO.format(*self._point(pt)))
+
+    def line_to(self, pt):
+        self._emit(LINETO.format(*self._point(pt)))
+
+    def arc_to(self, center, radius, start, finish):
+        self._emit((ARC if finish > start else ARCN).format(
+            *(self._point(center) + (number(self.tfm.scale(radius)), number(DEGREES * start),
+                                      number(DEGREES * finish)))))
+
+    def close_path(self):
+        self._emit(CLOSEPATH)
+
+    def end_shape(self):
+        self._emit(STROKE)
+
+
+class _Collector(object):
+    # a stream that hands its chunks back out again
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, text):
+        self.chunks.append(text)
+
+
+def postscript_chunks(shapes, tfm=None, bufsize=1 << 16):
+    """
+    Generate the PostScript for a sequence of shapes a chunk at a time, so a
+    large job can be written or sent on without ever being held in memory.
+    >>> from noodle import circle
+    >>> chunks = list(postscript_chunks([circle(0, 0, 1)], bufsize=10))
+    >>> len(chunks) > 1
+    True
+    >>> print(''.join(chunks).splitlines()[2:6])
+    ['234 396 moveto', '306 396 72 180 0 arcn', '306 396 72 360 180 arcn', 'closepath']
+    """
+    sink = _Collector()
+    writer = PostScriptWriter(sink, tfm, bufsize)
+    writer.begin()
+    for shape in shapes:
+        writer.write_shape(shape)
+        for chunk in sink.chunks:
+            yield chunk
+        del sink.chunks[:]
+    writer.close()
+    for chunk in sink.chunks:
+        yield chunk
+
+
+def write_postscript(shapes, stream, tfm=None, bufsize=1 << 16):
+    with PostScriptWriter(stream, tfm, bufsize) as writer:
+        for shape in shapes:
+            writer.write_shape(shape)
+
+
+def _render_page(job):
+    # runs in a worker process as well; the sheet size travels rather than
+    # the transform, and each shape as a SegmentArray
+    width, height, records = job
+    sink = _Collector()
+    writer = PostScriptWriter(sink, PSTransform(width, height))
+    writer.started = True
+    for sa in records:
+        writer.write_shape(sa.to_shape())
+    writer.flush()
+    return ''.join(sink.chunks)
+
+
+def render_pages(sheets, tfm=None, processes=None, chunksize=1):
+    """
+    The PostScript for the paths on each sheet, without header or showpage,
+    in the same order as the sheets. Each sheet is a list of shapes, or one
+    shape. With processes > 1 the sheets are rendered in a process pool,
+    chunksize sheets to a job.
+    >>> from noodle import rectangle, circle
+    >>> pages = render_pages([rectangle(0, 0, 1, 1), [circle(0, 0, 1), circle(1, 1, 1)]])
+    >>> [page.count('stroke') for page in pages]
+    [1, 2]
+    """
+    tfm = tfm or PSTransform()
+    jobs = [(tfm.WIDTH, tfm.HEIGHT, [SegmentArray.from_shape(shape) for shape in _shapes(sheet)])
+            for sheet in sheets]
+    if processes and processes > 1 and len(jobs) > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(processes)
+        try:
+            return pool.map(_render_page, jobs, chunksize)
+        finally:
+            pool.close()
+            pool.join()
+    return [_render_page(job) for job in jobs]
+
+
+def _shapes(sheet):
+    return [sheet] if hasattr(sheet, 'segments') else list(sheet)
+
+
+def write_pages(sheets, stream, tfm=None, processes=None, chunksize=1):
+    """
+    All the sheets in one file, a page each, marked with %%Page comments.
+    >>> from noodle import rectangle
+    >>> out = _Collector()
+    >>> write_pages([rectangle(0, 0, 1, 1), rectangle(0, 0, 2, 2)], out)
+    >>> text = ''.join(out.chunks)
+    >>> [line for line in text.splitlines() if line.startswith('%%')]
+    ['%%BoundingBox: 0 0 612 792', '%%Pages: 2', '%%Page: 1 1', '%%Page: 2 2']
+    >>> text.count(TRAILER)
+    2
+    """
+    tfm = tfm or PSTransform()
+    pages = render_pages(sheets, tfm, processes, chunksize)
+    stream.write(HEADER.format(*tfm.bounding_box()) + PAGES.format(len(pages)))
+    for n, page in enumerate(pages):
+        stream.write(PAGE.format(n + 1) + page + TRAILER)
+
+
+def write_sheets(sheets, pattern, tfm=None, processes=None, chunksize=1):
+    """
+    Each sheet in a file of its own, named pattern.format(n) for sheet n
+    counting from 1. Returns the file names.
+    """
+    tfm = tfm or PSTransform()
+    names = []
+    for n, page in enumerate(render_pages(sheets, tfm, processes, chunksize)):
+        names.append(pattern.format(n + 1))
+        with open(names[-1], 'w') as f:
+            f.write(HEADER.format(*tfm.bounding_box()) + page + TRAILER)
+    return names
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
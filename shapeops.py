@@ -0,0 +1,488 @@
+"""
+Union, intersection and difference of shapes, as described in NOTES.md.
+
+Both shapes are turned to run counter-clockwise, and every segment is cut
+wherever it meets the other shape, so that each piece lies entirely inside,
+outside or on the perimeter of the other shape. Which pieces survive depends
+on the operation, and the survivors are linked back up into closed contours
+at the crossing vertices.
+
+Crossings are found by comparing bounding boxes first (see spatial.py), and
+pieces are classified against a PointLocator built once per shape, so the
+work grows with the number of segments plus the number of crossings rather
+than with their product.
+"""
+
+import math
+
+from noodle import PI, TWO_PI, INSIDE, OUTSIDE, ON_BOUNDARY, Arc, LineSegment, Point, Shape, Vector
+import spatial
+
+
+UNION, INTERSECTION, DIFFERENCE = 'union', 'intersection', 'difference'
+
+# for pieces lying on the perimeter of the other shape, is the other shape's
+# boundary running the same way as the piece, or the opposite way?
+SAME, OPPOSITE = 'same', 'opposite'
+
+# what to keep from each shape; B pieces kept in a difference get reversed
+RULES = {
+    UNION: ((OUTSIDE, SAME), (OUTSIDE,)),
+    INTERSECTION: ((INSIDE, SAME), (INSIDE,)),
+    DIFFERENCE: ((OUTSIDE, OPPOSITE), (INSIDE,)),
+}
+
+# endpoints closer than this are the same vertex when linking contours
+LINK_TOLERANCE = 1.e-6
+
+
+def counterclockwise(shape):
+    if shape.area() < 0:
+        return shape.reversed().segments
+    return list(shape.segments)
+
+
+def _crossing_points(s, t, result):
+    if isinstance(result, Point):
+        return [result]
+    elif isinstance(result, list):
+        return result
+    # the segments overlap for some length, so each is cut where the other ends
+    return [p for p in (t.start_point(), t.end_point()) if s.passes_through(p)] + \
+        [p for p in (s.start_point(), s.end_point()) if t.passes_through(p)]
+
+
+def cut(segments, others, method='sweep'):
+    """
+    Split both lists of segments at every point where they meet. Return the
+    two lists of pieces, each piece paired with the index of the segment it
+    came from, and for each segment the indices of the other segments it
+    touches.
+    """
+    cuts_a, cuts_b = [[] for _ in segments], [[] for _ in others]
+    near_a = [[] for _ in segments]
+    boxes_a = [s.bbox() for s in segments]
+    boxes_b = [s.bbox() for s in others]
+    for i, j in spatial.candidate_pairs(boxes_a, boxes_b, method):
+        result = segments[i].intersect(others[j])
+        if result is None:
+            continue
+        near_a[i].append(j)
+        points = _crossing_points(segments[i], others[j], result)
+        cuts_a[i].extend(points)
+        cuts_b[j].extend(points)
+    pieces_a = [(piece, i) for i, s in enumerate(segments) for piece in s.split(cuts_a[i])]
+    pieces_b = [(piece, j) for j, s in enumerate(others) for piece in s.split(cuts_b[j])]
+    return pieces_a, pieces_b, near_a
+
+
+def _direction(piece, pt, others, candidates):
+    tangent = piece.tangent(pt)
+    for j in candidates:
+        if others[j].passes_through(pt):
+            return SAME if tangent.dot(others[j].tangent(pt)) > 0 else OPPOSITE
+    return None
+
+
+def classify(pieces, others, locator, near=None):
+    """
+    Label each (piece, index) pair INSIDE, OUTSIDE, SAME or OPPOSITE with
+    respect to the other segments.
+    """
+    labels = []
+    for piece, i in pieces:
+        mid = piece.midpoint()
+        where = locator.classify(mid)
+        if where == ON_BOUNDARY:
+            candidates = near[i] if near is not None else range(len(others))
+            where = (_direction(piece, mid, others, candidates) or
+                     _direction(piece, mid, others, range(len(others))) or OUTSIDE)
+        labels.append(where)
+    return labels
+
+
+class _Vertices(object):
+    # snap nearly equal endpoints together with a grid of buckets
+    def __init__(self, tolerance):
+        self.tolerance, self.k = tolerance, 1. / tolerance
+        self.buckets, self.points = {}, []
+
+    def find(self, pt):
+        i, j = int(math.floor(self.k * pt.x)), int(math.floor(self.k * pt.y))
+        for key in ((i + di, j + dj) for di in (-1, 0, 1) for dj in (-1, 0, 1)):
+            for n in self.buckets.get(key, ()):
+                q = self.points[n]
+                if abs(q.x - pt.x) <= self.tolerance and abs(q.y - pt.y) <= self.tolerance:
+                    return n
+        self.points.append(pt)
+        self.buckets.setdefault((i, j), []).append(len(self.points) - 1)
+        return len(self.points) - 1
+
+
+def link(pieces, tolerance=LINK_TOLERANCE):
+    """
+    Chain pieces end to start into contours, returned one after another in
+    a single list. Where several pieces leave the same vertex, as happens
+    when two contours touch at a point, any of them will do.
+    >>> from noodle import rectangle
+    >>> segs = rectangle(0, 0, 1, 1).segments
+    >>> link([segs[2], segs[0], segs[3], segs[1]]) == segs[2:] + segs[:2]
+    True
+    """
+    vertices = _Vertices(tolerance)
+    starts, ends, leaving = [], [], {}
+    for n, piece in enumerate(pieces):
+        starts.append(vertices.find(piece.start_point()))
+        ends.append(vertices.find(piece.end_point()))
+        leaving.setdefault(starts[-1], []).append(n)
+    for v in leaving:
+        leaving[v].reverse()    # pop() hands them out in their original order
+    used, result = [False] * len(pieces), []
+    for n in range(len(pieces)):
+        if used[n]:
+            continue
+        origin = starts[n]
+        while True:
+            used[n] = True
+            result.append(pieces[n])
+            if ends[n] == origin:
+                break
+            outgoing = leaving.get(ends[n], [])
+            while outgoing and used[outgoing[-1]]:
+                outgoing.pop()
+            if not outgoing:
+                break   # left open, which only happens with bad input
+            n = outgoing.pop()
+    return result
+
+
+def combine(a, b, op, method='sweep', grid=None):
+    """
+    With a predicates.Grid, both shapes and the result are snap rounded to
+    it, so edges meant to be shared are shared exactly. The result's own
+    crossings are found again as it is rounded, so rounding it adds none.
+    >>> from noodle import rectangle
+    >>> from predicates import Grid
+    >>> a, b = rectangle(0, 0, 1, 1), rectangle(2 + 3e-7, 0.5, 1, 1)
+    >>> len(combine(a, b, UNION).contours()), len(combine(a, b, UNION, grid=Grid(1000)).contours())
+    (2, 1)
+    >>> from noodle import Point
+    >>> sliver = Shape([Point(0, 0), Point(10, .4), Point(10, .45), Point(0, .2), Point(5, .6), Point(-1, 1)])
+    >>> u = combine(sliver, rectangle(4, 3, 1, 1), UNION, grid=Grid(1))
+    >>> u.is_simple(), u.area(), len(u.contours())
+    (True, 7.0, 2)
+    """
+    try:
+        keep_a, keep_b = RULES[op]
+    except KeyError:
+        raise ValueError(op)
+    if grid is not None:
+        a, b = grid.snap_shape(a, method), grid.snap_shape(b, method)
+        return grid.snap_shape(combine(a, b, op, method), method)
+    segments, others = counterclockwise(a), counterclockwise(b)
+    if not segments or not others:
+        if op == UNION:
+            return Shape.from_segments(segments or others)
+        return Shape.from_segments(segments if op == DIFFERENCE else [])
+    pieces_a, pieces_b, near_a = cut(segments, others, method)
+    labels_a = classify(pieces_a, others, spatial.PointLocator(others), near_a)
+    labels_b = classify(pieces_b, segments, spatial.PointLocator(segments))
+    kept = [piece for (piece, i), label in zip(pieces_a, labels_a) if label in keep_a]
+    for (piece, j), label in zip(pieces_b, labels_b):
+        if label in keep_b:
+            kept.append(piece.reversed() if op == DIFFERENCE else piece)
+    return Shape.from_segments(link(kept))
+
+
+def union(a, b, method='sweep', grid=None):
+    """
+    Two rectangles sharing part of an edge make one outline with no seam.
+    >>> from noodle import rectangle
+    >>> u = union(rectangle(0, 0, 1, 1), rectangle(2, 0.5, 1, 1))
+    >>> len(u.segments), u.area()
+    (8, 8.0)
+    """
+    return combine(a, b, UNION, method, grid)
+
+
+def intersection(a, b, method='sweep', grid=None):
+    """
+    >>> from noodle import rectangle, circle
+    >>> lens = intersection(circle(0, 0, 1), circle(1, 0, 1))
+    >>> [s.__class__.__name__ for s in lens.segments], round(lens.area(), 6)
+    (['Arc', 'Arc', 'Arc', 'Arc'], 1.22837)
+    """
+    return combine(a, b, INTERSECTION, method, grid)
+
+
+def difference(a, b, method='sweep', grid=None):
+    """
+    A hole cut out of the middle of a plate leaves two contours, the outline
+    running counter-clockwise and the hole running clockwise.
+    >>> from noodle import rectangle, circle
+    >>> plate = difference(rectangle(0, 0, 2, 2), circle(0, 0, 1))
+    >>> len(plate.segments), round(plate.area(), 6)
+    (6, 12.858407)
+    """
+    return combine(a, b, DIFFERENCE, method, grid)
+
+
+def flat_combine(a, b, op, tolerance, method='sweep'):
+    """
+    combine() on copies of the shapes with their arcs flattened to within
+    tolerance, with arcs fitted back over the result afterwards. Corners
+    where a refitted arc meets something else are moved onto the true arc,
+    so they are off by no more than about tolerance. It is slower than
+    combine(), which intersects arcs directly; it is here for results that
+    have to agree with a polyline version of the shapes.
+    >>> from noodle import rectangle, circle
+    >>> plate = flat_combine(rectangle(0, 0, 2, 2), circle(2, 0, 1), DIFFERENCE, 0.001)
+    >>> [s.__class__.__name__ for s in plate.segments]
+    ['Arc', 'LineSegment', 'LineSegment', 'LineSegment', 'LineSegment', 'LineSegment']
+    >>> round(plate.area(), 3), round(difference(rectangle(0, 0, 2, 2), circle(2, 0, 1)).area(), 3)
+    (14.429, 14.429)
+
+    Here a corner of the rectangle is inside the circle by less than the
+    tolerance, so the short lines either side of it look like part of the
+    flattened arc. The rectangle's edges only reach the circle past the
+    corner, off the edges, so the lines are kept rather than crossed.
+    >>> a, b = rectangle(0.5491, 0.5356, 0.7753, 0.5729), circle(-0.1541, 0.6853, 0.4298)
+    >>> lens = flat_combine(a, b, INTERSECTION, 0.001)
+    >>> lens.is_simple(), all(isinstance(s, LineSegment) for s in lens.segments)
+    (True, True)
+    >>> round(lens.area(), 3), round(intersection(a, b).area(), 3)
+    (0.35, 0.351)
+    >>> plate = flat_combine(a, b, DIFFERENCE, 0.001)
+    >>> plate.is_simple(), round(plate.area(), 4), round(difference(a, b).area(), 4)
+    (True, 1.4255, 1.4255)
+    """
+    circles = {}
+    for segment in a.segments + b.segments:
+        if isinstance(segment, Arc):
+            c = segment.center
+            circles[(round(c.x, 9), round(c.y, 9), round(segment.radius, 9))] = (c, segment.radius)
+    lines = [segment for segment in a.segments + b.segments if isinstance(segment, LineSegment)]
+    result = combine(a.flatten(tolerance), b.flatten(tolerance), op, method)
+    return refit(result, sorted(circles.values(), key=lambda c: (c[0].x, c[0].y, c[1])), tolerance, lines)
+
+
+def _flat_contours(segments):
+    # like Shape.contours(), but with the same slack as link()
+    contours = []
+    for segment in segments:
+        if contours and abs(contours[-1][-1].end_point() - segment.start_point()) <= 2 * LINK_TOLERANCE:
+            contours[-1].append(segment)
+        else:
+            contours.append([segment])
+    return contours
+
+
+def refit(shape, circles, tolerance, lines=()):
+    """
+    Replace runs of line segments lying within tolerance of one of the
+    (center, radius) circles, and bending the same way round it, with arcs.
+    lines are the straight segments the shape was cut from; where a piece
+    of one of them meets an arc, the corner has to be on that line. A
+    contour that would cross itself or another contour once refitted is
+    left as it was.
+    """
+    boxes = [(c.x - r, c.y - r, c.x + r, c.y + r) for c, r in circles]
+    grid = spatial.GridIndex.for_boxes(boxes) if boxes else None
+    lines = list(lines)
+    sources = spatial.GridIndex.for_boxes(s.bbox() for s in lines) if lines else None
+    pairs = []      # (contour, refitted contour)
+    for contour in _flat_contours(shape.segments):
+        closed = abs(contour[-1].end_point() - contour[0].start_point()) <= 2 * LINK_TOLERANCE
+        if grid is None or not closed or not all(isinstance(s, LineSegment) for s in contour):
+            pairs.append((contour, contour))
+            continue
+        labels, previous = [], None
+        for s in contour:
+            found = [(n, _sense(s, circles[n], tolerance)) for n in sorted(grid.query(s.bbox()))]
+            found = [label for label in found if label[1]]
+            label = None
+            if found:
+                label = previous if previous in found else found[0]
+            labels.append(label)
+            previous = label
+        refitted = _refit_contour(contour, labels, circles, tolerance, lines, sources)
+        if any(_collapsed(s) for s in refitted):
+            refitted = contour
+        pairs.append((contour, refitted))
+    return Shape.from_segments(_uncrossed(pairs))
+
+
+def _uncrossed(pairs):
+    # put the lines back for refitted contours that cross another contour,
+    # which the flattened ones didn't, until nothing refitted crosses
+    while True:
+        segments, owners = [], []
+        for n, (contour, refitted) in enumerate(pairs):
+            segments.extend(refitted)
+            owners.extend([n] * len(refitted))
+        crossing = set()
+        for i, j, pt in Shape.from_segments(segments).find_intersections():
+            crossing.update(n for n in (owners[i], owners[j]) if pairs[n][1] is not pairs[n][0])
+        if not crossing:
+            return segments
+        for n in crossing:
+            pairs[n] = (pairs[n][0], pairs[n][0])
+
+
+def _sense(segment, circle, tolerance):
+    # 1 or -1 for a segment running counter-clockwise or clockwise along the
+    # circle, or 0 if it isn't close to the circle
+    c, r = circle
+    slack = tolerance + LINK_TOLERANCE
+    p1, p2 = segment.p1, segment.p2
+    for p in (p1, p2, segment.midpoint()):
+        if not r - slack <= abs(p - c) <= r + LINK_TOLERANCE:
+            return 0
+    if abs(p2 - p1) > _chord(circle, tolerance) + LINK_TOLERANCE:
+        return 0
+    return 1 if (p1 - c).cross(p2 - p1) > 0 else -1
+
+
+def _refit_contour(contour, labels, circles, tolerance, lines, sources):
+    n = len(contour)
+    while True:
+        if all(label == labels[0] for label in labels):
+            if labels[0] is None:
+                return contour
+            (c, r), sense = circles[labels[0][0]], labels[0][1]
+            # only a contour that goes all the way round is the circle; a
+            # sliver along the arc stays as it is
+            if abs(_turn(c, [s.p1 for s in contour] + [contour[0].p1])) < PI:
+                return contour
+            p = contour[0].p1
+            a = math.atan2(p.y - c.y, p.x - c.x)
+            return [Arc(c, r, a, a + sense * PI), Arc(c, r, a + sense * PI, a + sense * TWO_PI)]
+        # runs of one label, starting where the label changes
+        k = next(k for k in range(n) if labels[k] != labels[k - 1])
+        order = list(range(k, n)) + list(range(k))
+        runs = []
+        for i in order:
+            if runs and runs[-1][0] == labels[i]:
+                runs[-1][1].append(contour[i])
+            else:
+                runs.append((labels[i], [contour[i]]))
+        corners, failed = [], None
+        for m in range(len(runs)):
+            left, right = runs[m - 1], runs[m]
+            corner = _corner(left, right, circles, tolerance, lines, sources)
+            if corner is None:
+                failed = left if left[0] is not None else right
+                break
+            corners.append(corner)
+        if failed is None:
+            break
+        # keep the lines for a run whose ends can't be put on its circle
+        bad = failed[0]
+        labels = [None if label == bad else label for label in labels]
+    result = []
+    for m, (label, run) in enumerate(runs):
+        start, end = corners[m], corners[(m + 1) % len(runs)]
+        if label is None:
+            points = [start] + [s.p2 for s in run[:-1]] + [end]
+            result.extend(LineSegment(p, q) for p, q in zip(points, points[1:]))
+            continue
+        # follow the run round the circle, so the arc turns the same way
+        # and as far as the lines did
+        c, r = circles[label[0]]
+        points = [start] + [s.p2 for s in run[:-1]] + [end]
+        a, b = math.atan2(start.y - c.y, start.x - c.x), math.atan2(end.y - c.y, end.x - c.x)
+        b += TWO_PI * round((a + _turn(c, points) - b) / TWO_PI)
+        result.append(Arc(c, r, a, b))
+    return result
+
+
+def _turn(c, points):
+    # how far round c the points go, one step at a time
+    angles = [math.atan2(p.y - c.y, p.x - c.x) for p in points]
+    return sum((t - s + PI) % TWO_PI - PI for s, t in zip(angles, angles[1:]))
+
+
+def _corner(left, right, circles, tolerance, lines, sources):
+    # where the run on the left should end and the one on the right start
+    v = right[1][0].p1
+    if left[0] is None and right[0] is None:
+        return v
+    if left[0] is not None and right[0] is not None:
+        if left[0][0] == right[0][0]:
+            return None
+        points = _circles_meet(circles[left[0][0]], circles[right[0][0]])
+    else:
+        line, label = (left[1][-1], right[0]) if left[0] is None else (right[1][0], left[0])
+        points = _line_meets_circle(line, circles[label[0]])
+        # the line is only as long as the one it was cut from
+        whole = [s for s in _sources(line, lines, sources)]
+        if whole:
+            points = [p for p in points if any(_near(s, p) for s in whole)]
+    if not points:
+        return None
+    best = min(points, key=lambda p: abs(p - v))
+    # where a line meets the arc at a shallow angle the corner can slide
+    # along it by as much as a whole chord of the flattened arc
+    reach = max(_chord(circles[label[0]], tolerance) for label in (left[0], right[0]) if label)
+    return best if abs(best - v) <= reach + tolerance + LINK_TOLERANCE else None
+
+
+def _collapsed(segment):
+    # a line or arc that has shrunk to a point
+    if isinstance(segment, Arc):
+        r = segment.angle_range
+        return abs(r.finish - r.start) * segment.radius < LINK_TOLERANCE
+    return abs(segment.p2 - segment.p1) < LINK_TOLERANCE
+
+
+def _sources(piece, lines, sources):
+    # the lines the piece was cut from
+    if sources is None:
+        return []
+    return [lines[k] for k in sorted(sources.query(piece.bbox()))
+            if _near(lines[k], piece.p1) and _near(lines[k], piece.p2)]
+
+
+def _near(line, p):
+    # p is within LINK_TOLERANCE of the line, ends included
+    r = line.p2 - line.p1
+    t = min(1., max(0., (p - line.p1).dot(r) / r.square())) if not line.degenerate() else 0.
+    return abs(line.param_to_point(t) - p) <= LINK_TOLERANCE
+
+
+def _chord(circle, tolerance):
+    # the longest chord of the circle within tolerance of it
+    r = circle[1]
+    return 2 * r if tolerance >= r else 2 * (2 * r * tolerance - tolerance ** 2) ** .5
+
+
+def _line_meets_circle(line, circle):
+    c, r = circle
+    d = line.p2 - line.p1
+    f = line.p1 - c
+    a, b, k = d.dot(d), 2 * f.dot(d), f.dot(f) - r * r
+    disc = b * b - 4 * a * k
+    if disc < 0:
+        # only just missing it; the nearest point of the line will do
+        t = -b / (2 * a)
+        return [line.p1 + t * d]
+    root = disc ** .5
+    return [line.p1 + t * d for t in ((-b - root) / (2 * a), (-b + root) / (2 * a))]
+
+
+def _circles_meet(first, second):
+    (c1, r1), (c2, r2) = first, second
+    u = c2 - c1
+    d = abs(u)
+    if d == 0:
+        return []
+    u = (1. / d) * u
+    a = (r1 * r1 - r2 * r2 + d * d) / (2 * d)
+    h = max(r1 * r1 - a * a, 0.) ** .5
+    mid = c1 + a * u
+    return [mid + h * Vector(-u.y, u.x), mid + h * Vector(u.y, -u.x)]
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
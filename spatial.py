@@ -0,0 +1,328 @@
+"""
+Bounding-box indexes for pruning segment-vs-segment tests.
+
+Boxes are (xmin, ymin, xmax, ymax) tuples, as returned by LineSegment.bbox()
+and Arc.bbox(). Everything here works on boxes alone, so candidate pairs
+come out cheaply and the exact intersect() calls only run on pairs whose
+boxes actually overlap.
+"""
+
+import math
+from bisect import bisect_left, bisect_right, insort
+
+from noodle import EPSILON, PI, INSIDE, OUTSIDE, ON_BOUNDARY, LineSegment, Arc
+
+# how far along x from a piece's crossing a point can be and still be
+# handed to passes_through(): a point within EPSILON of a piece as shallow
+# as 1 in 10^5 can sit this far from where the ray meets it
+BOUNDARY_BAND = 1.e5 * EPSILON
+
+
+def overlaps(a, b, tol=EPSILON):
+    """
+    >>> overlaps((0, 0, 1, 1), (1, 1, 2, 2))
+    True
+    >>> overlaps((0, 0, 1, 1), (1.5, 0, 2, 1))
+    False
+    """
+    return (a[0] <= b[2] + tol and b[0] <= a[2] + tol and
+            a[1] <= b[3] + tol and b[1] <= a[3] + tol)
+
+
+def union(boxes):
+    """
+    >>> union([(0, 0, 1, 1), (2, -1, 3, 0)])
+    (0, -1, 3, 1)
+    """
+    boxes = iter(boxes)
+    xmin, ymin, xmax, ymax = next(boxes)
+    for box in boxes:
+        xmin, ymin = min(xmin, box[0]), min(ymin, box[1])
+        xmax, ymax = max(xmax, box[2]), max(ymax, box[3])
+    return (xmin, ymin, xmax, ymax)
+
+
+class GridIndex(object):
+    """
+    A uniform grid of buckets. Each box is registered in every cell it
+    touches, so a query only looks at boxes sharing a cell with it.
+    >>> grid = GridIndex(1.0)
+    >>> grid.insert(0, (0, 0, 0.5, 0.5))
+    >>> grid.insert(1, (3, 3, 4, 4))
+    >>> sorted(grid.query((0.2, 0.2, 1.2, 1.2)))
+    [0]
+    """
+    def __init__(self, cell_size):
+        if cell_size <= 0:
+            raise ValueError(cell_size)
+        self.cell_size = float(cell_size)
+        self.cells = {}
+        self.boxes = {}
+
+    @classmethod
+    def for_boxes(cls, boxes):
+        # cells about the size of an average box keep both the number of
+        # cells per box and the number of boxes per cell small
+        boxes = list(boxes)
+        size = sum(max(b[2] - b[0], b[3] - b[1]) for b in boxes) / max(len(boxes), 1)
+        grid = cls(max(size, 1000 * EPSILON))
+        for i, box in enumerate(boxes):
+            grid.insert(i, box)
+        return grid
+
+    def _cells(self, box):
+        k = 1. / self.cell_size
+        i0, i1 = int(math.floor(k * (box[0] - EPSILON))), int(math.floor(k * (box[2] + EPSILON)))
+        j0, j1 = int(math.floor(k * (box[1] - EPSILON))), int(math.floor(k * (box[3] + EPSILON)))
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                yield (i, j)
+
+    def insert(self, key, box):
+        self.boxes[key] = box
+        for cell in self._cells(box):
+            self.cells.setdefault(cell, []).append(key)
+
+    def query(self, box):
+        found = set()
+        for cell in self._cells(box):
+            for key in self.cells.get(cell, ()):
+                if key not in found and overlaps(box, self.boxes[key]):
+                    found.add(key)
+        return found
+
+
+def sweep_pairs(boxes, others=None):
+    """
+    Sweep a vertical line left to right over the boxes, keeping the boxes it
+    currently crosses in an active list ordered by right edge. Only boxes
+    that are active together can overlap, so each box is compared with the
+    active ones rather than with everything. With one list, yield pairs
+    (i, j) with i < j. With two lists, yield (i, j) pairs of an index into
+    boxes and an index into others.
+    >>> sorted(sweep_pairs([(0, 0, 2, 2), (1, 1, 3, 3), (5, 5, 6, 6)]))
+    [(0, 1)]
+    >>> sorted(sweep_pairs([(0, 0, 2, 2)], [(1, 1, 3, 3), (1, 5, 3, 6)]))
+    [(0, 0)]
+    """
+    events = [(box[0], 0, i, box) for i, box in enumerate(boxes)]
+    if others is not None:
+        events.extend((box[0], 1, i, box) for i, box in enumerate(others))
+    events.sort(key=lambda e: e[0])
+    active = [[], []]
+    for xmin, side, i, box in events:
+        group = active[0] if others is None else active[1 - side]
+        # drop boxes that ended to the left of the sweep line
+        n = 0
+        while n < len(group) and group[n][0] < xmin - EPSILON:
+            n += 1
+        del group[:n]
+        for _, j, other in group:
+            if box[1] <= other[3] + EPSILON and other[1] <= box[3] + EPSILON:
+                if others is None:
+                    yield (j, i) if j < i else (i, j)
+                elif side == 0:
+                    yield (i, j)
+                else:
+                    yield (j, i)
+        insort(active[side], (box[2], i, box))
+
+
+def grid_pairs(boxes, others=None):
+    """
+    Same contract as sweep_pairs, using a GridIndex instead of a sweep line.
+    >>> sorted(grid_pairs([(0, 0, 2, 2), (1, 1, 3, 3), (5, 5, 6, 6)]))
+    [(0, 1)]
+    >>> sorted(grid_pairs([(0, 0, 2, 2)], [(1, 1, 3, 3), (1, 5, 3, 6)]))
+    [(0, 0)]
+    """
+    boxes = list(boxes)
+    if others is None:
+        grid = GridIndex.for_boxes(boxes)
+        for i, box in enumerate(boxes):
+            for j in grid.query(box):
+                if i < j:
+                    yield (i, j)
+    else:
+        grid = GridIndex.for_boxes(others)
+        for i, box in enumerate(boxes):
+            for j in grid.query(box):
+                yield (i, j)
+
+
+PAIR_FINDERS = {'sweep': sweep_pairs, 'grid': grid_pairs}
+
+
+def candidate_pairs(boxes, others=None, method='sweep'):
+    try:
+        finder = PAIR_FINDERS[method]
+    except KeyError:
+        raise ValueError(method)
+    return finder(boxes, others)
+
+
+# A y-monotone piece of the boundary is a tuple
+#     (ylo, yhi, kind, a, b, c, index)
+# where index is the segment it came from. For a line, x at height y is
+# a + (y - b) * c. For a quarter (or smaller) arc, it is a + c * sqrt(r^2 - (y - b)^2)
+# with r = the radius and c = +1 or -1 for the right or left side of the circle.
+_LINE, _ARC = 0, 1
+
+
+def monotone_pieces(segments):
+    """
+    Break segments into pieces that are monotone in y, and return them along
+    with the horizontal lines, which the crossing count skips.
+    >>> from noodle import Point
+    >>> pieces, flat = monotone_pieces([Arc(Point(0., 0.), 1., 0, PI)])
+    >>> [(p[0], p[1], p[5]) for p in pieces]
+    [(0.0, 1.0, 1), (0.0, 1.0, -1)]
+    """
+    pieces, horizontals, seen = [], [], {}
+
+    def snap(y):
+        # pieces that meet at a vertex must agree exactly on its height, or
+        # a ray through the vertex could count it twice or not at all
+        k = int(round(y / EPSILON))
+        for key in (k, k - 1, k + 1):
+            if key in seen:
+                return seen[key]
+        seen[k] = y
+        return y
+
+    for index, segment in enumerate(segments):
+        if isinstance(segment, LineSegment):
+            (x1, y1), (x2, y2) = (segment.p1.x, snap(segment.p1.y)), (segment.p2.x, snap(segment.p2.y))
+            if y1 == y2:
+                horizontals.append((y1, min(x1, x2), max(x1, x2), index))
+            else:
+                pieces.append((min(y1, y2), max(y1, y2), _LINE,
+                               x1, y1, float(x2 - x1) / (y2 - y1), index))
+        elif isinstance(segment, Arc):
+            cx, cy, r = segment.center.x, segment.center.y, segment.radius
+            a = min(segment.angle_range.start, segment.angle_range.finish)
+            b = max(segment.angle_range.start, segment.angle_range.finish)
+            # split at the top and bottom of the circle, where the arc turns around in y
+            cuts, k = [a], int(math.floor((a - PI / 2) / PI)) + 1
+            while PI / 2 + k * PI < b:
+                cuts.append(PI / 2 + k * PI)
+                k += 1
+            cuts.append(b)
+            for t0, t1 in zip(cuts[:-1], cuts[1:]):
+                y0, y1 = snap(cy + r * math.sin(t0)), snap(cy + r * math.sin(t1))
+                if y0 != y1:
+                    side = 1 if math.cos(0.5 * (t0 + t1)) > 0 else -1
+                    pieces.append((min(y0, y1), max(y0, y1), _ARC, cx, cy, side, index))
+        else:
+            raise TypeError(segment)
+    return pieces, horizontals
+
+
+def _piece_x(piece, y, radii):
+    ylo, yhi, kind, a, b, c, index = piece
+    if kind == _LINE:
+        return a + (y - b) * c
+    dy = y - b
+    return a + c * max(0., radii[index] ** 2 - dy * dy) ** .5
+
+
+def classify_point(segments, pt):
+    """
+    Classify a point against closed contours with a horizontal ray cast
+    toward +x. Each monotone piece covers the half-open range ylo <= y < yhi,
+    so a ray through a vertex counts it exactly once and nothing needs to be
+    retried.
+    >>> from noodle import Point, rectangle
+    >>> square = rectangle(0, 0, 1, 1).segments
+    >>> classify_point(square, Point(0, 0)), classify_point(square, Point(0, 1))
+    ('inside', 'on boundary')
+    >>> classify_point(square, Point(-2, 1)), classify_point(square, Point(2, 0))
+    ('outside', 'outside')
+    """
+    pieces, horizontals = monotone_pieces(segments)
+    return _classify(segments, pieces, horizontals, pt)
+
+
+def _radii(segments):
+    return [getattr(segment, 'radius', 0) for segment in segments]
+
+
+def _classify(segments, pieces, horizontals, pt, radii=None):
+    px, py = pt.x, pt.y
+    if radii is None:
+        radii = _radii(segments)
+    for y, xmin, xmax, index in horizontals:
+        if abs(y - py) < EPSILON and xmin - EPSILON <= px <= xmax + EPSILON:
+            return ON_BOUNDARY
+    crossings = 0
+    for piece in pieces:
+        if piece[0] - EPSILON <= py <= piece[1] + EPSILON:
+            if segments[piece[6]].passes_through(pt):
+                return ON_BOUNDARY
+            if piece[0] <= py < piece[1] and _piece_x(piece, py, radii) > px:
+                crossings += 1
+    return INSIDE if crossings % 2 else OUTSIDE
+
+
+class PointLocator(object):
+    """
+    Precomputed crossing data for classifying many points against the same
+    segments. The y values of the piece endpoints cut the plane into slabs,
+    and each slab keeps the pieces that span it, so a query is a binary
+    search followed by a crossing count over just those pieces.
+    >>> from noodle import Point, rectangle
+    >>> locator = PointLocator(rectangle(0, 0, 1, 1).segments)
+    >>> [locator.classify(Point(x, 0.5)) for x in (-2, -1, 0, 1, 2)]
+    ['outside', 'on boundary', 'inside', 'on boundary', 'outside']
+    """
+    def __init__(self, segments):
+        self.segments = list(segments)
+        self.radii = _radii(self.segments)
+        pieces, horizontals = monotone_pieces(self.segments)
+        self.ys = sorted(set([p[0] for p in pieces] + [p[1] for p in pieces]))
+        self.slabs = [[] for _ in self.ys[1:]]
+        for piece in pieces:
+            for i in range(bisect_left(self.ys, piece[0]), bisect_left(self.ys, piece[1])):
+                self.slabs[i].append(piece)
+        horizontals.sort()
+        self.horizontals = horizontals
+        self.horizontal_ys = [h[0] for h in horizontals]
+
+    def _near_vertex(self, py):
+        i = bisect_left(self.ys, py - EPSILON)
+        return i < len(self.ys) and self.ys[i] <= py + EPSILON
+
+    def classify(self, pt):
+        px, py = pt.x, pt.y
+        lo = bisect_left(self.horizontal_ys, py - EPSILON)
+        hi = bisect_right(self.horizontal_ys, py + EPSILON)
+        for y, xmin, xmax, index in self.horizontals[lo:hi]:
+            if xmin - EPSILON <= px <= xmax + EPSILON:
+                return ON_BOUNDARY
+        if self._near_vertex(py):
+            # close to a slab edge, look at the slabs on both sides
+            lo = max(bisect_right(self.ys, py - EPSILON) - 1, 0)
+            hi = min(bisect_right(self.ys, py + EPSILON), len(self.slabs))
+            for slab in self.slabs[lo:hi]:
+                for piece in slab:
+                    if self.segments[piece[6]].passes_through(pt):
+                        return ON_BOUNDARY
+        i = bisect_right(self.ys, py) - 1
+        if i < 0 or i >= len(self.slabs):
+            return OUTSIDE
+        crossings = 0
+        for piece in self.slabs[i]:
+            x = _piece_x(piece, py, self.radii)
+            if abs(x - px) < BOUNDARY_BAND and self.segments[piece[6]].passes_through(pt):
+                return ON_BOUNDARY
+            if x > px:
+                crossings += 1
+        return INSIDE if crossings % 2 else OUTSIDE
+
+    def classify_many(self, points):
+        return [self.classify(pt) for pt in points]
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,537 @@
+"""
+Order the contours of a sheet of shapes to cut down on laser head travel.
+
+The plan starts with a nearest-neighbour tour, found with a KD-tree over
+every point where a contour could be started, and improves it with 2-opt
+moves. Then it picks the best starting vertex on each closed contour for
+the tour it ended up with. A contour lying inside another one (a peg hole
+inside a plate) is always cut before the contour around it, so the part
+is still held in place by the sheet while its holes are cut.
+
+    plan = plan_toolpath(shapes)
+    print(plan.report())
+    plan.shape().postscript(tfm)
+
+Parts nested edge to edge share stretches of outline, which would be cut
+twice. merge_shared_edges() gives each such stretch to one of the parts
+and leaves the other open there. Its plan() still cuts every hole before
+any of the outline around it, including the stretches the other part cut:
+
+    merged = merge_shared_edges(shapes)
+    print(merged.report())
+    plan = merged.plan()
+"""
+
+import heapq
+import math
+
+from noodle import EPSILON, PI, INSIDE, Arc, LineSegment, Point, Shape
+import spatial
+
+
+class KDTree(object):
+    """
+    A 2-d tree over a fixed set of points, which can be removed one at a
+    time as they are used up.
+    >>> tree = KDTree([(0, 0), (5, 5), (1, 1), (9, 0)])
+    >>> tree.nearest(4, 4), tree.nearest(4, 4, accept=lambda i: i != 1)
+    (1, 2)
+    >>> tree.remove(1)
+    >>> tree.nearest(6, 6), tree.k_nearest(0, 0, 2)
+    (3, [0, 2])
+    """
+    def __init__(self, points):
+        self.points = [(float(x), float(y)) for x, y in points]
+        n = len(self.points)
+        self.left, self.right, self.axis = [None] * n, [None] * n, [0] * n
+        self.parent, self.count, self.alive = [None] * n, [0] * n, [True] * n
+        self.root = self._build(list(range(n)), 0, None)
+
+    def _build(self, indices, depth, parent):
+        if not indices:
+            return None
+        axis = depth % 2
+        indices.sort(key=lambda i: self.points[i][axis])
+        m = len(indices) // 2
+        node = indices[m]
+        self.axis[node], self.parent[node], self.count[node] = axis, parent, len(indices)
+        self.left[node] = self._build(indices[:m], depth + 1, node)
+        self.right[node] = self._build(indices[m + 1:], depth + 1, node)
+        return node
+
+    def remove(self, i):
+        if self.alive[i]:
+            self.alive[i] = False
+            while i is not None:
+                self.count[i] -= 1
+                i = self.parent[i]
+
+    def nearest(self, x, y, accept=None):
+        """
+        The index of the live point nearest (x, y), among those that accept
+        says yes to, or None if there are none.
+        """
+        best, best_d2 = None, float('inf')
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            if node is None or self.count[node] == 0:
+                continue
+            px, py = self.points[node]
+            d2 = (px - x) ** 2 + (py - y) ** 2
+            if d2 < best_d2 and self.alive[node] and (accept is None or accept(node)):
+                best, best_d2 = node, d2
+            delta = (x - px) if self.axis[node] == 0 else (y - py)
+            near, far = (self.left[node], self.right[node]) if delta < 0 else (self.right[node], self.left[node])
+            if delta * delta < best_d2:
+                stack.append(far)
+            stack.append(near)
+        return best
+
+    def k_nearest(self, x, y, k):
+        """
+        The indices of the k live points nearest (x, y), closest first.
+        """
+        if k <= 0:
+            return []
+        # a max-heap of the best k so far, as negated (distance, index)
+        found = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            if node is None or self.count[node] == 0:
+                continue
+            px, py = self.points[node]
+            if self.alive[node]:
+                item = (-((px - x) ** 2 + (py - y) ** 2), -node)
+                if len(found) < k:
+                    heapq.heappush(found, item)
+                elif item > found[0]:
+                    heapq.heapreplace(found, item)
+            limit = -found[0][0] if len(found) == k else float('inf')
+            delta = (x - px) if self.axis[node] == 0 else (y - py)
+            near, far = (self.left[node], self.right[node]) if delta < 0 else (self.right[node], self.left[node])
+            if delta * delta < limit:
+                stack.append(far)
+            stack.append(near)
+        return [-node for d2, node in sorted(found, reverse=True)]
+
+
+def _distance(p, q):
+    return math.hypot(p.x - q.x, p.y - q.y)
+
+
+class Contour(object):
+    """
+    One connected run of segments. A closed contour may be cut starting at
+    any of its vertices; an open one from either end. parents are the
+    contours that must be cut after it.
+    """
+    def __init__(self, segments):
+        self.segments = segments
+        self.closed = segments[-1].end_point() == segments[0].start_point()
+        self.parents = []
+        self.bbox = spatial.union(s.bbox() for s in segments)
+
+    def starts(self):
+        if self.closed:
+            return [s.start_point() for s in self.segments]
+        return [self.segments[0].start_point(), self.segments[-1].end_point()]
+
+    def oriented(self, k):
+        # the segments in cutting order, starting from candidate start k
+        if self.closed:
+            return self.segments[k:] + self.segments[:k]
+        if k == 0:
+            return list(self.segments)
+        return [s.reversed() for s in reversed(self.segments)]
+
+    def entry_exit(self, k):
+        if self.closed:
+            p = self.segments[k].start_point()
+            return p, p
+        ends = self.segments[0].start_point(), self.segments[-1].end_point()
+        return ends if k == 0 else ends[::-1]
+
+
+def find_parents(contours):
+    """
+    Set each contour's parents to the index of the smallest closed contour
+    around it, if there is one.
+    """
+    closed = [n for n, c in enumerate(contours) if c.closed]
+    grid = spatial.GridIndex.for_boxes([contours[n].bbox for n in closed]) if closed else None
+    for contour in contours:
+        if grid is None:
+            break
+        box, best, best_area = contour.bbox, None, None
+        pt = contour.segments[0].start_point()
+        for m in grid.query(box):
+            other = contours[closed[m]]
+            b = other.bbox
+            if other is contour or not (b[0] <= box[0] and b[1] <= box[1] and box[2] <= b[2] and box[3] <= b[3]):
+                continue
+            area = (b[2] - b[0]) * (b[3] - b[1])
+            if best is not None and area >= best_area:
+                continue
+            if spatial.classify_point(other.segments, pt) == INSIDE:
+                best, best_area = closed[m], area
+        contour.parents = [] if best is None else [best]
+
+
+class ToolpathPlan(object):
+    def __init__(self, contours, order, starts, origin, baseline):
+        self.contours, self.order, self.starts = contours, order, starts
+        self.origin, self.baseline_travel = origin, baseline
+        self.travel = _travel(contours, order, starts, origin)
+
+    @property
+    def savings(self):
+        return self.baseline_travel - self.travel
+
+    def segments(self):
+        for n in self.order:
+            for segment in self.contours[n].oriented(self.starts[n]):
+                yield segment
+
+    def shape(self):
+        return Shape.from_segments(self.segments())
+
+    def report(self):
+        percent = 100. * self.savings / self.baseline_travel if self.baseline_travel else 0.
+        return ('{0} contours, travel {1:.2f} -> {2:.2f} ({3:.1f}% saved)'
+                .format(len(self.contours), self.baseline_travel, self.travel, percent))
+
+
+def _travel(contours, order, starts, origin):
+    head, total = origin, 0.
+    for n in order:
+        entry, exit = contours[n].entry_exit(starts[n])
+        total += _distance(head, entry)
+        head = exit
+    return total
+
+
+def nearest_neighbour(contours, origin):
+    """
+    Greedy tour: from wherever the head is, go to the nearest start point of
+    any contour that is ready to be cut. A contour is ready once everything
+    inside it has been cut.
+    """
+    owners, points = [], []
+    for n, contour in enumerate(contours):
+        for k, pt in enumerate(contour.starts()):
+            owners.append((n, k))
+            points.append((pt.x, pt.y))
+    tree = KDTree(points)
+    waiting = [0] * len(contours)
+    for contour in contours:
+        for p in contour.parents:
+            waiting[p] += 1
+    by_contour = [[] for _ in contours]
+    for i, (n, k) in enumerate(owners):
+        by_contour[n].append(i)
+    order, starts, head = [], [None] * len(contours), origin
+    for _ in contours:
+        i = tree.nearest(head.x, head.y, accept=lambda i: waiting[owners[i][0]] == 0)
+        n, k = owners[i]
+        order.append(n)
+        starts[n] = k
+        for j in by_contour[n]:
+            tree.remove(j)
+        head = contours[n].entry_exit(k)[1]
+        for p in contours[n].parents:
+            waiting[p] -= 1
+    return order, starts
+
+
+def two_opt(contours, order, starts, origin, neighbours=8, passes=10):
+    """
+    Reverse stretches of the tour while that shortens it and keeps every
+    contour after the contours inside it. Candidate moves join the end of
+    one step to one of the nearby contours found with a KD-tree.
+    """
+    n = len(order)
+    if n < 3:
+        return order, starts
+
+    def endpoints(pos):
+        c = order[pos]
+        return contours[c].entry_exit(starts[c])
+
+    def flip(c):
+        # reversing an open contour swaps its ends
+        if not contours[c].closed:
+            starts[c] = 1 - starts[c]
+
+    position = [0] * len(contours)
+    for pos, c in enumerate(order):
+        position[c] = pos
+    entries = [contours[c].entry_exit(starts[c])[0] for c in range(len(contours))]
+    tree = KDTree([(p.x, p.y) for p in entries])
+    parents = [c.parents for c in contours]
+    for _ in range(passes):
+        improved = False
+        for i in range(n):
+            before = origin if i == 0 else endpoints(i - 1)[1]
+            entry_i = endpoints(i)[0]
+            for c in tree.k_nearest(before.x, before.y, neighbours):
+                j = position[c]
+                if j <= i:
+                    continue
+                exit_j = endpoints(j)[1]
+                after = endpoints(j + 1)[0] if j + 1 < n else None
+                old = _distance(before, entry_i) + (_distance(exit_j, after) if after else 0.)
+                new = _distance(before, exit_j) + (_distance(entry_i, after) if after else 0.)
+                if new < old - 1.e-9 and _can_reverse(order, position, parents, i, j):
+                    order[i:j + 1] = order[i:j + 1][::-1]
+                    for pos in range(i, j + 1):
+                        position[order[pos]] = pos
+                        flip(order[pos])
+                    entry_i = endpoints(i)[0]
+                    improved = True
+        if not improved:
+            break
+    return order, starts
+
+
+def _can_reverse(order, position, parents, i, j):
+    # a child and its parent both inside the stretch would swap places
+    for pos in range(i, j + 1):
+        if any(i <= position[p] <= j for p in parents[order[pos]]):
+            return False
+    return True
+
+
+def choose_starts(contours, order, starts, origin):
+    """
+    For each closed contour in turn, start at the vertex that makes the
+    trip in from the previous contour and out to the next one shortest.
+    """
+    head = origin
+    for pos, c in enumerate(order):
+        contour = contours[c]
+        if contour.closed:
+            following = None
+            if pos + 1 < len(order):
+                nxt = order[pos + 1]
+                following = contours[nxt].entry_exit(starts[nxt])[0]
+            candidates = contour.starts()
+            starts[c] = min(range(len(candidates)), key=lambda k: _distance(head, candidates[k]) +
+                            (_distance(candidates[k], following) if following else 0.))
+        head = contour.entry_exit(starts[c])[1]
+    return starts
+
+
+# lines are hashed by direction and distance from the origin in steps of
+# this size, and compared with the lines in neighbouring buckets too
+LINE_BUCKET = 1.e-6
+
+
+def _length(segment):
+    if isinstance(segment, Arc):
+        r = segment.angle_range
+        return segment.radius * abs(r.finish - r.start)
+    return abs(segment.p2 - segment.p1)
+
+
+def _line_key(line):
+    d = line.p2 - line.p1
+    theta = math.atan2(d.y, d.x) % PI
+    if theta > PI - LINE_BUCKET:
+        theta -= PI
+    offset = line.p1.y * math.cos(theta) - line.p1.x * math.sin(theta)
+    return int(math.floor(theta / LINE_BUCKET)), int(math.floor(offset / LINE_BUCKET))
+
+
+def _line_classes(lines):
+    # the lines in groups lying along one line, found through the buckets
+    buckets, parent = {}, list(range(len(lines)))
+
+    def find(n):
+        while parent[n] != n:
+            parent[n] = parent[parent[n]]
+            n = parent[n]
+        return n
+    for n, line in enumerate(lines):
+        i, j = _line_key(line)
+        for key in ((i + di, j + dj) for di in (-1, 0, 1) for dj in (-1, 0, 1)):
+            for m in buckets.get(key, ()):
+                if find(m) != find(n) and line.colinear(lines[m]) and lines[m].colinear(line):
+                    parent[find(m)] = find(n)
+        buckets.setdefault((i, j), []).append(n)
+    classes = {}
+    for n in range(len(lines)):
+        classes.setdefault(find(n), []).append(n)
+    return [members for members in classes.values() if len(members) > 1]
+
+
+class SharedEdges(object):
+    """
+    A sheet of shapes with every stretch of edge that two parts share cut
+    only once. contours holds what is left to cut, in the shapes' order,
+    so the parts' outlines carry on unbroken except where a shared stretch
+    has gone to the other part. Their parents are worked out from the
+    original outlines.
+    """
+    def __init__(self, contours, before, shared):
+        self.contours, self.before, self.shared = contours, before, shared
+        self.segments = [s for contour in contours for s in contour.segments]
+        self.after = sum(_length(s) for s in self.segments)
+
+    @property
+    def saved(self):
+        return self.before - self.after
+
+    def shape(self):
+        return Shape.from_segments(self.segments)
+
+    def plan(self, origin=None, neighbours=8, passes=10):
+        return _plan(self.contours, origin, neighbours, passes)
+
+    def report(self):
+        percent = 100. * self.saved / self.before if self.before else 0.
+        return ('{0} shared edges, cut length {1:.2f} -> {2:.2f} ({3:.1f}% saved)'
+                .format(self.shared, self.before, self.after, percent))
+
+
+def merge_shared_edges(shapes):
+    """
+    Find lines lying along each other, through a hash of their direction
+    and distance from the origin, and give each stretch of such a line to
+    the first segment that covers it. Arcs are left as they are.
+    >>> from noodle import rectangle
+    >>> merged = merge_shared_edges([rectangle(0, 0, 1, 1), rectangle(2, 0.5, 1, 1), rectangle(9, 0, 1, 1)])
+    >>> merged.report()
+    '1 shared edges, cut length 24.00 -> 22.50 (6.2% saved)'
+    >>> [(len(c.segments), c.closed) for c in merged.contours]
+    [(4, True), (4, False), (4, True)]
+
+    A hole is cut before every contour carrying some of the outline around
+    it, here both outlines for the hole in the second part.
+    >>> from noodle import Point
+    >>> a = rectangle(0, 0, 1, 1) - rectangle(0, 0, 0.3, 0.3)
+    >>> b = rectangle(2, 0, 1, 1) - rectangle(2, 0, 0.3, 0.3)
+    >>> merged = merge_shared_edges([a, b])
+    >>> [(c.closed, c.parents) for c in merged.contours]
+    [(True, []), (True, [0]), (False, []), (True, [0, 2])]
+    >>> merged.plan(origin=Point(-5, 0)).order
+    [1, 3, 0, 2]
+    """
+    originals = [Contour(run) for shape in shapes for run in shape.contours()]
+    find_parents(originals)
+    segments, home, offsets = [], [], []
+    for c, contour in enumerate(originals):
+        offsets.append(len(segments))
+        segments.extend(contour.segments)
+        home.extend([c] * len(contour.segments))
+    before = sum(_length(s) for s in segments)
+    lines = [n for n, s in enumerate(segments) if isinstance(s, LineSegment) and not s.p1 == s.p2]
+    owned, shared = {}, 0
+    for members in _line_classes([segments[n] for n in lines]):
+        members = [lines[k] for k in members]
+        first = segments[members[0]]
+        origin, u = first.p1, (first.p2 - first.p1).normalize()
+        spans = {}
+        for n in members:
+            a, b = (segments[n].p1 - origin).dot(u), (segments[n].p2 - origin).dot(u)
+            spans[n] = (min(a, b), max(a, b))
+        cuts = []
+        for t in sorted(t for span in spans.values() for t in span):
+            if not cuts or t - cuts[-1] > EPSILON:
+                cuts.append(t)
+        pieces = dict((n, []) for n in members)
+        waiting, covering = sorted(members, key=lambda n: spans[n][0], reverse=True), set()
+        for a, b in zip(cuts, cuts[1:]):
+            while waiting and spans[waiting[-1]][0] - EPSILON <= a:
+                covering.add(waiting.pop())
+            covering = set(n for n in covering if b <= spans[n][1] + EPSILON)
+            if covering:
+                pieces[min(covering)].append((a, b, frozenset(covering)))
+                shared += len(covering) > 1
+        for n in members:
+            owned[n] = _owned_pieces(segments[n], spans[n], pieces[n], origin, u)
+    # chain what each original contour kept into runs, noting every
+    # original outline a run cuts some of
+    runs, carried = [], []
+    for c, contour in enumerate(originals):
+        chains = []
+        for n in range(offsets[c], offsets[c] + len(contour.segments)):
+            for segment, covering in owned.get(n, [(segments[n], ())]):
+                if not chains or not chains[-1][0][-1].end_point() == segment.start_point():
+                    chains.append(([], set([c])))
+                chains[-1][0].append(segment)
+                chains[-1][1].update(home[m] for m in covering)
+        if contour.closed and len(chains) > 1 and chains[-1][0][-1].end_point() == chains[0][0][0].start_point():
+            last = chains.pop()
+            chains[0] = (last[0] + chains[0][0], last[1] | chains[0][1])
+        for chain, outlines in chains:
+            runs.append(Contour(chain))
+            carried.append(outlines)
+    carriers = [[] for _ in originals]
+    for r, outlines in enumerate(carried):
+        for c in outlines:
+            carriers[c].append(r)
+    for r, run in enumerate(runs):
+        run.parents = sorted(set(q for c in carried[r] for p in originals[c].parents
+                                 for q in carriers[p] if q != r))
+    return SharedEdges(runs, before, shared)
+
+
+def _owned_pieces(line, span, pieces, origin, u):
+    # the parts of the line between parameters in pieces, running the
+    # same way as the line and ending on its own endpoints where they can,
+    # each with the segments that covered it
+    runs = []
+    for a, b, covering in pieces:
+        if runs and a - runs[-1][1] <= EPSILON:
+            runs[-1][1] = b
+            runs[-1][2] |= covering
+        else:
+            runs.append([a, b, set(covering)])
+    if len(runs) == 1 and runs[0][0] - span[0] <= EPSILON and span[1] - runs[0][1] <= EPSILON:
+        return [(line, runs[0][2])]
+    forward = (line.p2 - line.p1).dot(u) > 0
+    lo, hi = (line.p1, line.p2) if forward else (line.p2, line.p1)
+
+    def point(t):
+        if abs(t - span[0]) <= EPSILON:
+            return lo
+        if abs(t - span[1]) <= EPSILON:
+            return hi
+        return origin + t * u
+    result = [(LineSegment(point(a), point(b)), covering) for a, b, covering in runs]
+    if not forward:
+        result = [(s.reversed(), covering) for s, covering in reversed(result)]
+    return result
+
+
+def plan_toolpath(shapes, origin=None, neighbours=8, passes=10):
+    """
+    >>> from noodle import rectangle, circle
+    >>> shapes = [rectangle(0, 0, 1, 1), rectangle(10, 0, 1, 1), circle(10, 0, 0.5), rectangle(2, 0, 0.5, 0.5)]
+    >>> plan = plan_toolpath(shapes)
+    >>> plan.order
+    [0, 3, 2, 1]
+    >>> plan.travel < plan.baseline_travel
+    True
+    >>> plan.report()
+    '4 contours, travel 20.55 -> 11.13 (45.8% saved)'
+    """
+    contours = [Contour(segments) for shape in shapes for segments in shape.contours()]
+    find_parents(contours)
+    return _plan(contours, origin, neighbours, passes)
+
+
+def _plan(contours, origin, neighbours, passes):
+    origin = origin or Point(0, 0)
+    baseline = _travel(contours, list(range(len(contours))), [0] * len(contours), origin)
+    order, starts = nearest_neighbour(contours, origin)
+    order, starts = two_opt(contours, order, starts, origin, neighbours, passes)
+    starts = choose_starts(contours, order, starts, origin)
+    return ToolpathPlan(contours, order, starts, origin, baseline)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()